@@ -17,13 +17,66 @@ class PDUConfig(PluginConfig):
     default_settings = {
         "schedule": True,
         "schedule_interval": 60 * 5,
+        "schedule_mode": "burst",
+        "stagger_slots": 60,
+        "stagger_jitter": 0.5,
+        "overlap_policy": "skip",
+        "run_lock_ttl": None,
         "snmp_read": "public",
         "snmp_write": "private",
+        "snmp_version": 2,
+        "snmp_port": 161,
+        "snmp_timeout": 1,
+        "snmp_retries": 3,
+        "snmp_max_message_size": 1472,
+        "snmp_max_repetitions": 25,
+        "snmp_security_level": "auth_with_privacy",
+        "snmp_security_username": "",
+        "snmp_auth_protocol": "SHA",
+        "snmp_auth_password": "",
+        "snmp_privacy_protocol": "AES",
+        "snmp_privacy_password": "",
+        "snmp_context": "",
+        "snmp_session_pool_size": 1024,
+        "snmp_session_idle_timeout": 60 * 10,
+        "max_concurrency": 32,
+        "collector_backend": "threads",
+        "poll_shards": 1,
+        "shard_by": "device",
+        "write_batch_size": 1000,
+        "poll_time_budget": None,
+        "quarantine_threshold": 3,
+        "quarantine_max_backoff": 60 * 60,
+        "history": True,
+        "history_raw_retention": 2,
+        "history_five_minutes_retention": 30,
+        "history_hourly_retention": 400,
+        "history_daily_retention": None,
+        "history_max_points": 500,
+        "history_purge_interval": 60 * 60,
+        "history_purge_chunk_size": 5000,
+        "history_purge_throttle": 0.1,
+        "history_partition_days_ahead": 2,
+        "summary_refresh_interval": 60 * 60,
+        "bulk_ingest_max_items": 10000,
+        "ingest_mode": "direct",
+        "ingest_flush_interval": 5,
+        "ingest_flush_batch_size": 5000,
+        "ingest_buffer_max_length": 1000000,
+        "status_cache_ttl": 60 * 60,
+        "sync_page_size": 1000,
+        "sync_settle_time": 60,
+        "lazy_panels": True,
+        "panel_cache_ttl": 30,
         "rack_view_pdu_devices": True,
         "rack_view_usage_summary": True,
         "rack_view_summary_unit": "watts",
     }
     caching_config = {}
 
+    def ready(self):
+        super().ready()
+        from . import signals  # noqa: F401 pylint:disable=import-outside-toplevel,unused-import
+
 
 config = PDUConfig  # pylint:disable=invalid-name
@@ -1,9 +1,19 @@
+from django.conf import settings
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from axians_netbox_pdu.choices import PDUUnitChoices
-from axians_netbox_pdu.models import PDUConfig, PDUStatus
-from dcim.models import Device, DeviceType
+from axians_netbox_pdu.choices import PDUPollStateChoices, PDUSummaryScopeChoices, PDUUnitChoices
+from axians_netbox_pdu.models import (
+    MAX_POWER_USAGE,
+    PDUConfig,
+    PDUOutletStatus,
+    PDUPollState,
+    PDUPowerSummary,
+    PDUStatus,
+    validate_metric_oids,
+    validate_oid,
+)
+from dcim.models import Device, DeviceType, PowerOutlet
 
 
 class PDUConfigSerializer(serializers.ModelSerializer):
@@ -24,12 +34,28 @@ class PDUConfigSerializer(serializers.ModelSerializer):
         validators=[UniqueValidator(PDUConfig.objects.all())],
     )
 
-    power_usage_oid = serializers.CharField(required=True, help_text="OID string to collect power usage",)
+    power_usage_oid = serializers.CharField(
+        required=True, validators=[validate_oid], help_text="OID string to collect power usage",
+    )
 
     power_usage_unit = serializers.ChoiceField(
         choices=PDUUnitChoices.CHOICES, help_text="The unit of power to be collected",
     )
 
+    outlet_power_oid = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        validators=[validate_oid],
+        help_text="OID of the power usage column of the outlet table",
+    )
+
+    metric_oids = serializers.DictField(
+        child=serializers.CharField(),
+        required=False,
+        validators=[validate_metric_oids],
+        help_text="Additional OIDs to collect, as a mapping of metric name to OID",
+    )
+
     class Meta:
         model = PDUConfig
         fields = [
@@ -37,6 +63,8 @@ class PDUConfigSerializer(serializers.ModelSerializer):
             "device_type",
             "power_usage_oid",
             "power_usage_unit",
+            "outlet_power_oid",
+            "metric_oids",
         ]
 
 
@@ -44,7 +72,7 @@ class PDUStatusSerializer(serializers.ModelSerializer):
     """Serializer for the PSUStatus model."""
 
     def validate(self, data):
-        if data["device"].poweroutlets.count() == 0:
+        if not data["device"].poweroutlets.exists():
             raise serializers.ValidationError({"device": "Device does not contain any Power Outlets."})
         return data
 
@@ -59,6 +87,109 @@ class PDUStatusSerializer(serializers.ModelSerializer):
 
     power_usage = serializers.IntegerField(read_only=False, required=True, help_text="Power Usage Value")
 
+    metrics = serializers.DictField(required=False, help_text="Values of the additional metrics")
+
+    class Meta:
+        model = PDUStatus
+        fields = ["id", "device", "power_usage", "metrics"]
+
+
+class PDUStatusLatestSerializer(serializers.ModelSerializer):
+    """Serializer for the PDUStatus read from the status cache."""
+
+    device = serializers.PrimaryKeyRelatedField(read_only=True, help_text="Netbox Device 'id' value")
+
     class Meta:
         model = PDUStatus
-        fields = ["id", "device", "power_usage"]
+        fields = ["id", "device", "power_usage", "metrics", "updated_at"]
+        read_only_fields = fields
+
+
+class PDUStatusBulkItemSerializer(serializers.Serializer):
+    """Serializer for a single reading pushed to the bulk PDUStatus endpoint."""
+
+    device = serializers.IntegerField(min_value=1, help_text="Netbox Device 'id' value")
+
+    power_usage = serializers.IntegerField(min_value=0, max_value=MAX_POWER_USAGE, help_text="Power Usage Value")
+
+    timestamp = serializers.DateTimeField(required=False, help_text="Time of the reading, defaults to now")
+
+
+class PDUStatusBulkSerializer(serializers.ListSerializer):
+    """Serializer for a batch of readings, the devices of the whole batch are checked with a single query."""
+
+    child = PDUStatusBulkItemSerializer()
+
+    def validate(self, attrs):
+        max_items = settings.PLUGINS_CONFIG["axians_netbox_pdu"]["bulk_ingest_max_items"]
+        if not attrs:
+            raise serializers.ValidationError("At least one reading is required.")
+        if len(attrs) > max_items:
+            raise serializers.ValidationError(f"At most {max_items} readings can be sent at once.")
+
+        device_ids = {item["device"] for item in attrs}
+        eligible = set(
+            PowerOutlet.objects.filter(device_id__in=device_ids).values_list("device_id", flat=True).distinct()
+        )
+        if device_ids - eligible:
+            raise serializers.ValidationError(
+                [
+                    {} if item["device"] in eligible else {"device": "Device does not exist or has no Power Outlets."}
+                    for item in attrs
+                ]
+            )
+        return attrs
+
+
+class PDUOutletStatusSerializer(serializers.ModelSerializer):
+    """Serializer for the PDUOutletStatus model."""
+
+    power_outlet = serializers.PrimaryKeyRelatedField(read_only=True, help_text="Netbox PowerOutlet 'id' value")
+
+    device = serializers.PrimaryKeyRelatedField(read_only=True, help_text="Netbox Device 'id' value")
+
+    class Meta:
+        model = PDUOutletStatus
+        fields = ["id", "power_outlet", "device", "power_usage", "updated_at"]
+        read_only_fields = fields
+
+
+class PDUPowerSummarySerializer(serializers.ModelSerializer):
+    """Serializer for the PDUPowerSummary model."""
+
+    scope = serializers.ChoiceField(choices=PDUSummaryScopeChoices.CHOICES, read_only=True)
+
+    oldest_reading_age = serializers.SerializerMethodField(help_text="Age of the stalest PDU reading in seconds")
+
+    def get_oldest_reading_age(self, obj):
+        age = obj.oldest_reading_age
+        return None if age is None else round(age.total_seconds())
+
+    class Meta:
+        model = PDUPowerSummary
+        fields = [
+            "id",
+            "scope",
+            "object_id",
+            "used_power",
+            "available_power",
+            "utilization",
+            "pdu_count",
+            "oldest_reading",
+            "oldest_reading_age",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+
+class PDUPollStateSerializer(serializers.ModelSerializer):
+    """Serializer for the PDUPollState model."""
+
+    device = serializers.PrimaryKeyRelatedField(read_only=True, help_text="Netbox Device 'id' value")
+
+    state = serializers.ChoiceField(choices=PDUPollStateChoices.CHOICES, read_only=True)
+
+    class Meta:
+        model = PDUPollState
+        fields = ["id", "device", "state", "consecutive_failures", "last_error", "last_failure_at", "next_poll_at"]
+        read_only_fields = fields
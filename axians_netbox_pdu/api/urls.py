@@ -1,10 +1,27 @@
+from django.urls import path
 from rest_framework import routers
 
-from .views import PDUConfigViewSet, PDUStatusViewSet
+from .views import (
+    PDUConfigViewSet,
+    PDUExportView,
+    PDUHistoryView,
+    PDUMetricsView,
+    PDUOutletStatusViewSet,
+    PDUPollStateViewSet,
+    PDUPowerSummaryViewSet,
+    PDUStatusViewSet,
+)
 
 router = routers.DefaultRouter()
 
 router.register(r"pdu-config", PDUConfigViewSet)
 router.register(r"pdu-status", PDUStatusViewSet)
+router.register(r"pdu-outlet-status", PDUOutletStatusViewSet)
+router.register(r"pdu-poll-state", PDUPollStateViewSet)
+router.register(r"pdu-power-summary", PDUPowerSummaryViewSet)
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path("history/", PDUHistoryView.as_view(), name="history"),
+    path("export/<str:dataset>.<str:output_format>", PDUExportView.as_view(), name="export"),
+    path("metrics/", PDUMetricsView.as_view(), name="metrics"),
+]
@@ -1,9 +1,42 @@
-from rest_framework import mixins, viewsets
+import hashlib
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+try:
+    from netbox.api.authentication import TokenPermissions
+except ImportError:  # NetBox < 2.10
+    from netbox.api import TokenPermissions
 
 #from axians_netbox_pdu.filters import PDUConfigFilter, PDUStatusFilter
-from axians_netbox_pdu.models import PDUConfig, PDUStatus
+from axians_netbox_pdu.export import EXPORT_FORMATS, get_history_rows, get_status_rows
+from axians_netbox_pdu.history import TIERS, get_power_history, record_readings, select_tier
+from axians_netbox_pdu.ingest import store_readings
+from axians_netbox_pdu.metrics import get_metrics
+from axians_netbox_pdu.models import PDUConfig, PDUOutletStatus, PDUPollState, PDUPowerSummary, PDUStatus
+from axians_netbox_pdu.status_cache import get_statuses
+from axians_netbox_pdu.summaries import refresh_power_summaries
+from dcim.models import Device
 
-from .serializers import PDUConfigSerializer, PDUStatusSerializer
+from .serializers import (
+    PDUConfigSerializer,
+    PDUOutletStatusSerializer,
+    PDUPollStateSerializer,
+    PDUPowerSummarySerializer,
+    PDUStatusBulkSerializer,
+    PDUStatusLatestSerializer,
+    PDUStatusSerializer,
+)
 
 
 class PDUConfigViewSet(
@@ -22,6 +55,95 @@ class PDUConfigViewSet(
     serializer_class = PDUConfigSerializer
 
 
+def get_time_param(request, name, default=None):
+    """Return the date and time given by the query parameter ``name``, naive values being in the current timezone."""
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise serializers.ValidationError({name: "Invalid date and time."})
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def encode_cursor(updated_at, pk):
+    """Return the opaque cursor pointing right after the row ``pk`` updated at ``updated_at``."""
+    return urlsafe_b64encode(f"{updated_at.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the ``(updated_at, pk)`` a cursor points after."""
+    try:
+        updated_at, pk = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        updated_at, pk = parse_datetime(updated_at), int(pk)
+    except (TypeError, ValueError):
+        updated_at = None
+    if updated_at is None:
+        raise serializers.ValidationError({"cursor": "Invalid cursor."})
+    return updated_at, pk
+
+
+def get_etag(*parts):
+    """Return a strong ETag identifying ``parts``."""
+    return quote_etag(hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32])
+
+
+def is_not_modified(request, etag):
+    """Return whether the ``If-None-Match`` header of ``request`` matches ``etag``."""
+    etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    if "*" in etags:
+        return True
+    # Weak comparison, as RFC 7232 requires for If-None-Match
+    return etag in {tag[2:] if tag.startswith("W/") else tag for tag in etags}
+
+
+def get_device_ids(request, required=True):
+    """Return the ids of the devices given by the repeatable ``device`` query parameter.
+
+    Unless ``required``, None is returned when no device is given.
+    """
+    try:
+        device_ids = [int(device_id) for device_id in request.query_params.getlist("device")]
+    except ValueError:
+        raise serializers.ValidationError({"device": "Device ids must be integers."})
+    if not device_ids:
+        if not required:
+            return None
+        raise serializers.ValidationError({"device": "At least one device is required."})
+    return device_ids
+
+
+def get_visible_device_ids(request, device_ids=None):
+    """Return the ids of the devices among ``device_ids``, or of every device when None, the user may view.
+
+    The ids come as a subquery, so restricting any number of devices costs no extra query.
+    """
+    devices = Device.objects.restrict(request.user, "view")
+    if device_ids is not None:
+        devices = devices.filter(pk__in=device_ids)
+    return devices.values("pk")
+
+
+def get_tier_param(request):
+    """Return the history tier given by the ``tier`` query parameter, None when not given."""
+    if "tier" not in request.query_params:
+        return None
+    tiers = {tier.name: tier for tier in TIERS}
+    tier = tiers.get(request.query_params["tier"])
+    if tier is None:
+        raise serializers.ValidationError({"tier": f"Expected one of {', '.join(tiers)}."})
+    return tier
+
+
+def get_window_params(request):
+    """Return the ``start`` and ``end`` query parameters, the last day by default."""
+    end = get_time_param(request, "end", timezone.now())
+    start = get_time_param(request, "start", end - timedelta(days=1))
+    if start >= end:
+        raise serializers.ValidationError({"start": "The start must be before the end."})
+    return start, end
+
+
 class PDUStatusViewSet(
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
@@ -35,3 +157,174 @@ class PDUStatusViewSet(
     queryset = PDUStatus.objects.all()
     #filterset_class = PDUStatusFilter
     serializer_class = PDUStatusSerializer
+
+    def list(self, request, *args, **kwargs):
+        """List every PDUStatus, or with ``updated_since`` or ``cursor`` only those changed since the last sync
+
+        Changes are returned oldest first, in pages of ``sync_page_size`` rows, with the cursor to send on the next
+        request. Responses carry an ETag, sending it back in If-None-Match returns a 304 while nothing changed.
+        """
+        config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+        queryset = self.filter_queryset(self.get_queryset())
+        cursor = request.query_params.get("cursor")
+        updated_since = get_time_param(request, "updated_since")
+        if cursor is not None:
+            updated_at, pk = decode_cursor(cursor)
+            queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+        elif updated_since is not None:
+            queryset = queryset.filter(updated_at__gte=updated_since)
+        if cursor is not None or updated_since is not None:
+            # updated_at is set before the write transaction commits. Returning only the changes old enough for their
+            # transaction to be over keeps the cursor from moving past a change that is not visible yet.
+            queryset = queryset.filter(updated_at__lt=timezone.now() - timedelta(seconds=config["sync_settle_time"]))
+
+        # Every write moves updated_at forward and deletions change the count, so both identify the content.
+        state = queryset.aggregate(count=Count("pk"), last_updated_at=Max("updated_at"))
+        etag = get_etag(request.get_full_path(), state["count"], state["last_updated_at"])
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        if cursor is None and updated_since is None:
+            response = super().list(request, *args, **kwargs)
+        else:
+            page_size = config["sync_page_size"]
+            rows = list(queryset.order_by("updated_at", "pk")[: page_size + 1])
+            more = len(rows) > page_size
+            rows = rows[:page_size]
+            if rows:
+                cursor = encode_cursor(rows[-1].updated_at, rows[-1].pk)
+            elif cursor is None:
+                # Nothing changed yet, the next sync starts from the same point.
+                cursor = encode_cursor(updated_since, 0)
+            response = Response(
+                {"results": self.get_serializer(rows, many=True).data, "next_cursor": cursor, "more": more}
+            )
+        response["ETag"] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = get_etag(instance.pk, instance.updated_at)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(self.get_serializer(instance).data, headers={"ETag": etag})
+
+    def perform_create(self, serializer):
+        instance = serializer.save(read_at=timezone.now())
+        record_readings({instance.device_id: instance.power_usage})
+        refresh_power_summaries([instance.device_id])
+
+    def perform_update(self, serializer):
+        instance = serializer.save(read_at=timezone.now())
+        record_readings({instance.device_id: instance.power_usage})
+        refresh_power_summaries([instance.device_id])
+
+    def perform_destroy(self, instance):
+        device_id = instance.device_id
+        instance.delete()
+        refresh_power_summaries([device_id])
+
+    @action(detail=False, methods=["get"], url_path="latest")
+    def latest(self, request):
+        """Latest PDUStatus of many devices, read from the status cache in a single round trip"""
+        statuses = get_statuses(get_device_ids(request))
+        return Response(PDUStatusLatestSerializer(list(statuses.values()), many=True).data)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """Store many readings pushed at once, validated together and written with a single upsert"""
+        serializer = PDUStatusBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        now = timezone.now()
+        readings = [
+            (item["device"], item.get("timestamp") or now, item["power_usage"]) for item in serializer.validated_data
+        ]
+        written = store_readings(readings)
+        # Buffered readings are only accepted here, the flusher writes them to the database shortly after.
+        return Response(
+            {"readings": len(readings), "devices": len({reading[0] for reading in readings})},
+            status=status.HTTP_200_OK if written else status.HTTP_202_ACCEPTED,
+        )
+
+
+class PDUOutletStatusViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """List the power usage of PDU outlets"""
+
+    queryset = PDUOutletStatus.objects.all()
+    serializer_class = PDUOutletStatusSerializer
+
+
+class PDUPowerSummaryViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """List the precomputed power usage of racks, locations, sites and regions"""
+
+    queryset = PDUPowerSummary.objects.all()
+    serializer_class = PDUPowerSummarySerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if "scope" in self.request.query_params:
+            queryset = queryset.filter(scope=self.request.query_params["scope"])
+        object_ids = self.request.query_params.getlist("object_id")
+        if object_ids:
+            try:
+                queryset = queryset.filter(object_id__in=[int(object_id) for object_id in object_ids])
+            except ValueError:
+                raise serializers.ValidationError({"object_id": "Object ids must be integers."})
+        return queryset
+
+
+class PDUPollStateViewSet(
+    mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet,
+):
+    """List PDUs failing to answer polls, deleting an instance lifts its quarantine"""
+
+    queryset = PDUPollState.objects.all()
+    serializer_class = PDUPollStateSerializer
+
+
+class PDUHistoryView(APIView):
+    """Power usage history of one or more devices, read from the coarsest tier suiting the window"""
+
+    permission_classes = [TokenPermissions]
+    queryset = PDUStatus.objects.all()
+
+    def get(self, request):
+        device_ids = get_visible_device_ids(request, get_device_ids(request))
+        start, end = get_window_params(request)
+
+        tier, readings = get_power_history(device_ids, start, end, tier=get_tier_param(request))
+        return Response({"tier": tier.name, "start": start, "end": end, "readings": readings})
+
+
+class PDUExportView(APIView):
+    """Stream the PDU status or power usage history as NDJSON or CSV, whatever its size"""
+
+    permission_classes = [TokenPermissions]
+    queryset = PDUStatus.objects.all()
+
+    def get(self, request, dataset, output_format):
+        if output_format not in EXPORT_FORMATS or dataset not in ("status", "history"):
+            raise Http404
+        device_ids = get_visible_device_ids(request, get_device_ids(request, required=False))
+        if dataset == "status":
+            fields, rows = get_status_rows(device_ids)
+        else:
+            start, end = get_window_params(request)
+            fields, rows = get_history_rows(device_ids, start, end, get_tier_param(request) or select_tier(start, end))
+
+        content_type, stream = EXPORT_FORMATS[output_format]
+        response = StreamingHttpResponse(stream(fields, rows), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="pdu-{dataset}.{output_format}"'
+        return response
+
+
+class PDUMetricsView(APIView):
+    """Operational metrics of the poller"""
+
+    # Token permissions require the view permission of the queryset model: view_pdustatus.
+    permission_classes = [TokenPermissions]
+    queryset = PDUStatus.objects.all()
+
+    def get(self, request):
+        return Response(get_metrics())
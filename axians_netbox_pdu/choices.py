@@ -13,3 +13,33 @@ class PDUUnitChoices(ChoiceSet):
         (UNIT_WATTS, "Watts"),
         (UNIT_KILOWATTS, "Kilowatts"),
     )
+
+
+class PDUPollStateChoices(ChoiceSet):
+    """Valid values for PDUPollState "state"."""
+
+    STATE_FAILING = "failing"
+    STATE_QUARANTINED = "quarantined"
+    STATE_PROBING = "probing"
+
+    CHOICES = (
+        (STATE_FAILING, "Failing"),
+        (STATE_QUARANTINED, "Quarantined"),
+        (STATE_PROBING, "Probing"),
+    )
+
+
+class PDUSummaryScopeChoices(ChoiceSet):
+    """Valid values for PDUPowerSummary "scope"."""
+
+    SCOPE_RACK = "rack"
+    SCOPE_LOCATION = "location"
+    SCOPE_SITE = "site"
+    SCOPE_REGION = "region"
+
+    CHOICES = (
+        (SCOPE_RACK, "Rack"),
+        (SCOPE_LOCATION, "Location"),
+        (SCOPE_SITE, "Site"),
+        (SCOPE_REGION, "Region"),
+    )
@@ -0,0 +1,76 @@
+"""Streaming export of the PDU status and history.
+
+Rows are read through a server-side cursor with ``iterator()`` over ``values()`` querysets, so no model instance is
+built and only one chunk of rows is held in memory at a time, and they are written out as they are read. Memory stays
+flat and the first bytes leave as soon as the first chunk is read, whatever the size of the export.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .history import get_power_history_queryset
+from .models import PDUStatus
+
+# Rows read from the database per round trip of the server-side cursor, and written out at once
+EXPORT_CHUNK_SIZE = 2000
+
+STATUS_FIELDS = ("device_id", "power_usage", "metrics", "updated_at")
+HISTORY_FIELDS = ("device_id", "time", "min", "avg", "max")
+
+
+def get_status_rows(device_ids=None):
+    """Return the fields and an iterator over the PDUStatus of ``device_ids``, or of every device when None."""
+    statuses = PDUStatus.objects.exclude(device=None).order_by("device_id")
+    if device_ids is not None:
+        statuses = statuses.filter(device_id__in=device_ids)
+    return STATUS_FIELDS, statuses.values_list(*STATUS_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def get_history_rows(device_ids, start, end, tier):
+    """Return the fields and an iterator over the power usage history, as given by ``get_power_history``."""
+    rows = get_power_history_queryset(device_ids, start, end, tier).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return HISTORY_FIELDS, (tuple(row[field] for field in HISTORY_FIELDS) for row in rows)
+
+
+def _chunks(rows, format_row):
+    chunk = []
+    for row in rows:
+        chunk.append(format_row(row))
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream_ndjson(fields, rows):
+    """Yield the rows as newline delimited JSON objects."""
+    encoder = DjangoJSONEncoder()
+    return _chunks(rows, lambda row: encoder.encode(dict(zip(fields, row))) + "\n")
+
+
+class _Line:
+    """File-like object handing back what the csv writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(fields, rows):
+    """Yield a header line, then the rows as CSV, nested values being written as JSON."""
+    writer = csv.writer(_Line())
+    yield writer.writerow(fields)
+    yield from _chunks(
+        rows,
+        lambda row: writer.writerow(
+            [json.dumps(value, cls=DjangoJSONEncoder) if isinstance(value, (dict, list)) else value for value in row]
+        ),
+    )
+
+
+# Export format: (content type, function turning the fields and rows into chunks of text)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", stream_ndjson),
+    "csv": ("text/csv", stream_csv),
+}
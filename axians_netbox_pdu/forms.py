@@ -6,7 +6,7 @@ from utilities.forms import BootstrapMixin, CSVModelChoiceField
 from netbox.forms import NetBoxModelCSVForm
 
 from .choices import PDUUnitChoices
-from .models import PDUConfig
+from .models import PDUConfig, validate_oid
 
 BLANK_CHOICE = (("", "---------"),)
 
@@ -23,16 +23,29 @@ class PDUConfigForm(BootstrapMixin, forms.ModelForm):
     )
 
     power_usage_oid = forms.CharField(
-        required=True, label="Power Usage OID", help_text="OID string to collect power usage"
+        required=True, label="Power Usage OID", help_text="OID string to collect power usage", validators=[validate_oid]
     )
 
     power_usage_unit = forms.ChoiceField(
         choices=BLANK_CHOICE + PDUUnitChoices.CHOICES, required=True, label="Power Usage Unit"
     )
 
+    outlet_power_oid = forms.CharField(
+        required=False,
+        label="Outlet Power OID",
+        validators=[validate_oid],
+        help_text="OID of the power usage column of the outlet table, walked to collect the power usage per outlet",
+    )
+
+    metric_oids = forms.JSONField(
+        required=False,
+        label="Metric OIDs",
+        help_text='Additional OIDs to collect with the power usage, for example {"voltage": "1.3.6.1.4.1.1.0"}',
+    )
+
     class Meta:
         model = PDUConfig
-        fields = ["device_type", "power_usage_oid", "power_usage_unit"]
+        fields = ["device_type", "power_usage_oid", "power_usage_unit", "outlet_power_oid", "metric_oids"]
         obj_type = "test"
 
 
@@ -73,11 +86,14 @@ class PDUConfigCSVForm(NetBoxModelCSVForm):
     )
 
     power_usage_oid = forms.CharField(
-        required=True, help_text="OID string to collect power usage")
+        required=True, help_text="OID string to collect power usage", validators=[validate_oid])
 
     power_usage_unit = forms.CharField(
         required=True, help_text="The unit of power that will be collected")
 
+    outlet_power_oid = forms.CharField(
+        required=False, help_text="OID of the power usage column of the outlet table", validators=[validate_oid])
+
     class Meta:
         model = PDUConfig
         fields = PDUConfig.csv_headers
@@ -0,0 +1,306 @@
+"""Power usage history of the PDUs.
+
+Every reading is appended to ``PDUReading``. A background job rolls the raw readings up into five minute periods,
+those into hours and the hours into days, each tier keeping the minimum, average and maximum power usage of its
+periods. Every tier is purged after its own retention period, once compacted into the coarser tier, so the raw
+readings only need to be kept for a short time while the daily tier can cover years. Range queries read the coarsest
+tier that still gives a useful resolution for the window, which keeps history charts fast whatever the window.
+
+Periods are aligned on the epoch, so days start at midnight UTC.
+"""
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import PDUReading, PDUReadingDaily, PDUReadingFiveMinutes, PDUReadingHourly
+
+
+class HistoryTier:
+    """A level of the history: the raw readings or one of the rollups built from the tier below it."""
+
+    __slots__ = ("name", "model", "period", "retention_setting", "source")
+
+    def __init__(self, name, model, period, retention_setting, source=None):
+        self.name = name
+        self.model = model
+        self.period = period
+        self.retention_setting = retention_setting
+        self.source = source
+
+    def __repr__(self):
+        return f"<HistoryTier {self.name}>"
+
+    @property
+    def time_field(self):
+        return "timestamp" if self.source is None else "period_start"
+
+    def get_retention(self, config):
+        """Return how long the tier is kept as a timedelta, None when it is kept forever."""
+        days = config[self.retention_setting]
+        return None if days is None else timedelta(days=days)
+
+
+RAW = HistoryTier("raw", PDUReading, None, "history_raw_retention")
+FIVE_MINUTES = HistoryTier("5m", PDUReadingFiveMinutes, 5 * 60, "history_five_minutes_retention", RAW)
+HOURLY = HistoryTier("1h", PDUReadingHourly, 60 * 60, "history_hourly_retention", FIVE_MINUTES)
+DAILY = HistoryTier("1d", PDUReadingDaily, 24 * 60 * 60, "history_daily_retention", HOURLY)
+
+# From the finest to the coarsest tier
+TIERS = (RAW, FIVE_MINUTES, HOURLY, DAILY)
+
+# Aggregates building a period from the rows of the tier below it
+RAW_AGGREGATES = ("COUNT(*)", "MIN(power_usage)", "AVG(power_usage)", "MAX(power_usage)")
+ROLLUP_AGGREGATES = (
+    "SUM(samples)",
+    "MIN(power_usage_min)",
+    "SUM(power_usage_avg * samples) / SUM(samples)",
+    "MAX(power_usage_max)",
+)
+
+
+# Upper bound of a range partition as given by pg_get_expr, e.g. FOR VALUES FROM ('...') TO ('2021-01-02 00:00:00+00')
+PARTITION_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def _floor(moment, period):
+    """Return the start of the period of ``period`` seconds containing ``moment``."""
+    return datetime.fromtimestamp(int(moment.timestamp()) // period * period, tz=dt_timezone.utc)
+
+
+def record_readings(readings, timestamp=None, batch_size=None):
+    """Append the power usage of many devices, ``readings`` maps a device id to its power usage."""
+    timestamp = timestamp or timezone.now()
+    record_timed_readings(
+        [(device_id, timestamp, power_usage) for device_id, power_usage in readings.items()], batch_size=batch_size
+    )
+
+
+def record_timed_readings(readings, batch_size=None):
+    """Append many readings, each a ``(device id, timestamp, power usage)`` tuple, a device may appear several times."""
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    if not config["history"] or not readings:
+        return
+    PDUReading.objects.bulk_create(
+        [
+            PDUReading(device_id=device_id, timestamp=timestamp, power_usage=power_usage)
+            for device_id, timestamp, power_usage in readings
+        ],
+        batch_size=max(1, int(batch_size or config["write_batch_size"])),
+    )
+
+
+def rollup_tier(tier, now=None):
+    """Aggregate the closed periods of ``tier`` from the tier below it and return the number of rows written.
+
+    The rollup restarts from the last period already rolled up so readings arriving late for that period are taken
+    into account, and the whole tier is computed by the database with a single INSERT ... SELECT ... ON CONFLICT.
+    """
+    now = now or timezone.now()
+    source = tier.source
+    start = tier.model.objects.aggregate(start=Max("period_start"))["start"]
+    if start is None:
+        start = source.model.objects.aggregate(start=Min(source.time_field))["start"]
+        if start is None:
+            return 0
+    start = _floor(start, tier.period)
+    end = _floor(now, tier.period)
+    if start >= end:
+        return 0
+
+    quote_name = connection.ops.quote_name
+    time_column = quote_name(source.time_field)
+    aggregates = RAW_AGGREGATES if source is RAW else ROLLUP_AGGREGATES
+    columns = ("device_id", "period_start", "samples", "power_usage_min", "power_usage_avg", "power_usage_max")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote_name(tier.model._meta.db_table)} "  # nosec
+            f"({', '.join(quote_name(column) for column in columns)}) "
+            f"SELECT {quote_name('device_id')}, "
+            f"to_timestamp(floor(extract(epoch FROM {time_column}) / %s) * %s), {', '.join(aggregates)} "
+            f"FROM {quote_name(source.model._meta.db_table)} "
+            f"WHERE {time_column} >= %s AND {time_column} < %s "
+            "GROUP BY 1, 2 "
+            f"ON CONFLICT ({quote_name('device_id')}, {quote_name('period_start')}) DO UPDATE SET "
+            + ", ".join(f"{quote_name(column)} = EXCLUDED.{quote_name(column)}" for column in columns[2:]),
+            [tier.period, tier.period, start, end],
+        )
+        return cursor.rowcount
+
+
+def rollup_readings(now=None):
+    """Roll every tier up, from the finest to the coarsest, and return the number of rows written per tier."""
+    now = now or timezone.now()
+    return {tier.name: rollup_tier(tier, now) for tier in TIERS if tier.source is not None}
+
+
+def _get_partitions(table):
+    """Return the ``(name, upper bound)`` of the range partitions of ``table``, empty when it is not partitioned."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [table],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_BOUND_RE.search(bound or "")
+        if match:
+            partitions.append((name, parse_datetime(match.group(1))))
+    return partitions
+
+
+def create_partitions(tier, now=None, days_ahead=None):
+    """Create the daily partitions of a partitioned tier for today and the next ``days_ahead`` days.
+
+    Does nothing for a table that is not partitioned. Returns the names of the partitions created.
+    """
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    table = tier.model._meta.db_table
+    partitions = _get_partitions(table)
+    if not partitions:
+        return []
+    now = now or timezone.now()
+    days_ahead = config["history_partition_days_ahead"] if days_ahead is None else days_ahead
+    existing = {name for name, _ in partitions}
+    quote_name = connection.ops.quote_name
+    created = []
+    day = _floor(now, DAILY.period)
+    for _ in range(days_ahead + 1):
+        name = f"{table}_p{day:%Y%m%d}"
+        if name not in existing:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote_name(name)} PARTITION OF {quote_name(table)} "  # nosec
+                    "FOR VALUES FROM (%s) TO (%s)",
+                    [day, day + timedelta(days=1)],
+                )
+            created.append(name)
+        day += timedelta(days=1)
+    return created
+
+
+def _purge_cutoff(tier, now, config):
+    """Return the time before which the rows of ``tier`` can be deleted, None when they are kept forever.
+
+    A row is only deleted once it is past the retention of its tier and has been compacted into the coarser tier, the
+    last period of the coarser tier being kept since it is rolled up again on the next run.
+    """
+    retention = tier.get_retention(config)
+    if retention is None:
+        return None
+    cutoff = now - retention
+    coarser = next((candidate for candidate in TIERS if candidate.source is tier), None)
+    if coarser is not None:
+        compacted = coarser.model.objects.aggregate(end=Max("period_start"))["end"]
+        if compacted is None:
+            return None
+        cutoff = min(cutoff, compacted)
+    return cutoff
+
+
+def _purge_rows(tier, cutoff, chunk_size, throttle):
+    """Delete the rows of ``tier`` older than ``cutoff`` in chunks, pausing ``throttle`` seconds between chunks.
+
+    Each chunk is picked through the index on the time column and deleted in its own short transaction, so no
+    statement holds locks for long or writes a large burst of WAL.
+    """
+    quote_name = connection.ops.quote_name
+    table = quote_name(tier.model._meta.db_table)
+    time_column = quote_name(tier.time_field)
+    deleted = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {quote_name('id')} IN ("  # nosec
+                f"SELECT {quote_name('id')} FROM {table} WHERE {time_column} < %s ORDER BY {time_column} LIMIT %s)",
+                [cutoff, chunk_size],
+            )
+            count = cursor.rowcount
+        deleted += count
+        if count < chunk_size:
+            return deleted
+        if throttle:
+            time.sleep(throttle)
+
+
+def purge_history(now=None, chunk_size=None, throttle=None):
+    """Delete the history past its retention and return the number of rows deleted per tier.
+
+    Partitions entirely older than the cutoff of a partitioned table are dropped in one go without being counted, the
+    remaining rows are deleted in throttled chunks of ``history_purge_chunk_size`` rows.
+    """
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    now = now or timezone.now()
+    chunk_size = max(1, int(chunk_size or config["history_purge_chunk_size"]))
+    throttle = config["history_purge_throttle"] if throttle is None else throttle
+    deleted = {}
+    for tier in TIERS:
+        cutoff = _purge_cutoff(tier, now, config)
+        if cutoff is None:
+            continue
+        for name, upper_bound in _get_partitions(tier.model._meta.db_table):
+            if upper_bound <= cutoff:
+                logging.info(f"Dropping expired history partition {name}.")
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")  # nosec
+        deleted[tier.name] = _purge_rows(tier, cutoff, chunk_size, throttle)
+    return deleted
+
+
+def select_tier(start, end, now=None):
+    """Return the tier to read the window from ``start`` to ``end``.
+
+    That is the finest tier still holding ``start`` whose resolution gives at most ``history_max_points`` points per
+    device over the window, or the daily tier when none does.
+    """
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    now = now or timezone.now()
+    window = (end - start).total_seconds()
+    for tier in TIERS:
+        retention = tier.get_retention(config)
+        if retention is not None and start < now - retention:
+            continue
+        # Raw readings come once per poll cycle.
+        period = tier.period or config["schedule_interval"]
+        if window / period <= config["history_max_points"]:
+            return tier
+    return DAILY
+
+
+def get_power_history_queryset(device_ids, start, end, tier):
+    """Return the power usage history of ``device_ids``, or of every device when None, read from ``tier``.
+
+    Every point is a dictionary holding the device id, the time and the minimum, average and maximum power usage. Raw
+    readings have the same value for the three of them.
+    """
+    rows = tier.model.objects.filter(**{f"{tier.time_field}__gte": start, f"{tier.time_field}__lt": end})
+    if device_ids is not None:
+        rows = rows.filter(device_id__in=device_ids)
+    rows = rows.order_by("device_id", tier.time_field)
+    if tier is RAW:
+        return rows.values(
+            "device_id", time=F("timestamp"), min=F("power_usage"), avg=F("power_usage"), max=F("power_usage")
+        )
+    return rows.values(
+        "device_id",
+        time=F("period_start"),
+        min=F("power_usage_min"),
+        avg=F("power_usage_avg"),
+        max=F("power_usage_max"),
+    )
+
+
+def get_power_history(device_ids, start, end, tier=None):
+    """Return the tier used and the power usage history of ``device_ids`` between ``start`` and ``end``."""
+    tier = tier or select_tier(start, end)
+    return tier, list(get_power_history_queryset(device_ids, start, end, tier))
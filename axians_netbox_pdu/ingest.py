@@ -0,0 +1,132 @@
+"""Storage of the PDU readings, written directly or through a write-behind buffer.
+
+With ``ingest_mode`` set to ``buffered`` the poller and the bulk status API append their readings to a Redis stream
+instead of writing them to the database, so their latency no longer depends on the database and collectors pushing at
+the same time never wait on each other's row locks. The ``flush_power_readings`` job drains the stream every
+``ingest_flush_interval`` seconds in batches of ``ingest_flush_batch_size`` readings, keeping only the last reading of
+each device per batch for its PDUStatus, which turns a burst of writes of the same devices into a single upsert.
+
+Entries are only removed from the stream once their batch is committed, so a flusher crashing in between writes the
+batch again on its next run.
+"""
+import json
+import time
+
+import django_rq
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .history import record_timed_readings
+from .metrics import increment_metric, record_metric
+from .status_cache import cache_statuses
+from .summaries import refresh_power_summaries
+from .utilities import bulk_upsert_pdu_status
+
+STREAM_KEY = "axians_netbox_pdu:readings"
+
+INGEST_MODES = ("direct", "buffered")
+
+
+def write_readings(readings, metrics=None, batch_size=None):
+    """Write many readings to the database, each a ``(device id, timestamp, power usage)`` tuple.
+
+    The PDUStatus of a device holds its latest reading, never replaced by an older one, while the history holds them
+    all. ``metrics`` maps a device id
+    to the values of its additional metrics, the metrics of the devices missing from it are left untouched.
+    """
+    metrics = metrics or {}
+    latest = {}
+    timestamps = {}
+    for device_id, timestamp, power_usage in sorted(readings, key=lambda reading: reading[1]):
+        latest[device_id] = power_usage
+        timestamps[device_id] = timestamp
+    with transaction.atomic():
+        bulk_upsert_pdu_status(
+            {device_id: power_usage for device_id, power_usage in latest.items() if device_id in metrics},
+            batch_size=batch_size,
+            metrics=metrics,
+            timestamps=timestamps,
+        )
+        bulk_upsert_pdu_status(
+            {device_id: power_usage for device_id, power_usage in latest.items() if device_id not in metrics},
+            batch_size=batch_size,
+            timestamps=timestamps,
+        )
+        record_timed_readings(readings, batch_size=batch_size)
+        refresh_power_summaries(latest, batch_size=batch_size)
+        transaction.on_commit(lambda: cache_statuses(latest))
+    return latest
+
+
+def buffer_readings(readings, metrics=None):
+    """Append many readings to the write-behind buffer, with the same arguments as ``write_readings``."""
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    metrics = metrics or {}
+    with django_rq.get_connection().pipeline(transaction=False) as pipeline:
+        for device_id, timestamp, power_usage in readings:
+            fields = {"device": device_id, "timestamp": timestamp.isoformat(), "power_usage": power_usage}
+            if device_id in metrics:
+                fields["metrics"] = json.dumps(metrics[device_id])
+            pipeline.xadd(STREAM_KEY, fields, maxlen=config["ingest_buffer_max_length"], approximate=True)
+        pipeline.execute()
+
+
+def store_readings(readings, metrics=None, batch_size=None):
+    """Store many readings as configured by ``ingest_mode``, return whether they were written to the database."""
+    ingest_mode = settings.PLUGINS_CONFIG["axians_netbox_pdu"]["ingest_mode"]
+    if ingest_mode not in INGEST_MODES:
+        raise ImproperlyConfigured(f"Unknown ingest_mode {ingest_mode!r}, expected one of {', '.join(INGEST_MODES)}.")
+    if ingest_mode == "buffered":
+        buffer_readings(readings, metrics)
+        return False
+    write_readings(readings, metrics, batch_size)
+    return True
+
+
+def _parse_entry(fields):
+    fields = {name.decode(): value.decode() for name, value in fields.items()}
+    reading = (int(fields["device"]), parse_datetime(fields["timestamp"]), int(fields["power_usage"]))
+    return reading, json.loads(fields["metrics"]) if "metrics" in fields else None
+
+
+def flush_readings(batch_size=None):
+    """Drain the write-behind buffer into the database and return what was flushed.
+
+    The flush lag, the age of the oldest reading still buffered when the flush starts, is recorded in the
+    ``ingest_flush_lag`` metric and the number of readings left in the buffer in ``ingest_backlog``.
+    """
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    batch_size = max(1, int(batch_size or config["ingest_flush_batch_size"]))
+    connection = django_rq.get_connection()
+
+    oldest = connection.xrange(STREAM_KEY, count=1)
+    # Stream entry ids start with the time they were added at in milliseconds.
+    lag = time.time() - int(oldest[0][0].split(b"-")[0]) / 1000 if oldest else 0
+    record_metric("ingest_flush_lag", round(max(lag, 0), 3))
+
+    # Only drain what is buffered now, so a flush ends even while readings keep coming.
+    pending = connection.xlen(STREAM_KEY)
+    flushed = 0
+    devices = 0
+    while flushed < pending:
+        entries = connection.xrange(STREAM_KEY, count=min(batch_size, pending - flushed))
+        if not entries:
+            break
+        readings = []
+        metrics = {}
+        for _, fields in entries:
+            reading, reading_metrics = _parse_entry(fields)
+            readings.append(reading)
+            if reading_metrics is not None:
+                metrics[reading[0]] = reading_metrics
+        devices += len(write_readings(readings, metrics, config["write_batch_size"]))
+        connection.xdel(STREAM_KEY, *(entry_id for entry_id, _ in entries))
+        flushed += len(entries)
+
+    increment_metric("ingest_flushed", flushed)
+    record_metric("ingest_backlog", connection.xlen(STREAM_KEY))
+    record_metric("last_ingest_flush_at", timezone.now().isoformat())
+    return {"readings": flushed, "devices": devices, "lag": round(max(lag, 0), 3)}
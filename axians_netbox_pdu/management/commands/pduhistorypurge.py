@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from axians_netbox_pdu.history import TIERS, create_partitions, purge_history
+
+
+class Command(BaseCommand):
+    help = "Delete the PDU power usage history past its retention, in throttled chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, help="Number of rows deleted per statement")
+        parser.add_argument("--throttle", type=float, help="Pause in seconds between two chunks")
+
+    def handle(self, *args, **options):
+        for tier in TIERS:
+            for name in create_partitions(tier):
+                self.stdout.write(f"Created partition {name}")
+        deleted = purge_history(chunk_size=options["chunk_size"], throttle=options["throttle"])
+        for tier, count in deleted.items():
+            self.stdout.write(f"Deleted {count} rows from the {tier} history")
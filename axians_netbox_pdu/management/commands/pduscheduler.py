@@ -1,11 +1,21 @@
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 
 import django_rq
 from django.conf import settings
 from django_rq.management.commands import rqscheduler
 
-from axians_netbox_pdu.worker import collect_power_usage_info
+from axians_netbox_pdu.utilities import get_stagger_offset
+from axians_netbox_pdu.history import FIVE_MINUTES
+from axians_netbox_pdu.worker import (
+    collect_power_usage_info,
+    collect_power_usage_shard,
+    flush_power_readings,
+    purge_power_history,
+    refresh_all_power_summaries,
+    rollup_power_history,
+)
 
 config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
 scheduler = django_rq.get_scheduler()
@@ -19,9 +29,52 @@ def clear_scheduled_jobs():
         job.delete()
 
 
+def register_staggered_jobs():
+    """Schedule one job per poll slot, each at a stable offset inside the interval."""
+    interval = config["schedule_interval"]
+    slots = max(1, int(config["stagger_slots"]))
+    now = datetime.utcnow()
+    # Offsets are relative to the epoch rather than to the start of the scheduler so they survive restarts.
+    epoch_seconds = time.time()
+    for slot in range(slots):
+        offset = get_stagger_offset(slot, slots, interval, config["stagger_jitter"])
+        delay = (offset - epoch_seconds) % interval
+        log.debug("Scheduling poll slot %s/%s every %ss at offset %.1fs", slot, slots, interval, offset)
+        scheduler.schedule(
+            scheduled_time=now + timedelta(seconds=delay),
+            func=collect_power_usage_shard,
+            args=[slot, slots, config["shard_by"]],
+            interval=interval,
+        )
+
+
 def register_scheduled_jobs():
     """Do scheduling here"""
+    if config["ingest_mode"] == "buffered":
+        # Pushed readings need flushing even when polling is not scheduled.
+        scheduler.schedule(
+            scheduled_time=datetime.utcnow(), func=flush_power_readings, interval=config["ingest_flush_interval"]
+        )
     if config["schedule"]:
+        if config["history"]:
+            # Roll the history up as soon as each five minute period closes.
+            scheduler.schedule(
+                scheduled_time=datetime.utcnow() + timedelta(seconds=-time.time() % FIVE_MINUTES.period),
+                func=rollup_power_history,
+                interval=FIVE_MINUTES.period,
+            )
+            scheduler.schedule(
+                scheduled_time=datetime.utcnow(), func=purge_power_history, interval=config["history_purge_interval"]
+            )
+        # Incremental refreshes miss devices leaving a rack or site, a periodic full refresh catches up with them.
+        scheduler.schedule(
+            scheduled_time=datetime.utcnow(),
+            func=refresh_all_power_summaries,
+            interval=config["summary_refresh_interval"],
+        )
+        if config["schedule_mode"] == "staggered":
+            register_staggered_jobs()
+            return
         scheduler.schedule(
             scheduled_time=datetime.utcnow(), func=collect_power_usage_info, interval=config["schedule_interval"]
         )
@@ -0,0 +1,43 @@
+"""Operational metrics of the poller, kept in a Redis hash shared by every worker."""
+import django_rq
+from django.utils import timezone
+
+METRICS_KEY = "axians_netbox_pdu:metrics"
+
+
+def increment_metric(name, amount=1):
+    """Increment the counter ``name`` by ``amount``."""
+    django_rq.get_connection().hincrbyfloat(METRICS_KEY, name, amount)
+
+
+def record_metric(name, value):
+    """Set the gauge ``name`` to ``value``."""
+    django_rq.get_connection().hset(METRICS_KEY, name, value)
+
+
+def record_event(name):
+    """Count an occurrence of the event ``name`` and remember when it last happened."""
+    connection = django_rq.get_connection()
+    with connection.pipeline() as pipeline:
+        pipeline.hincrbyfloat(METRICS_KEY, name, 1)
+        pipeline.hset(METRICS_KEY, f"last_{name}_at", timezone.now().isoformat())
+        pipeline.execute()
+
+
+def get_metrics():
+    """Return every metric as a dictionary, numeric values are converted back to numbers."""
+    metrics = {}
+    for name, value in django_rq.get_connection().hgetall(METRICS_KEY).items():
+        name, value = name.decode(), value.decode()
+        try:
+            number = float(value)
+        except ValueError:
+            metrics[name] = value
+        else:
+            metrics[name] = int(number) if number.is_integer() else number
+    return metrics
+
+
+def reset_metrics():
+    """Drop every metric."""
+    django_rq.get_connection().delete(METRICS_KEY)
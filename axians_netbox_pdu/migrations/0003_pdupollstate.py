@@ -0,0 +1,41 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dcim", "0106_role_default_color"),
+        ("axians_netbox_pdu", "0002_pdustatus"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PDUPollState",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[("failing", "Failing"), ("quarantined", "Quarantined"), ("probing", "Probing")],
+                        default="failing",
+                        max_length=50,
+                    ),
+                ),
+                ("consecutive_failures", models.PositiveIntegerField(default=0)),
+                (
+                    "last_error",
+                    models.CharField(blank=True, help_text="Error raised by the last failed poll", max_length=255),
+                ),
+                ("last_failure_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "next_poll_at",
+                    models.DateTimeField(blank=True, help_text="Quarantined until this time", null=True),
+                ),
+                (
+                    "device",
+                    models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to="dcim.Device"),
+                ),
+            ],
+        ),
+    ]
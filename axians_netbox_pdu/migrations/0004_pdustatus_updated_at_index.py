@@ -0,0 +1,14 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("axians_netbox_pdu", "0003_pdupollstate"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pdustatus", name="updated_at", field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
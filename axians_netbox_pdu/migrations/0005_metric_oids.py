@@ -0,0 +1,29 @@
+import axians_netbox_pdu.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("axians_netbox_pdu", "0004_pdustatus_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pduconfig",
+            name="metric_oids",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="Additional OIDs to collect, as a mapping of metric name to OID",
+                validators=[axians_netbox_pdu.models.validate_metric_oids],
+            ),
+        ),
+        migrations.AddField(
+            model_name="pdustatus",
+            name="metrics",
+            field=models.JSONField(
+                blank=True, default=dict, help_text="Values of the additional metrics of the PDUConfig"
+            ),
+        ),
+    ]
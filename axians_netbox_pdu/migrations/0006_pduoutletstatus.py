@@ -0,0 +1,45 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dcim", "0106_role_default_color"),
+        ("axians_netbox_pdu", "0005_metric_oids"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pduconfig",
+            name="outlet_power_oid",
+            field=models.CharField(
+                blank=True,
+                help_text="OID of the power usage column of the outlet table, walked per outlet",
+                max_length=255,
+            ),
+        ),
+        migrations.CreateModel(
+            name="PDUOutletStatus",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False)),
+                (
+                    "power_usage",
+                    models.PositiveSmallIntegerField(blank=True, help_text="Current Outlet Power Usage", null=True),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pduoutletstatuses",
+                        to="dcim.Device",
+                    ),
+                ),
+                (
+                    "power_outlet",
+                    models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to="dcim.PowerOutlet"),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def rollup_model(name):
+    return migrations.CreateModel(
+        name=name,
+        fields=[
+            ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False)),
+            ("period_start", models.DateTimeField(db_index=True)),
+            ("samples", models.PositiveIntegerField()),
+            ("power_usage_min", models.PositiveSmallIntegerField()),
+            ("power_usage_avg", models.FloatField()),
+            ("power_usage_max", models.PositiveSmallIntegerField()),
+            (
+                "device",
+                models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to="dcim.Device"),
+            ),
+        ],
+        options={"abstract": False, "unique_together": {("device", "period_start")}},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dcim", "0106_role_default_color"),
+        ("axians_netbox_pdu", "0006_pduoutletstatus"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PDUReading",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("timestamp", models.DateTimeField(db_index=True)),
+                ("power_usage", models.PositiveSmallIntegerField()),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="pdureadings", to="dcim.Device"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="pdureading",
+            index=models.Index(fields=["device", "timestamp"], name="axians_pdu_reading_device_ts"),
+        ),
+        rollup_model("PDUReadingFiveMinutes"),
+        rollup_model("PDUReadingHourly"),
+        rollup_model("PDUReadingDaily"),
+    ]
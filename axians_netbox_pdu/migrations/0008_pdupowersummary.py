@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("axians_netbox_pdu", "0007_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PDUPowerSummary",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False)),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[("rack", "Rack"), ("location", "Location"), ("site", "Site"), ("region", "Region")],
+                        max_length=50,
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField(help_text="Id of the rack, location, site or region")),
+                ("used_power", models.PositiveIntegerField(default=0, help_text="Power used by the PDUs")),
+                (
+                    "available_power",
+                    models.PositiveIntegerField(blank=True, help_text="Power available from the feeds", null=True),
+                ),
+                (
+                    "utilization",
+                    models.PositiveSmallIntegerField(blank=True, help_text="Percentage of power used", null=True),
+                ),
+                ("pdu_count", models.PositiveIntegerField(default=0)),
+                (
+                    "oldest_reading",
+                    models.DateTimeField(blank=True, help_text="Time of the stalest PDU reading", null=True),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={"unique_together": {("scope", "object_id")}},
+        ),
+    ]
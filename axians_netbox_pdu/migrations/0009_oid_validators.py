@@ -0,0 +1,33 @@
+import axians_netbox_pdu.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("axians_netbox_pdu", "0008_pdupowersummary"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pduconfig",
+            name="power_usage_oid",
+            field=models.CharField(
+                blank=True,
+                help_text="OID string to collect power usage",
+                max_length=255,
+                null=True,
+                validators=[axians_netbox_pdu.models.validate_oid],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pduconfig",
+            name="outlet_power_oid",
+            field=models.CharField(
+                blank=True,
+                help_text="OID of the power usage column of the outlet table, walked per outlet",
+                max_length=255,
+                validators=[axians_netbox_pdu.models.validate_oid],
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("axians_netbox_pdu", "0009_oid_validators"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pduconfig",
+            name="power_usage_unit",
+            field=models.CharField(
+                choices=[("watts", "Watts")], help_text="The unit of power to be collected", max_length=255
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pdustatus",
+            name="power_usage",
+            field=models.PositiveSmallIntegerField(blank=True, help_text="Current PDU Power Usage", null=True),
+        ),
+    ]
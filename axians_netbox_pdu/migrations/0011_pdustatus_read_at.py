@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("axians_netbox_pdu", "0010_sync_field_options"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pdustatus",
+            name="read_at",
+            field=models.DateTimeField(blank=True, help_text="Time of the reading holding the power usage", null=True),
+        ),
+    ]
@@ -1,6 +1,30 @@
+import re
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.urls import reverse
-from .choices import PDUUnitChoices
+from django.utils import timezone
+from .choices import PDUPollStateChoices, PDUSummaryScopeChoices, PDUUnitChoices
+
+# Largest value the PDUStatus.power_usage column can hold
+MAX_POWER_USAGE = 32767
+
+OID_RE = re.compile(r"^\.?(\d+|\{index\})(\.(\d+|\{index\}))+$")
+
+
+def validate_oid(value):
+    """Validate a numeric OID, arcs may be the {index} placeholder."""
+    if not isinstance(value, str) or not OID_RE.match(value):
+        raise ValidationError(f"Invalid OID {value!r}, expected a numeric OID such as 1.3.6.1.2.1.1.3.0.")
+
+
+def validate_metric_oids(value):
+    """Validate a mapping of metric name to numeric OID, arcs may be the {index} placeholder."""
+    if not isinstance(value, dict):
+        raise ValidationError("Metric OIDs must be a mapping of metric name to OID.")
+    for name, oid in value.items():
+        if not isinstance(oid, str) or not OID_RE.match(oid):
+            raise ValidationError(f"Invalid OID {oid!r} for metric {name!r}.")
 
 
 class PDUConfig(models.Model):
@@ -9,14 +33,28 @@ class PDUConfig(models.Model):
     device_type = models.OneToOneField(to="dcim.DeviceType", on_delete=models.CASCADE, blank=True, null=True)
 
     power_usage_oid = models.CharField(
-        max_length=255, help_text="OID string to collect power usage", blank=True, null=True
+        max_length=255, help_text="OID string to collect power usage", blank=True, null=True, validators=[validate_oid]
     )
 
     power_usage_unit = models.CharField(
         max_length=255, choices=PDUUnitChoices, help_text="The unit of power to be collected"
     )
 
-    csv_headers = ["device_type", "power_usage_oid", "power_usage_unit"]
+    metric_oids = models.JSONField(
+        default=dict,
+        blank=True,
+        validators=[validate_metric_oids],
+        help_text="Additional OIDs to collect, as a mapping of metric name to OID",
+    )
+
+    outlet_power_oid = models.CharField(
+        max_length=255,
+        blank=True,
+        validators=[validate_oid],
+        help_text="OID of the power usage column of the outlet table, walked per outlet",
+    )
+
+    csv_headers = ["device_type", "power_usage_oid", "power_usage_unit", "outlet_power_oid"]
 
     def __str__(self):
         """String representation of an PDUConfig."""
@@ -33,10 +71,139 @@ class PDUStatus(models.Model):
 
     power_usage = models.PositiveSmallIntegerField(blank=True, null=True, help_text="Current PDU Power Usage")
 
-    updated_at = models.DateTimeField(auto_now=True)
+    metrics = models.JSONField(default=dict, blank=True, help_text="Values of the additional metrics of the PDUConfig")
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    read_at = models.DateTimeField(blank=True, null=True, help_text="Time of the reading holding the power usage")
 
     def get_power_usage(self):
         return f"{self.power_usage} {PDUUnitChoices.UNIT_WATTS.capitalize()}"
 
     def get_power_usage_watts(self):
         return self.power_usage
+
+
+class PDUOutletStatus(models.Model):
+    """Power usage of a single outlet of a PDU, collected by walking the outlet table of the PDU."""
+
+    power_outlet = models.OneToOneField(to="dcim.PowerOutlet", on_delete=models.CASCADE)
+
+    device = models.ForeignKey(to="dcim.Device", on_delete=models.CASCADE, related_name="pduoutletstatuses")
+
+    power_usage = models.PositiveSmallIntegerField(blank=True, null=True, help_text="Current Outlet Power Usage")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """String representation of a PDUOutletStatus."""
+        return f"{self.power_outlet}"
+
+
+class PDUReading(models.Model):
+    """A single power usage reading of a PDU, appended to the history on every poll or push."""
+
+    id = models.BigAutoField(primary_key=True)
+
+    device = models.ForeignKey(to="dcim.Device", on_delete=models.CASCADE, related_name="pdureadings")
+
+    timestamp = models.DateTimeField(db_index=True)
+
+    power_usage = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=["device", "timestamp"], name="axians_pdu_reading_device_ts")]
+
+
+class PDUReadingRollup(models.Model):
+    """Minimum, average and maximum power usage of a PDU over a period starting at ``period_start``."""
+
+    device = models.ForeignKey(to="dcim.Device", on_delete=models.CASCADE, related_name="+")
+
+    period_start = models.DateTimeField(db_index=True)
+
+    samples = models.PositiveIntegerField()
+
+    power_usage_min = models.PositiveSmallIntegerField()
+
+    power_usage_avg = models.FloatField()
+
+    power_usage_max = models.PositiveSmallIntegerField()
+
+    class Meta:
+        abstract = True
+        unique_together = [("device", "period_start")]
+
+
+class PDUReadingFiveMinutes(PDUReadingRollup):
+    """Five minute rollup of the PDU readings."""
+
+
+class PDUReadingHourly(PDUReadingRollup):
+    """Hourly rollup of the five minute rollups."""
+
+
+class PDUReadingDaily(PDUReadingRollup):
+    """Daily rollup of the hourly rollups."""
+
+
+class PDUPowerSummary(models.Model):
+    """Power usage of the PDUs of a rack, location, site or region, kept up to date as readings change.
+
+    Locations and regions include their child locations and regions. Power is in watts.
+    """
+
+    scope = models.CharField(max_length=50, choices=PDUSummaryScopeChoices)
+
+    object_id = models.PositiveIntegerField(help_text="Id of the rack, location, site or region")
+
+    used_power = models.PositiveIntegerField(default=0, help_text="Power used by the PDUs")
+
+    available_power = models.PositiveIntegerField(blank=True, null=True, help_text="Power available from the feeds")
+
+    utilization = models.PositiveSmallIntegerField(blank=True, null=True, help_text="Percentage of power used")
+
+    pdu_count = models.PositiveIntegerField(default=0)
+
+    oldest_reading = models.DateTimeField(blank=True, null=True, help_text="Time of the stalest PDU reading")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("scope", "object_id")]
+
+    def __str__(self):
+        """String representation of a PDUPowerSummary."""
+        return f"{self.get_scope_display()} {self.object_id}"
+
+    @property
+    def oldest_reading_age(self):
+        return None if self.oldest_reading is None else timezone.now() - self.oldest_reading
+
+
+class PDUPollState(models.Model):
+    """Circuit breaker state of a PDU that failed to answer recent polls.
+
+    Healthy devices have no PDUPollState. After ``quarantine_threshold`` consecutive failures a device is quarantined
+    and only probed again once ``next_poll_at`` is reached, with the delay doubling after every failed probe.
+    """
+
+    device = models.OneToOneField(to="dcim.Device", on_delete=models.CASCADE)
+
+    state = models.CharField(max_length=50, choices=PDUPollStateChoices, default=PDUPollStateChoices.STATE_FAILING)
+
+    consecutive_failures = models.PositiveIntegerField(default=0)
+
+    last_error = models.CharField(max_length=255, blank=True, help_text="Error raised by the last failed poll")
+
+    last_failure_at = models.DateTimeField(blank=True, null=True)
+
+    next_poll_at = models.DateTimeField(blank=True, null=True, help_text="Quarantined until this time")
+
+    def __str__(self):
+        """String representation of a PDUPollState."""
+        return f"{self.device} ({self.get_state_display()})"
+
+    @property
+    def is_quarantined(self):
+        return self.state != PDUPollStateChoices.STATE_FAILING
@@ -0,0 +1,137 @@
+"""PDU panels of the device and rack pages.
+
+The panels are served by their own views and fetched by the page once it is displayed, so that slow PDU queries never
+hold up the first paint of a NetBox page. The rendered HTML is cached for ``panel_cache_ttl`` seconds under a key
+holding the time of the last reading of the object, so a new reading shows up on the next load whatever the TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, Max, OuterRef, Subquery, Sum
+from django.template.loader import render_to_string
+from packaging import version
+
+from dcim.models import Device, PowerFeed, Rack
+
+from .choices import PDUSummaryScopeChoices
+from .models import PDUOutletStatus, PDUPollState, PDUPowerSummary
+from .status_cache import get_status
+from .utilities import format_power_utilization
+
+NETBOX_CURRENT_VERSION = version.parse(settings.VERSION)
+
+
+def get_device_panel(device):
+    """Return the template and context of the PDU panel of ``device``, None when it has no PDU data."""
+    if NETBOX_CURRENT_VERSION >= version.parse("3.0"):
+        template_filename = "axians_netbox_pdu/device_power_usage_3_x.html"
+    else:
+        template_filename = "axians_netbox_pdu/device_power_usage.html"
+
+    pdustatus = get_status(device.pk)
+    pdupollstate = PDUPollState.objects.filter(device=device).first()
+    if pdustatus is None and pdupollstate is None:
+        return None
+    pduoutletstatuses = (
+        PDUOutletStatus.objects.filter(device=device).select_related("power_outlet").order_by("power_outlet___name")
+    )
+    return (
+        template_filename,
+        {"pdustatus": pdustatus, "pdupollstate": pdupollstate, "pduoutletstatuses": pduoutletstatuses},
+    )
+
+
+def get_rack_panel(rack):
+    """Return the template and context of the PDU panel of ``rack``, None when it holds no PDU."""
+    # A single query fetches the PDUs with everything the device table and the summary need.
+    pdus = list(Device.objects.filter(rack=rack, pdustatus__isnull=False).select_related("pdustatus", "pdupollstate"))
+    if not pdus:
+        return None
+
+    if NETBOX_CURRENT_VERSION >= version.parse("3.0"):
+        template_filename = "axians_netbox_pdu/rack_power_usage_3_x.html"
+    else:
+        template_filename = "axians_netbox_pdu/rack_power_usage.html"
+
+    # A second query reads the summary of the rack along with the power of its feeds, needed when it has none.
+    summary = PDUPowerSummary.objects.filter(scope=PDUSummaryScopeChoices.SCOPE_RACK, object_id=OuterRef("pk"))
+    feeds = (
+        PowerFeed.objects.filter(rack=OuterRef("pk"))
+        .values("rack")
+        .annotate(total=Sum("available_power"))
+        .values("total")
+    )
+    summarized, summary_used_power, summary_available_power, feeds_available_power = (
+        Rack.objects.filter(pk=rack.pk)
+        .annotate(
+            summarized=Exists(summary),
+            summary_used_power=Subquery(summary.values("used_power")[:1]),
+            summary_available_power=Subquery(summary.values("available_power")[:1]),
+            feeds_available_power=Subquery(feeds),
+        )
+        .values_list("summarized", "summary_used_power", "summary_available_power", "feeds_available_power")
+        .get()
+    )
+    if summarized:
+        used_power, available_power = summary_used_power, summary_available_power
+    else:
+        # Not summarized yet, until the next reading or full refresh: add up the PDUs already fetched.
+        used_power = sum(pdu.pdustatus.power_usage or 0 for pdu in pdus)
+        available_power = feeds_available_power
+    (
+        total_available_power,
+        total_power_usage,
+        total_power_usage_percentage,
+        total_power_usage_unit,
+    ) = format_power_utilization(
+        available_power, used_power, settings.PLUGINS_CONFIG["axians_netbox_pdu"]["rack_view_summary_unit"]
+    )
+    return (
+        template_filename,
+        {
+            "pdus": pdus,
+            "total_power_usage": total_power_usage,
+            "total_available_power": total_available_power,
+            "total_power_usage_percentage": total_power_usage_percentage,
+            "total_power_usage_unit": total_power_usage_unit,
+        },
+    )
+
+
+def get_device_panel_version(device):
+    """Return what changes whenever the PDU panel of ``device`` does: its last reading and last failure."""
+    stamps = Device.objects.filter(pk=device.pk).values_list("pdustatus__updated_at", "pdupollstate__last_failure_at")
+    return stamps.first() or (None, None)
+
+
+def get_rack_panel_version(rack):
+    """Return what changes whenever the PDU panel of ``rack`` does: the last reading and failure of its PDUs."""
+    stamps = Device.objects.filter(rack=rack).aggregate(
+        last_reading=Max("pdustatus__updated_at"), last_failure=Max("pdupollstate__last_failure_at")
+    )
+    return stamps["last_reading"], stamps["last_failure"]
+
+
+# Panel kind: (function returning the template and context, function returning the version)
+PANELS = {
+    "device": (get_device_panel, get_device_panel_version),
+    "rack": (get_rack_panel, get_rack_panel_version),
+}
+
+
+def render_panel(request, kind, obj):
+    """Return the HTML of the ``kind`` PDU panel of ``obj``, empty when there is nothing to show."""
+    get_panel, get_version = PANELS[kind]
+    ttl = settings.PLUGINS_CONFIG["axians_netbox_pdu"]["panel_cache_ttl"]
+    key = None
+    if ttl:
+        stamps = "-".join("" if stamp is None else str(stamp.timestamp()) for stamp in get_version(obj))
+        key = f"axians_netbox_pdu:panel:{kind}:{obj.pk}:{stamps}"
+        content = cache.get(key)
+        if content is not None:
+            return content
+
+    panel = get_panel(obj)
+    content = "" if panel is None else render_to_string(panel[0], panel[1], request)
+    if key is not None:
+        cache.set(key, content, ttl)
+    return content
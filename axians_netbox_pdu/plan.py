@@ -0,0 +1,160 @@
+"""Compiled list of the PDUs the poller has to query.
+
+The plan is a flat list of lightweight ``PollTarget`` records built with a single ``values_list()`` query and cached in
+every worker process. Changes to devices, IP addresses and PDU configurations are published by the signal handlers
+of ``signals.py`` to a Redis change log, each process then reloads only the devices that changed since it last
+looked at the log.
+"""
+import threading
+
+import django_rq
+
+from dcim.models import Device
+
+# Placeholder of the OIDs of a PDUConfig replaced by the position of the device in its virtual chassis, which tells
+# apart daisy-chained PDUs answering on the same management IP.
+OID_INDEX_PLACEHOLDER = "{index}"
+
+PLAN_CHANGES_KEY = "axians_netbox_pdu:plan:changes"
+PLAN_SEQUENCE_KEY = "axians_netbox_pdu:plan:sequence"
+
+# Change log member requesting a rebuild of the whole plan
+INVALIDATE_ALL = "*"
+
+# Bump the sequence and stamp every changed device with it in one atomic step, so a reader can never see a later
+# sequence number before an earlier one has been written.
+PUBLISH_CHANGES_SCRIPT = """
+local sequence = redis.call('INCR', KEYS[1])
+for _, member in ipairs(ARGV) do
+    redis.call('ZADD', KEYS[2], sequence, member)
+end
+return sequence
+"""
+
+
+class PollTarget:
+    """Everything needed to poll a single PDU, without the weight of a Device instance."""
+
+    __slots__ = ("device_id", "name", "ip", "oid", "unit", "site_id", "metric_oids", "outlet_oid")
+
+    def __init__(self, device_id, name, ip, oid, unit, site_id, metric_oids=None, outlet_oid=None):
+        self.device_id = device_id
+        self.name = name
+        self.ip = ip
+        self.oid = oid
+        self.unit = unit
+        self.site_id = site_id
+        self.metric_oids = metric_oids or {}
+        self.outlet_oid = outlet_oid or None
+
+    @property
+    def oids(self):
+        """Every OID polled on the device, the power usage first and then the additional metrics."""
+        return [self.oid, *self.metric_oids.values()]
+
+    def __repr__(self):
+        return f"<PollTarget {self.name} ({self.ip})>"
+
+
+def _format_oid(oid, index):
+    return oid.replace(OID_INDEX_PLACEHOLDER, str(index)) if oid else oid
+
+
+def _load_targets(device_ids=None):
+    """Return the poll targets of every eligible device, or of the eligible devices among ``device_ids``.
+
+    The ``{index}`` placeholder of the configured OIDs is replaced by the virtual chassis position of the device, or 1
+    for a device outside of any virtual chassis.
+    """
+    devices = Device.objects.exclude(device_type__pduconfig__isnull=True).exclude(primary_ip4__isnull=True)
+    if device_ids is not None:
+        devices = devices.filter(pk__in=device_ids)
+    rows = devices.values_list(
+        "pk",
+        "name",
+        "primary_ip4__address",
+        "device_type__pduconfig__power_usage_oid",
+        "device_type__pduconfig__power_usage_unit",
+        "site_id",
+        "device_type__pduconfig__metric_oids",
+        "device_type__pduconfig__outlet_power_oid",
+        "vc_position",
+    )
+    targets = {}
+    for device_id, name, address, oid, unit, site_id, metric_oids, outlet_oid, vc_position in rows.iterator():
+        index = 1 if vc_position is None else vc_position
+        targets[device_id] = PollTarget(
+            device_id,
+            name,
+            str(address.ip),
+            _format_oid(oid, index),
+            unit,
+            site_id,
+            {metric: _format_oid(metric_oid, index) for metric, metric_oid in (metric_oids or {}).items()},
+            _format_oid(outlet_oid, index),
+        )
+    return targets
+
+
+class PollPlan:
+    """Per-process cache of the poll targets, kept in sync with the Redis change log."""
+
+    def __init__(self):
+        self._targets = {}
+        self._sequence = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Forget the cached targets, the next call to ``get_targets`` rebuilds the whole plan."""
+        with self._lock:
+            self._targets = {}
+            self._sequence = None
+
+    def _rebuild(self, connection):
+        # Read the sequence before the database so changes made during the rebuild are applied again next time.
+        sequence = int(connection.get(PLAN_SEQUENCE_KEY) or 0)
+        self._targets = _load_targets()
+        self._sequence = sequence
+
+    def refresh(self):
+        """Apply the changes published since the last refresh."""
+        connection = django_rq.get_connection()
+        with self._lock:
+            if self._sequence is None:
+                self._rebuild(connection)
+                return
+
+            changes = connection.zrangebyscore(PLAN_CHANGES_KEY, f"({self._sequence}", "+inf", withscores=True)
+            if not changes:
+                return
+            members = {member.decode() for member, _ in changes}
+            if INVALIDATE_ALL in members:
+                self._rebuild(connection)
+                return
+
+            sequence = int(max(score for _, score in changes))
+            device_ids = [int(member) for member in members]
+            targets = _load_targets(device_ids)
+            for device_id in device_ids:
+                if device_id in targets:
+                    self._targets[device_id] = targets[device_id]
+                else:
+                    self._targets.pop(device_id, None)
+            self._sequence = sequence
+
+    def get_targets(self):
+        """Return the up to date list of poll targets."""
+        self.refresh()
+        return list(self._targets.values())
+
+
+poll_plan = PollPlan()
+
+
+def invalidate_poll_targets(device_ids):
+    """Publish that the poll targets of ``device_ids`` changed, ``None`` invalidates the whole plan."""
+    members = [INVALIDATE_ALL] if device_ids is None else [str(device_id) for device_id in set(device_ids)]
+    if not members:
+        return
+    connection = django_rq.get_connection()
+    connection.register_script(PUBLISH_CHANGES_SCRIPT)(keys=[PLAN_SEQUENCE_KEY, PLAN_CHANGES_KEY], args=members)
@@ -0,0 +1,151 @@
+"""Per-process pool of reusable easysnmp sessions.
+
+Building an easysnmp ``Session`` opens a socket and, with SNMPv3, runs USM engine discovery before the first request
+can be sent. Sessions are therefore kept per host and reused from one poll cycle to the next: the engine ID, boots
+and time discovered by net-snmp stay in the pooled session, so later v3 polls of the same agent skip discovery.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from easysnmp import EasySNMPConnectionError, EasySNMPError, Session
+
+# Session keyword arguments identifying a session, any difference means a separate session
+SESSION_KEY_FIELDS = (
+    "hostname",
+    "version",
+    "remote_port",
+    "community",
+    "security_level",
+    "security_username",
+    "auth_protocol",
+    "auth_password",
+    "privacy_protocol",
+    "privacy_password",
+    "context",
+    "timeout",
+    "retries",
+)
+
+
+def get_session_options(config):
+    """Return the easysnmp Session arguments for the configured SNMP version and credentials."""
+    version = int(config["snmp_version"])
+    options = {
+        "version": version,
+        "remote_port": config["snmp_port"],
+        "timeout": config["snmp_timeout"],
+        "retries": config["snmp_retries"],
+        # Walked OIDs are matched against the configured numeric OIDs, never translate them to MIB names.
+        "use_numeric": True,
+    }
+    if version == 3:
+        options.update(
+            security_level=config["snmp_security_level"],
+            security_username=config["snmp_security_username"],
+            auth_protocol=config["snmp_auth_protocol"],
+            auth_password=config["snmp_auth_password"],
+            privacy_protocol=config["snmp_privacy_protocol"],
+            privacy_password=config["snmp_privacy_password"],
+            context=config["snmp_context"],
+        )
+    else:
+        options["community"] = config["snmp_read"]
+    return options
+
+
+class SNMPSessionPool:
+    """Pool of idle easysnmp sessions keyed by host, version and credentials.
+
+    A session is only ever used by one thread at a time: it is taken out of the pool for the duration of a request and
+    handed back afterwards. At most ``max_size`` idle sessions are kept, the least recently used one being evicted
+    first, and sessions idle for more than ``idle_timeout`` seconds are dropped.
+    """
+
+    def __init__(self, max_size=1024, idle_timeout=600):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        """Drop every idle session."""
+        with self._lock:
+            self._idle.clear()
+            self._size = 0
+
+    def _evict(self, now):
+        """Drop expired sessions, then the least recently used ones until the pool fits in ``max_size``."""
+        cutoff = now - self.idle_timeout
+        for key in list(self._idle):
+            sessions = self._idle[key]
+            while sessions and sessions[0][1] < cutoff:
+                sessions.popleft()
+                self._size -= 1
+            if not sessions:
+                del self._idle[key]
+        while self._size > self.max_size and self._idle:
+            key, sessions = next(iter(self._idle.items()))
+            sessions.popleft()
+            self._size -= 1
+            if not sessions:
+                del self._idle[key]
+
+    def _acquire(self, key, options):
+        with self._lock:
+            self._evict(time.monotonic())
+            sessions = self._idle.get(key)
+            if sessions:
+                session, _ = sessions.pop()
+                self._size -= 1
+                if not sessions:
+                    del self._idle[key]
+                return session
+        return Session(**options)
+
+    def _release(self, key, session):
+        now = time.monotonic()
+        with self._lock:
+            self._idle.setdefault(key, deque()).append((session, now))
+            self._idle.move_to_end(key)
+            self._size += 1
+            self._evict(now)
+
+    @contextmanager
+    def session(self, **options):
+        """Borrow a session built with the easysnmp ``Session`` arguments ``options``."""
+        key = tuple(options.get(field) for field in SESSION_KEY_FIELDS)
+        session = self._acquire(key, options)
+        try:
+            yield session
+        except EasySNMPConnectionError:
+            # The session itself is broken, let it be garbage collected instead of handing it out again.
+            raise
+        except EasySNMPError:
+            # Timeouts and other SNMP errors leave the session usable.
+            self._release(key, session)
+            raise
+        self._release(key, session)
+
+
+_session_pool = None
+_session_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """Return the session pool of this process, sized from the plugin settings."""
+    global _session_pool  # pylint:disable=global-statement
+    if _session_pool is None:
+        with _session_pool_lock:
+            if _session_pool is None:
+                config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+                _session_pool = SNMPSessionPool(
+                    max_size=config["snmp_session_pool_size"], idle_timeout=config["snmp_session_idle_timeout"]
+                )
+    return _session_pool
@@ -0,0 +1,75 @@
+"""Signal handlers keeping the poll plan, the power summaries and the status cache in sync with their sources."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from dcim.models import Device, PowerFeed
+from ipam.models import IPAddress
+
+from .models import PDUConfig, PDUStatus
+from .plan import invalidate_poll_targets
+from .status_cache import cache_statuses
+from .summaries import refresh_power_summaries
+
+
+def _invalidate_on_commit(device_ids):
+    """Publish the change once the transaction is committed, so other processes reload the new data."""
+    device_ids = list(device_ids)
+    if device_ids:
+        transaction.on_commit(lambda: invalidate_poll_targets(device_ids))
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_device(instance, **kwargs):
+    _invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=IPAddress)
+@receiver(pre_delete, sender=IPAddress)
+def invalidate_ip_address(instance, **kwargs):
+    # Deleting an address clears the primary IP of its device without a Device signal, so look it up beforehand.
+    _invalidate_on_commit(Device.objects.filter(primary_ip4=instance).values_list("pk", flat=True))
+
+
+@receiver(pre_save, sender=PDUConfig)
+def remember_pduconfig_device_type(instance, **kwargs):
+    instance._previous_device_type_id = (
+        PDUConfig.objects.filter(pk=instance.pk).values_list("device_type_id", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=PDUConfig)
+@receiver(post_delete, sender=PDUConfig)
+def invalidate_pduconfig(instance, **kwargs):
+    device_type_ids = {instance.device_type_id, getattr(instance, "_previous_device_type_id", None)} - {None}
+    _invalidate_on_commit(Device.objects.filter(device_type_id__in=device_type_ids).values_list("pk", flat=True))
+
+
+@receiver(pre_save, sender=PowerFeed)
+def remember_power_feed_rack(instance, **kwargs):
+    instance._previous_rack_id = (
+        PowerFeed.objects.filter(pk=instance.pk).values_list("rack_id", flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=PowerFeed)
+@receiver(post_delete, sender=PowerFeed)
+def refresh_power_feed_summaries(instance, **kwargs):
+    # The available power of the racks of the feed changed, the one it left included, refresh their summaries
+    # through the PDUs they hold.
+    rack_ids = {instance.rack_id, getattr(instance, "_previous_rack_id", None)} - {None}
+    if rack_ids:
+        device_ids = list(PDUStatus.objects.filter(device__rack_id__in=rack_ids).values_list("device_id", flat=True))
+        if device_ids:
+            transaction.on_commit(lambda: refresh_power_summaries(device_ids))
+
+
+@receiver(post_save, sender=PDUStatus)
+@receiver(post_delete, sender=PDUStatus)
+def cache_pdustatus(instance, **kwargs):
+    # Bulk writes bypass this signal and refresh the cache themselves.
+    device_ids = [instance.device_id]
+    transaction.on_commit(lambda: cache_statuses(device_ids))
@@ -0,0 +1,467 @@
+"""Minimal asyncio SNMP v1/v2c client used by the asyncio collector backend.
+
+Only the parts of SNMP the plugin needs are implemented: BER encoding and decoding of messages, GET requests and
+GETBULK walks multiplexed over a single UDP socket per address family.
+"""
+import asyncio
+import ipaddress
+import itertools
+import random
+import socket
+
+# ASN.1 / BER tags
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_IPADDRESS = 0x40
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_OPAQUE = 0x44
+TAG_COUNTER64 = 0x46
+TAG_NOSUCHOBJECT = 0x80
+TAG_NOSUCHINSTANCE = 0x81
+TAG_ENDOFMIBVIEW = 0x82
+
+# PDU types
+PDU_GET_REQUEST = 0xA0
+PDU_GET_RESPONSE = 0xA2
+PDU_GETBULK_REQUEST = 0xA5
+
+# Bytes reserved for the headers of a message, enough for an SNMPv3 header with authentication and privacy
+MESSAGE_OVERHEAD = 128
+# Bytes reserved for each value of a response, enough for a Counter64 or a short display string
+VALUE_SIZE_ESTIMATE = 24
+
+SNMP_TYPES = {
+    TAG_INTEGER: "INTEGER",
+    TAG_OCTET_STRING: "OCTETSTR",
+    TAG_NULL: "NULL",
+    TAG_OID: "OBJECTID",
+    TAG_IPADDRESS: "IPADDR",
+    TAG_COUNTER32: "COUNTER",
+    TAG_GAUGE32: "GAUGE",
+    TAG_TIMETICKS: "TICKS",
+    TAG_OPAQUE: "OPAQUE",
+    TAG_COUNTER64: "COUNTER64",
+    TAG_NOSUCHOBJECT: "NOSUCHOBJECT",
+    TAG_NOSUCHINSTANCE: "NOSUCHINSTANCE",
+    TAG_ENDOFMIBVIEW: "ENDOFMIBVIEW",
+}
+
+ERROR_STATUS = (
+    "noError",
+    "tooBig",
+    "noSuchName",
+    "badValue",
+    "readOnly",
+    "genErr",
+    "noAccess",
+    "wrongType",
+    "wrongLength",
+    "wrongEncoding",
+    "wrongValue",
+    "noCreation",
+    "inconsistentValue",
+    "resourceUnavailable",
+    "commitFailed",
+    "undoFailed",
+    "authorizationError",
+    "notWritable",
+    "inconsistentName",
+)
+
+# SNMP versions are encoded as 0 for v1 and 1 for v2c
+SNMP_VERSIONS = {1: 0, 2: 1}
+
+
+class SNMPError(Exception):
+    """Base class for errors raised by the asyncio SNMP client."""
+
+
+class SNMPTimeoutError(SNMPError):
+    """Raised when an agent did not answer within timeout and retries."""
+
+
+class SNMPDecodeError(SNMPError):
+    """Raised when a datagram is not a valid SNMP message."""
+
+
+class SNMPVariable:
+    """A single varbind returned by an agent, shaped like easysnmp's SNMPVariable."""
+
+    __slots__ = ("oid", "oid_index", "value", "snmp_type")
+
+    def __init__(self, oid, value, snmp_type, oid_index=""):
+        self.oid = oid
+        self.oid_index = oid_index
+        self.value = value
+        self.snmp_type = snmp_type
+
+    def __repr__(self):
+        return f"<SNMPVariable oid={self.oid!r} value={self.value!r} snmp_type={self.snmp_type!r}>"
+
+
+#
+# BER encoding
+#
+
+
+def _encode_length(length):
+    if length < 0x80:
+        return bytes((length,))
+    raw = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes((0x80 | len(raw),)) + raw
+
+
+def _encode_tlv(tag, value):
+    return bytes((tag,)) + _encode_length(len(value)) + value
+
+
+def encode_integer(value, tag=TAG_INTEGER):
+    """Encode a signed integer using the minimal two's complement form."""
+    length = max(1, (value + (value < 0)).bit_length() // 8 + 1)
+    return _encode_tlv(tag, value.to_bytes(length, "big", signed=True))
+
+
+def encode_unsigned(value, tag):
+    """Encode an unsigned application integer such as a Gauge32 or Counter64."""
+    length = value.bit_length() // 8 + 1
+    return _encode_tlv(tag, value.to_bytes(length, "big"))
+
+
+def encode_octet_string(value):
+    if isinstance(value, str):
+        value = value.encode()
+    return _encode_tlv(TAG_OCTET_STRING, value)
+
+
+def encode_null(tag=TAG_NULL):
+    return _encode_tlv(tag, b"")
+
+
+def encode_oid(oid):
+    try:
+        arcs = [int(arc) for arc in oid.strip(".").split(".")]
+    except ValueError:
+        raise SNMPError(f"Invalid OID {oid!r}, only numeric OIDs are supported.")
+    if len(arcs) < 2:
+        raise SNMPError(f"Invalid OID {oid!r}.")
+    encoded = bytearray()
+    for arc in [arcs[0] * 40 + arcs[1]] + arcs[2:]:
+        chunk = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        encoded.extend(reversed(chunk))
+    return _encode_tlv(TAG_OID, bytes(encoded))
+
+
+def encode_sequence(*items, tag=TAG_SEQUENCE):
+    return _encode_tlv(tag, b"".join(items))
+
+
+def encode_value(value):
+    """Encode a python value as a varbind value, ``None`` becomes NULL."""
+    if value is None:
+        return encode_null()
+    if isinstance(value, bool) or not isinstance(value, (int, str, bytes)):
+        raise SNMPError(f"Unsupported value {value!r}.")
+    if isinstance(value, int):
+        return encode_integer(value)
+    return encode_octet_string(value)
+
+
+def encode_message(community, pdu_type, request_id, varbinds, version=2, error_status=0, error_index=0):
+    """Encode a v1/v2c message, ``varbinds`` is a list of ``(oid, value)`` pairs."""
+    try:
+        encoded_version = SNMP_VERSIONS[int(version)]
+    except (KeyError, ValueError):
+        raise SNMPError(f"Unsupported SNMP version {version!r}.")
+    encoded_varbinds = encode_sequence(
+        *(encode_sequence(encode_oid(oid), encode_value(value)) for oid, value in varbinds)
+    )
+    pdu = encode_sequence(
+        encode_integer(request_id),
+        encode_integer(error_status),
+        encode_integer(error_index),
+        encoded_varbinds,
+        tag=pdu_type,
+    )
+    return encode_sequence(encode_integer(encoded_version), encode_octet_string(community), pdu)
+
+
+def split_oids(oids, max_message_size):
+    """Split ``oids`` into chunks small enough for the response to each chunk to fit in ``max_message_size`` bytes.
+
+    The size of a response is estimated from its encoded OIDs plus ``VALUE_SIZE_ESTIMATE`` bytes for every value, a
+    chunk always holds at least one OID.
+    """
+    chunks = []
+    chunk = []
+    size = MESSAGE_OVERHEAD
+    for oid in oids:
+        varbind_size = len(encode_sequence(encode_oid(oid))) + VALUE_SIZE_ESTIMATE
+        if chunk and size + varbind_size > max_message_size:
+            chunks.append(chunk)
+            chunk = []
+            size = MESSAGE_OVERHEAD
+        chunk.append(oid)
+        size += varbind_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+#
+# BER decoding
+#
+
+
+def _decode_tlv(data, offset):
+    """Return ``(tag, value, next_offset)`` for the TLV starting at ``offset``."""
+    try:
+        tag = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7F
+            if not size or size > 4:
+                raise SNMPDecodeError("Unsupported BER length encoding.")
+            length = int.from_bytes(data[offset : offset + size], "big")
+            offset += size
+    except IndexError:
+        raise SNMPDecodeError("Truncated BER data.")
+    end = offset + length
+    if end > len(data):
+        raise SNMPDecodeError("Truncated BER data.")
+    return tag, data[offset:end], end
+
+
+def _decode_sequence(data):
+    items = []
+    offset = 0
+    while offset < len(data):
+        tag, value, offset = _decode_tlv(data, offset)
+        items.append((tag, value))
+    return items
+
+
+def decode_oid(data):
+    if not data:
+        raise SNMPDecodeError("Empty OID.")
+    arcs = []
+    arc = 0
+    for byte in data:
+        arc = (arc << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(arc)
+            arc = 0
+    first = arcs[0]
+    prefix = [min(first // 40, 2), first - 40 * min(first // 40, 2)]
+    return "." + ".".join(str(arc) for arc in prefix + arcs[1:])
+
+
+def decode_value(tag, data):
+    """Decode a varbind value into the string form easysnmp would return."""
+    if tag == TAG_INTEGER:
+        return str(int.from_bytes(data, "big", signed=True))
+    if tag in (TAG_COUNTER32, TAG_GAUGE32, TAG_TIMETICKS, TAG_COUNTER64):
+        return str(int.from_bytes(data, "big"))
+    if tag in (TAG_OCTET_STRING, TAG_OPAQUE):
+        return data.decode("utf-8", errors="replace")
+    if tag == TAG_OID:
+        return decode_oid(data)
+    if tag == TAG_IPADDRESS:
+        return ".".join(str(byte) for byte in data)
+    if tag in SNMP_TYPES:
+        return SNMP_TYPES[tag]
+    raise SNMPDecodeError(f"Unsupported value type 0x{tag:02x}.")
+
+
+def decode_message(data):
+    """Decode a v1/v2c message.
+
+    Returns ``(version, community, pdu_type, request_id, error_status, error_index, varbinds)`` where varbinds is a
+    list of ``(oid, tag, raw_value)`` tuples.
+    """
+    tag, message, _ = _decode_tlv(data, 0)
+    if tag != TAG_SEQUENCE:
+        raise SNMPDecodeError("SNMP message is not a sequence.")
+    try:
+        (_, version), (_, community), (pdu_type, pdu) = _decode_sequence(message)
+        (_, request_id), (_, error_status), (_, error_index), (_, varbind_list) = _decode_sequence(pdu)
+        varbinds = []
+        for _, varbind in _decode_sequence(varbind_list):
+            (_, oid), (value_tag, value) = _decode_sequence(varbind)
+            varbinds.append((decode_oid(oid), value_tag, value))
+    except ValueError:
+        raise SNMPDecodeError("Malformed SNMP message.")
+    return (
+        int.from_bytes(version, "big"),
+        community,
+        pdu_type,
+        int.from_bytes(request_id, "big", signed=True),
+        int.from_bytes(error_status, "big"),
+        int.from_bytes(error_index, "big"),
+        varbinds,
+    )
+
+
+def _oid_key(oid):
+    return tuple(int(arc) for arc in oid.strip(".").split("."))
+
+
+#
+# asyncio transport
+#
+
+
+class _SNMPProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol matching responses to outstanding requests by request id."""
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            response = decode_message(data)
+        except SNMPDecodeError:
+            return
+        request_id = response[3]
+        host, future = self.pending.get(request_id, (None, None))
+        # Ignore late answers and answers coming from another host than the one we asked.
+        if future is None or future.done() or ipaddress.ip_address(addr[0].split("%")[0]) != host:
+            return
+        future.set_result(response)
+
+    def error_received(self, exc):
+        # ICMP errors are not tied to a request on an unconnected socket, outstanding requests will time out.
+        pass
+
+    def connection_lost(self, exc):
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_exception(SNMPError(f"SNMP socket closed: {exc}"))
+
+
+class AsyncSNMPClient:
+    """Send SNMP GET and GETBULK requests to many agents over one UDP socket per address family.
+
+    Requests are matched to responses using their request id, so thousands of them can be in flight on the same
+    socket at once.
+    """
+
+    def __init__(self, community, version=2, port=161, timeout=1, retries=3):
+        if int(version) not in SNMP_VERSIONS:
+            raise SNMPError(f"SNMP version {version} is not supported by the asyncio collector.")
+        self.community = community
+        self.version = int(version)
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self._endpoints = {}
+        self._request_ids = itertools.count(random.randint(1, 2 ** 30))  # nosec
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    async def _get_protocol(self, family):
+        if family not in self._endpoints:
+            local_addr = ("::", 0) if family == socket.AF_INET6 else ("0.0.0.0", 0)  # nosec
+            # Stored as a task so concurrent callers share the same socket instead of racing to open one each.
+            self._endpoints[family] = asyncio.ensure_future(
+                asyncio.get_running_loop().create_datagram_endpoint(_SNMPProtocol, family=family, local_addr=local_addr)
+            )
+        _, protocol = await self._endpoints[family]
+        return protocol
+
+    def _next_request_id(self):
+        return next(self._request_ids) % 2 ** 31 or 1
+
+    async def _request(self, host, pdu_type, oids, error_status=0, error_index=0):
+        """Send a request for ``oids`` to ``host``, retrying on timeouts, and return the varbinds of the response."""
+        address = ipaddress.ip_address(host)
+        protocol = await self._get_protocol(socket.AF_INET6 if address.version == 6 else socket.AF_INET)
+        loop = asyncio.get_running_loop()
+
+        for _ in range(self.retries + 1):
+            request_id = self._next_request_id()
+            message = encode_message(
+                self.community,
+                pdu_type,
+                request_id,
+                [(oid, None) for oid in oids],
+                version=self.version,
+                error_status=error_status,
+                error_index=error_index,
+            )
+            future = loop.create_future()
+            protocol.pending[request_id] = (address, future)
+            try:
+                protocol.transport.sendto(message, (str(address), self.port))
+                response = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                continue
+            finally:
+                protocol.pending.pop(request_id, None)
+
+            _, _, _, _, error_status, error_index, varbinds = response
+            if error_status:
+                status = ERROR_STATUS[error_status] if error_status < len(ERROR_STATUS) else error_status
+                raise SNMPError(f"{host} returned error {status} at index {error_index}.")
+            return varbinds
+
+        raise SNMPTimeoutError(f"Timed out while connecting to remote host {host}.")
+
+    async def get(self, host, oids):
+        """Fetch ``oids`` from ``host`` in a single GET request and return a list of ``SNMPVariable``."""
+        varbinds = await self._request(host, PDU_GET_REQUEST, oids)
+        return [SNMPVariable(oid, decode_value(tag, value), SNMP_TYPES.get(tag)) for oid, tag, value in varbinds]
+
+    async def bulkwalk(self, host, oid, max_repetitions=25):
+        """Walk the subtree of ``oid`` on ``host`` with GETBULK requests and return a list of ``SNMPVariable``.
+
+        Each request asks for the next ``max_repetitions`` variables, so a table of N rows takes about
+        N / max_repetitions round trips instead of N. Like with easysnmp, the full OID of a variable is its ``oid``
+        followed by its ``oid_index``, here the walked OID and the index of the row.
+        """
+        if self.version == 1:
+            raise SNMPError("GETBULK requires SNMP version 2c.")
+        root = f".{oid.strip('.')}"
+        variables = []
+        current = root
+        while True:
+            # For GETBULK the error status and index fields carry non-repeaters and max-repetitions.
+            varbinds = await self._request(
+                host, PDU_GETBULK_REQUEST, [current], error_status=0, error_index=max(1, int(max_repetitions))
+            )
+            if not varbinds:
+                return variables
+            for varbind_oid, tag, value in varbinds:
+                if tag == TAG_ENDOFMIBVIEW or not varbind_oid.startswith(f"{root}."):
+                    return variables
+                if _oid_key(varbind_oid) <= _oid_key(current):
+                    raise SNMPError(f"{host} returned {varbind_oid} out of order while walking {root}.")
+                variables.append(
+                    SNMPVariable(root, decode_value(tag, value), SNMP_TYPES.get(tag), varbind_oid[len(root) + 1 :])
+                )
+                current = varbind_oid
+
+    def close(self):
+        for endpoint in self._endpoints.values():
+            if endpoint.done() and not endpoint.cancelled() and endpoint.exception() is None:
+                endpoint.result()[0].close()
+            else:
+                endpoint.cancel()
+        self._endpoints = {}
@@ -0,0 +1,58 @@
+"""Cache of the latest PDUStatus of every device.
+
+A PDUStatus only changes once per poll cycle or push while it is read on every device page, rack page and dashboard
+refresh. Writers store every status they write in the Django cache, and reads go to the cache first, falling back to
+the database only for the devices missing from it. ``get_statuses`` fetches the statuses of any number of devices with
+a single cache round trip and at most one query. Devices without a PDUStatus are cached too, so looking them up does
+not hit the database either.
+
+The device panel and the ``latest`` API endpoint read through the cache. Other reads are left on the database on
+purpose: the rack panel joins the statuses into the query finding the PDUs of the rack, which it needs anyway, and the
+list and retrieve API endpoints filter, paginate and compute their ETags and sync cursors in the database, which the
+statuses they return have to agree with.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import PDUStatus
+
+FIELDS = ("id", "device_id", "power_usage", "metrics", "updated_at")
+
+
+def _get_key(device_id):
+    return f"axians_netbox_pdu:status:{device_id}"
+
+
+def cache_statuses(device_ids):
+    """Load the PDUStatus of ``device_ids`` from the database into the cache and return them keyed by device id."""
+    device_ids = list(device_ids)
+    rows = {row["device_id"]: row for row in PDUStatus.objects.filter(device_id__in=device_ids).values(*FIELDS)}
+    ttl = settings.PLUGINS_CONFIG["axians_netbox_pdu"]["status_cache_ttl"]
+    if ttl and device_ids:
+        # Devices without a status get an entry with no id.
+        entries = {
+            _get_key(device_id): rows.get(device_id, {"id": None, "device_id": device_id}) for device_id in device_ids
+        }
+        cache.set_many(entries, ttl)
+    return rows
+
+
+def get_statuses(device_ids):
+    """Return the PDUStatus of ``device_ids`` keyed by device id, leaving out the devices without one.
+
+    Statuses read from the cache are unsaved instances, they are meant to be displayed rather than modified.
+    """
+    device_ids = list(device_ids)
+    rows = {}
+    if settings.PLUGINS_CONFIG["axians_netbox_pdu"]["status_cache_ttl"]:
+        cached = cache.get_many([_get_key(device_id) for device_id in device_ids])
+        rows = {row["device_id"]: row for row in cached.values()}
+    missing = [device_id for device_id in device_ids if device_id not in rows]
+    if missing:
+        rows.update(cache_statuses(missing))
+    return {device_id: PDUStatus(**row) for device_id, row in rows.items() if row["id"] is not None}
+
+
+def get_status(device_id):
+    """Return the PDUStatus of a device, None when it has none."""
+    return get_statuses([device_id]).get(device_id)
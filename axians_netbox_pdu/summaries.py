@@ -0,0 +1,181 @@
+"""Power usage summaries of the racks, locations, sites and regions.
+
+Aggregating the PDUStatus of every rack on each page view does not scale to dashboards covering thousands of racks,
+so the totals of every scope are kept in ``PDUPowerSummary``. Whenever readings change, the poller and the status API
+refresh the summaries of the scopes holding the devices concerned: every scope is recomputed by the database with a
+grouped query for the PDUs and another for the power feeds, and written back with a single upsert. Locations and
+regions include their child locations and regions, as they do everywhere else in NetBox.
+
+Devices moving to another rack or site only leave their former scopes on the next full refresh, which the scheduler
+runs every ``summary_refresh_interval`` seconds.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from dcim.models import Device, PowerFeed, Region
+
+from .choices import PDUSummaryScopeChoices
+from .models import PDUPowerSummary, PDUStatus
+from .utilities import bulk_upsert, get_batch_size
+
+try:
+    from dcim.models import Location
+except ImportError:
+    # NetBox before 2.11 has no locations
+    Location = None
+
+
+class SummaryScope:
+    """A kind of object summarized, with the paths from a Device and from a PowerFeed to its id."""
+
+    __slots__ = ("name", "device_field", "feed_field", "tree_model")
+
+    def __init__(self, name, device_field, feed_field, tree_model=None):
+        self.name = name
+        self.device_field = device_field
+        self.feed_field = feed_field
+        # Nested objects are summarized together with their descendants.
+        self.tree_model = tree_model
+
+    def __repr__(self):
+        return f"<SummaryScope {self.name}>"
+
+
+RACK = SummaryScope(PDUSummaryScopeChoices.SCOPE_RACK, "rack", "rack")
+LOCATION = SummaryScope(PDUSummaryScopeChoices.SCOPE_LOCATION, "location", "rack__location", Location)
+SITE = SummaryScope(PDUSummaryScopeChoices.SCOPE_SITE, "site", "rack__site")
+REGION = SummaryScope(PDUSummaryScopeChoices.SCOPE_REGION, "site__region", "rack__site__region", Region)
+
+SCOPES = (RACK, SITE, REGION) if Location is None else (RACK, LOCATION, SITE, REGION)
+
+
+def _merge(totals, other):
+    """Add the ``(used, count, oldest, available)`` totals ``other`` to ``totals``."""
+    used, count, oldest, available = totals
+    other_used, other_count, other_oldest, other_available = other
+    if oldest is None or (other_oldest is not None and other_oldest < oldest):
+        oldest = other_oldest
+    if available is None:
+        available = other_available
+    elif other_available is not None:
+        available += other_available
+    return used + other_used, count + other_count, oldest, available
+
+
+def _direct_totals(scope, object_ids):
+    """Return the ``(used, count, oldest, available)`` totals of the devices and feeds directly in each object."""
+    device_path = f"device__{scope.device_field}"
+    statuses = PDUStatus.objects.exclude(**{device_path: None})
+    feeds = PowerFeed.objects.exclude(**{scope.feed_field: None})
+    if object_ids is not None:
+        statuses = statuses.filter(**{f"{device_path}__in": object_ids})
+        feeds = feeds.filter(**{f"{scope.feed_field}__in": object_ids})
+
+    totals = defaultdict(lambda: (0, 0, None, None))
+    for object_id, used, count, oldest in (
+        statuses.values(device_path)
+        .annotate(used=Coalesce(Sum("power_usage"), 0), count=Count("pk"), oldest=Min("updated_at"))
+        .values_list(device_path, "used", "count", "oldest")
+    ):
+        totals[object_id] = _merge(totals[object_id], (used, count, oldest, None))
+    for object_id, available in (
+        feeds.values(scope.feed_field)
+        .annotate(available=Sum("available_power"))
+        .values_list(scope.feed_field, "available")
+    ):
+        totals[object_id] = _merge(totals[object_id], (0, 0, None, available))
+    return totals
+
+
+def _scope_totals(scope, object_ids):
+    """Return the objects refreshed and their totals, including those of their descendants when nested.
+
+    Refreshing a nested object refreshes every object of its tree, so its ancestors are kept up to date too.
+    """
+    if scope.tree_model is None:
+        return object_ids, _direct_totals(scope, object_ids)
+
+    # Add up the direct totals of every object of the trees concerned into their ancestors.
+    nodes = scope.tree_model.objects.all()
+    if object_ids is not None:
+        nodes = nodes.filter(tree_id__in=scope.tree_model.objects.filter(pk__in=object_ids).values("tree_id"))
+    parents = dict(nodes.values_list("pk", "parent_id"))
+    if object_ids is not None:
+        object_ids = set(parents)
+    direct = _direct_totals(scope, object_ids)
+    totals = defaultdict(lambda: (0, 0, None, None))
+    for object_id, object_totals in direct.items():
+        while object_id is not None:
+            totals[object_id] = _merge(totals[object_id], object_totals)
+            object_id = parents.get(object_id)
+    return object_ids, totals
+
+
+def refresh_scope(scope, object_ids=None, batch_size=None):
+    """Recompute the summaries of ``object_ids`` of ``scope``, or of every object when None.
+
+    Objects holding no PDU lose their summary. Returns the number of summaries written.
+    """
+    if object_ids is not None:
+        object_ids = set(object_ids) - {None}
+        if not object_ids:
+            return 0
+    object_ids, totals = _scope_totals(scope, object_ids)
+    updated_at = timezone.now()
+    summaries = [
+        PDUPowerSummary(
+            scope=scope.name,
+            object_id=object_id,
+            used_power=used,
+            available_power=available,
+            utilization=int(used / available * 100) if available else None,
+            pdu_count=count,
+            oldest_reading=oldest,
+            updated_at=updated_at,
+        )
+        for object_id, (used, count, oldest, available) in totals.items()
+        if count
+    ]
+    bulk_upsert(
+        PDUPowerSummary,
+        summaries,
+        ["scope", "object_id"],
+        ["used_power", "available_power", "utilization", "pdu_count", "oldest_reading", "updated_at"],
+        get_batch_size(batch_size),
+    )
+
+    stale = PDUPowerSummary.objects.filter(scope=scope.name).exclude(
+        object_id__in=[summary.object_id for summary in summaries]
+    )
+    if object_ids is not None:
+        stale = stale.filter(object_id__in=object_ids)
+    stale.delete()
+    return len(summaries)
+
+
+def refresh_power_summaries(device_ids=None, batch_size=None):
+    """Recompute the summaries of every scope holding ``device_ids``, or every summary when None.
+
+    Returns the number of summaries written per scope.
+    """
+    if device_ids is None:
+        return {scope.name: refresh_scope(scope, batch_size=batch_size) for scope in SCOPES}
+
+    device_ids = list(device_ids)
+    if not device_ids:
+        return {}
+    object_ids = defaultdict(set)
+    fields = [scope.device_field for scope in SCOPES]
+    for row in Device.objects.filter(pk__in=device_ids).values_list(*fields):
+        for scope, object_id in zip(SCOPES, row):
+            object_ids[scope.name].add(object_id)
+    return {scope.name: refresh_scope(scope, object_ids[scope.name], batch_size) for scope in SCOPES}
+
+
+def get_power_summaries(scope, object_ids):
+    """Return the summaries of ``object_ids`` of ``scope`` keyed by object id."""
+    summaries = PDUPowerSummary.objects.filter(scope=scope, object_id__in=object_ids)
+    return {summary.object_id: summary for summary in summaries}
@@ -1,69 +1,53 @@
 from django.core.exceptions import ObjectDoesNotExist
+from django.urls import reverse
 
 from extras.plugins import PluginTemplateExtension
 
-from .utilities import get_rack_power_utilization
+from .panels import get_device_panel, get_rack_panel
 
 from django.conf import settings
 from packaging import version
 
 NETBOX_CURRENT_VERSION = version.parse(settings.VERSION)
 
-class DevicePDUStatus(PluginTemplateExtension):
-    model = "dcim.device"
 
-    def left_page(self):
-        device = self.context["object"]
+class PDUPanelExtension(PluginTemplateExtension):
+    """Template extension showing a PDU panel, fetched by the page once displayed when ``lazy_panels`` is set."""
 
-        template_filename = ""
-        if NETBOX_CURRENT_VERSION >= version.parse("3.0"):
-            template_filename = "axians_netbox_pdu/device_power_usage_3_x.html"
-        else:
-            template_filename = "axians_netbox_pdu/device_power_usage.html"
+    panel = None
 
-        try:
+    def render_panel(self, get_panel):
+        obj = self.context["object"]
+        if settings.PLUGINS_CONFIG["axians_netbox_pdu"]["lazy_panels"]:
             return self.render(
-                template_filename, extra_context={"pdustatus": device.pdustatus}
+                "axians_netbox_pdu/panel_placeholder.html",
+                extra_context={
+                    "panel_id": f"axians-netbox-pdu-{self.panel}-{obj.pk}",
+                    "panel_url": reverse(f"plugins:axians_netbox_pdu:{self.panel}_panel", args=[obj.pk]),
+                },
             )
-        except ObjectDoesNotExist:
-            return ""
 
+        panel = get_panel(obj)
+        if panel is None:
+            return ""
+        template_filename, extra_context = panel
+        return self.render(template_filename, extra_context=extra_context)
 
-class RackPDUStatus(PluginTemplateExtension):
-    model = "dcim.rack"
 
-    def right_page(self):
-        rack = self.context["object"]
+class DevicePDUStatus(PDUPanelExtension):
+    model = "dcim.device"
+    panel = "device"
 
-        pdus = rack.devices.filter(rack=rack).exclude(pdustatus=None)
+    def left_page(self):
+        return self.render_panel(get_device_panel)
 
-        template_filename = ""
-        if NETBOX_CURRENT_VERSION >= version.parse("3.0"):
-            template_filename = "axians_netbox_pdu/rack_power_usage_3_x.html"
-        else:
-            template_filename = "axians_netbox_pdu/rack_power_usage.html"
 
-        if pdus:
-            (
-                total_available_power,
-                total_power_usage,
-                total_power_usage_percentage,
-                total_power_usage_unit,
-            ) = get_rack_power_utilization(rack)
-            ## fix issues with device not habing available power
+class RackPDUStatus(PDUPanelExtension):
+    model = "dcim.rack"
+    panel = "rack"
 
-            return self.render(
-                template_filename,
-                extra_context={
-                    "pdus": pdus,
-                    "total_power_usage": total_power_usage,
-                    "total_available_power": total_available_power,
-                    "total_power_usage_percentage": total_power_usage_percentage,
-                    "total_power_usage_unit": total_power_usage_unit,
-                },
-            )
-        else:
-            return ""
+    def right_page(self):
+        return self.render_panel(get_rack_panel)
 
 
 class DeviceTypePDUConfig(PluginTemplateExtension):
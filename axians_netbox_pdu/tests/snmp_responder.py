@@ -0,0 +1,92 @@
+"""Local UDP SNMP agent stub used to exercise the asyncio collector offline."""
+import socket
+import threading
+
+from axians_netbox_pdu import snmp
+
+
+class SNMPResponder:
+    """Answer SNMP GET and GETBULK requests on localhost from a static ``{oid: value}`` mapping.
+
+    Unknown OIDs are answered with noSuchObject. When ``silent`` is set the responder swallows every request, which
+    lets tests exercise timeouts without relying on ICMP. Other loopback addresses such as 127.0.0.2 can be given as
+    ``host`` to stand in for several agents listening on the same ``port``.
+    """
+
+    def __init__(self, values=None, community="public", silent=False, host="127.0.0.1", port=0):
+        self.values = {f".{oid.strip('.')}": value for oid, value in (values or {}).items()}
+        self.community = community
+        self.silent = silent
+        self.requests = []
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.1)
+        self._running = False
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    @property
+    def port(self):
+        return self._socket.getsockname()[1]
+
+    def __enter__(self):
+        self._running = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._running = False
+        self._thread.join()
+        self._socket.close()
+
+    def _serve(self):
+        while self._running:
+            try:
+                data, addr = self._socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+            version, community, pdu_type, request_id, _, max_repetitions, varbinds = snmp.decode_message(data)
+            self.requests.append([oid for oid, _, _ in varbinds])
+            if self.silent or community.decode() != self.community:
+                continue
+            if pdu_type == snmp.PDU_GETBULK_REQUEST:
+                response = self.respond_bulk(version, request_id, varbinds, max_repetitions)
+            else:
+                response = self.respond(version, request_id, varbinds)
+            self._socket.sendto(response, addr)
+
+    def respond_bulk(self, version, request_id, varbinds, max_repetitions):
+        """Build the GetResponse for a GETBULK request without non-repeaters."""
+
+        def key(oid):
+            return [int(arc) for arc in oid.strip(".").split(".")]
+
+        ordered = sorted(self.values, key=key)
+        encoded = []
+        for oid, _, _ in varbinds:
+            following = [next_oid for next_oid in ordered if key(next_oid) > key(oid)]
+            for next_oid in following[:max_repetitions]:
+                value = snmp.encode_value(self.values[next_oid])
+                encoded.append(snmp.encode_sequence(snmp.encode_oid(next_oid), value))
+            if len(following) < max_repetitions:
+                encoded.append(snmp.encode_sequence(snmp.encode_oid(oid), snmp.encode_null(snmp.TAG_ENDOFMIBVIEW)))
+        return self.encode_response(version, request_id, encoded)
+
+    def respond(self, version, request_id, varbinds):
+        """Build the GetResponse for a request."""
+        encoded = []
+        for oid, _, _ in varbinds:
+            if oid in self.values:
+                encoded.append(snmp.encode_sequence(snmp.encode_oid(oid), snmp.encode_value(self.values[oid])))
+            else:
+                encoded.append(snmp.encode_sequence(snmp.encode_oid(oid), snmp.encode_null(snmp.TAG_NOSUCHOBJECT)))
+        return self.encode_response(version, request_id, encoded)
+
+    def encode_response(self, version, request_id, encoded):
+        pdu = snmp.encode_sequence(
+            snmp.encode_integer(request_id),
+            snmp.encode_integer(0),
+            snmp.encode_integer(0),
+            snmp.encode_sequence(*encoded),
+            tag=snmp.PDU_GET_RESPONSE,
+        )
+        return snmp.encode_sequence(snmp.encode_integer(version), snmp.encode_octet_string(self.community), pdu)
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from axians_netbox_pdu.history import record_readings
+from axians_netbox_pdu.models import PDUStatus
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+from users.models import Token
+
+
+class PDUExportTestCase(TestCase):
+    """Test the streaming export of the PDU status and history."""
+
+    def setUp(self):
+        """Create a superuser and token for API calls, and a few PDUs with a status and readings."""
+        self.user = User.objects.create(username="testuser", is_superuser=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.devices = [
+            Device.objects.create(
+                name=f"PDU {index}", device_role=self.role, device_type=self.device_type, site=self.site
+            )
+            for index in range(3)
+        ]
+        for index, device in enumerate(self.devices):
+            PDUStatus.objects.create(device=device, power_usage=100 + index, metrics={"current": index})
+
+        self.start = datetime.now(dt_timezone.utc) - timedelta(hours=1)
+        for minute in range(3):
+            record_readings(
+                {device.pk: 100 + minute for device in self.devices},
+                timestamp=self.start + timedelta(minutes=minute),
+            )
+
+    def export(self, dataset, output_format, **params):
+        url = reverse(
+            "plugins-api:axians_netbox_pdu-api:export", kwargs={"dataset": dataset, "output_format": output_format}
+        )
+        return self.client.get(url, params)
+
+    def test_status_ndjson(self):
+        """Verify that every PDUStatus is exported as one JSON object per line."""
+        response = self.export("status", "ndjson")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="pdu-status.ndjson"', response["Content-Disposition"])
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row["device_id"] for row in rows], [device.pk for device in self.devices])
+        self.assertEqual(rows[1]["power_usage"], 101)
+        self.assertEqual(rows[1]["metrics"], {"current": 1})
+
+    def test_status_csv(self):
+        """Verify that the PDUStatus of the requested devices are exported as CSV with a header."""
+        response = self.export("status", "csv", device=[self.devices[0].pk, self.devices[2].pk])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ["device_id", "power_usage", "metrics", "updated_at"])
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.devices[0].pk), str(self.devices[2].pk)])
+        self.assertEqual(json.loads(rows[2][2]), {"current": 2})
+
+    def test_history_ndjson(self):
+        """Verify that the raw readings of the window are exported ordered by device and time."""
+        response = self.export(
+            "history",
+            "ndjson",
+            device=self.devices[0].pk,
+            start=self.start.isoformat(),
+            end=(self.start + timedelta(minutes=2)).isoformat(),
+            tier="raw",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["avg"] for row in rows], [100, 101])
+        self.assertEqual({row["device_id"] for row in rows}, {self.devices[0].pk})
+
+    def test_unknown(self):
+        """Verify that unknown datasets and formats are not found."""
+        self.assertEqual(self.export("status", "xml").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.export("config", "csv").status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=[])
+    def test_permissions(self):
+        """Verify that exports require view_pdustatus and only cover the devices the user may view."""
+        user = User.objects.create(username="restricted")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        self.assertEqual(self.export("status", "ndjson").status_code, status.HTTP_403_FORBIDDEN)
+
+        user.user_permissions.add(
+            Permission.objects.get(content_type__app_label="axians_netbox_pdu", codename="view_pdustatus")
+        )
+        response = self.export("status", "ndjson")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), b"")
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+
+from axians_netbox_pdu.history import (
+    DAILY,
+    FIVE_MINUTES,
+    HOURLY,
+    RAW,
+    get_power_history,
+    purge_history,
+    record_readings,
+    rollup_readings,
+    select_tier,
+)
+from axians_netbox_pdu.models import PDUReading, PDUReadingFiveMinutes, PDUReadingHourly
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+
+
+class PowerHistoryTestCase(TestCase):
+    """Test the power usage history and its rollups."""
+
+    def setUp(self):
+        """Create a PDU with an hour of readings, one every minute."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.device = Device.objects.create(
+            name="PDU", device_role=self.role, device_type=self.device_type, site=self.site
+        )
+        self.start = datetime(2021, 1, 1, 10, tzinfo=dt_timezone.utc)
+        for minute in range(60):
+            record_readings({self.device.pk: 100 + minute}, timestamp=self.start + timedelta(minutes=minute))
+
+    def test_rollup(self):
+        """Verify that readings are rolled into five minute periods and those into hours."""
+        rollup_readings(now=self.start + timedelta(hours=1, minutes=1))
+
+        periods = PDUReadingFiveMinutes.objects.order_by("period_start")
+        self.assertEqual(periods.count(), 12)
+        first = periods.first()
+        self.assertEqual(first.period_start, self.start)
+        self.assertEqual((first.samples, first.power_usage_min, first.power_usage_max), (5, 100, 104))
+        self.assertEqual(first.power_usage_avg, 102)
+
+        hour = PDUReadingHourly.objects.get()
+        self.assertEqual((hour.samples, hour.power_usage_min, hour.power_usage_max), (60, 100, 159))
+        self.assertAlmostEqual(hour.power_usage_avg, 129.5)
+
+        # Rolling up again is idempotent.
+        rollup_readings(now=self.start + timedelta(hours=1, minutes=1))
+        self.assertEqual(PDUReadingFiveMinutes.objects.count(), 12)
+        self.assertEqual(PDUReadingHourly.objects.get().samples, 60)
+
+    def test_rollup_open_period(self):
+        """Verify that a period is only rolled up once it is over."""
+        rollup_readings(now=self.start + timedelta(minutes=7))
+
+        self.assertEqual(PDUReadingFiveMinutes.objects.count(), 1)
+        self.assertFalse(PDUReadingHourly.objects.exists())
+
+    def test_purge(self):
+        """Verify that every tier is purged after its own retention, in chunks, once compacted."""
+        rollup_readings(now=self.start + timedelta(hours=1, minutes=1))
+
+        deleted = purge_history(now=self.start + timedelta(days=3), chunk_size=7, throttle=0)
+
+        # The last five minute period is rolled up again on the next run, its raw readings are kept until then.
+        self.assertEqual(deleted, {RAW.name: 55, FIVE_MINUTES.name: 0})
+        self.assertEqual(PDUReading.objects.count(), 5)
+        self.assertEqual(PDUReadingFiveMinutes.objects.count(), 12)
+
+    def test_purge_not_compacted(self):
+        """Verify that readings which have not been rolled up yet are never purged."""
+        deleted = purge_history(now=self.start + timedelta(days=3), throttle=0)
+
+        self.assertEqual(deleted, {})
+        self.assertEqual(PDUReading.objects.count(), 60)
+
+    def test_select_tier(self):
+        """Verify that longer or older windows are read from coarser tiers."""
+        now = self.start + timedelta(hours=1)
+
+        self.assertEqual(select_tier(now - timedelta(days=1), now, now=now), RAW)
+        # Raw readings are no longer kept that far back.
+        older = now - timedelta(days=3)
+        self.assertEqual(select_tier(older, older + timedelta(hours=12), now=now), FIVE_MINUTES)
+        self.assertEqual(select_tier(now - timedelta(days=14), now, now=now), HOURLY)
+        self.assertEqual(select_tier(now - timedelta(days=3 * 365), now, now=now), DAILY)
+
+    def test_get_power_history(self):
+        """Verify that raw and rolled up history share the same shape."""
+        rollup_readings(now=self.start + timedelta(hours=1, minutes=1))
+        end = self.start + timedelta(hours=1)
+
+        tier, readings = get_power_history([self.device.pk], self.start, end, tier=RAW)
+        self.assertEqual(tier, RAW)
+        self.assertEqual(len(readings), 60)
+        self.assertEqual(
+            readings[0], {"device_id": self.device.pk, "time": self.start, "min": 100, "avg": 100, "max": 100}
+        )
+
+        tier, readings = get_power_history([self.device.pk], self.start, end, tier=FIVE_MINUTES)
+        self.assertEqual(len(readings), 12)
+        self.assertEqual((readings[-1]["min"], readings[-1]["avg"], readings[-1]["max"]), (155, 157, 159))
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from axians_netbox_pdu.history import record_readings
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+from users.models import Token
+
+
+class PDUHistoryTestCase(TestCase):
+    """Test the power usage history API."""
+
+    def setUp(self):
+        """Create a user without permissions, a token for API calls and a PDU with a few readings."""
+        self.user = User.objects.create(username="testuser")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        self.url = reverse("plugins-api:axians_netbox_pdu-api:history")
+
+        site = Site.objects.create(name="Site", slug="site")
+        role = DeviceRole.objects.create(name="Role", slug="role")
+        manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        device_type = DeviceType.objects.create(slug="device_type", model="device_type", manufacturer=manufacturer)
+        self.device = Device.objects.create(name="PDU", device_role=role, device_type=device_type, site=site)
+        start = timezone.now() - timedelta(minutes=10)
+        for minute in range(3):
+            record_readings({self.device.pk: 100 + minute}, timestamp=start + timedelta(minutes=minute))
+
+    def add_permission(self, app_label, codename):
+        self.user.user_permissions.add(Permission.objects.get(content_type__app_label=app_label, codename=codename))
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=[])
+    def test_get_history(self):
+        """Verify that the history requires view_pdustatus and only covers the devices the user may view."""
+        params = {"device": self.device.pk, "tier": "raw"}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.add_permission("axians_netbox_pdu", "view_pdustatus")
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["readings"], [])
+
+        self.add_permission("dcim", "view_device")
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([reading["avg"] for reading in response.data["readings"]], [100, 101, 102])
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+import django_rq
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from axians_netbox_pdu.ingest import STREAM_KEY, flush_readings, store_readings
+from axians_netbox_pdu.metrics import get_metrics, reset_metrics
+from axians_netbox_pdu.models import PDUReading, PDUStatus
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+
+
+class BufferedIngestTestCase(TestCase):
+    """Test the write-behind buffer of the readings."""
+
+    def setUp(self):
+        """Create a few PDUs and start from an empty buffer."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.devices = [
+            Device.objects.create(
+                name=f"PDU {index}", device_role=self.role, device_type=self.device_type, site=self.site
+            )
+            for index in range(2)
+        ]
+        self.connection = django_rq.get_connection()
+        self.connection.delete(STREAM_KEY)
+        reset_metrics()
+        self.addCleanup(self.connection.delete, STREAM_KEY)
+
+    def store(self, readings, metrics=None):
+        config = dict(settings.PLUGINS_CONFIG["axians_netbox_pdu"], ingest_mode="buffered")
+        with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+            return store_readings(readings, metrics)
+
+    def test_flush(self):
+        """Verify that buffered readings only reach the database once flushed, coalesced per device."""
+        now = timezone.now()
+        first, second = (device.pk for device in self.devices)
+        written = self.store(
+            [(first, now - timedelta(minutes=1), 100), (first, now, 150), (second, now, 200)],
+            metrics={second: {"voltage": 230}},
+        )
+
+        self.assertFalse(written)
+        self.assertFalse(PDUStatus.objects.exists())
+        self.assertEqual(self.connection.xlen(STREAM_KEY), 3)
+
+        result = flush_readings(batch_size=2)
+
+        # The two readings of the first PDU share a batch and update its PDUStatus once.
+        self.assertEqual((result["readings"], result["devices"]), (3, 2))
+        self.assertEqual(dict(PDUStatus.objects.values_list("device_id", "power_usage")), {first: 150, second: 200})
+        self.assertEqual(PDUStatus.objects.get(device_id=second).metrics, {"voltage": 230})
+        self.assertEqual(PDUReading.objects.count(), 3)
+        self.assertEqual(self.connection.xlen(STREAM_KEY), 0)
+
+        metrics = get_metrics()
+        self.assertEqual((metrics["ingest_flushed"], metrics["ingest_backlog"]), (3, 0))
+        self.assertGreaterEqual(metrics["ingest_flush_lag"], 0)
+
+    def test_flush_empty(self):
+        """Verify that flushing an empty buffer writes nothing."""
+        with self.assertNumQueries(0):
+            result = flush_readings()
+        self.assertEqual(result, {"readings": 0, "devices": 0, "lag": 0})
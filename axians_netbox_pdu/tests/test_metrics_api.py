@@ -0,0 +1,33 @@
+from django.contrib.auth.models import Permission, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from users.models import Token
+
+
+class PDUMetricsTestCase(TestCase):
+    """Test the poller metrics API."""
+
+    def setUp(self):
+        """Create a user without permissions and a token for API calls."""
+        self.user = User.objects.create(username="testuser")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        self.url = reverse("plugins-api:axians_netbox_pdu-api:metrics")
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=[])
+    def test_get_metrics(self):
+        """Verify that the metrics can only be read with the view_pdustatus permission."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.user_permissions.add(
+            Permission.objects.get(content_type__app_label="axians_netbox_pdu", codename="view_pdustatus")
+        )
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
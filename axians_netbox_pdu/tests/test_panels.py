@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from axians_netbox_pdu.models import PDUStatus
+from axians_netbox_pdu.panels import render_panel
+from axians_netbox_pdu.status_cache import cache_statuses
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Rack, Site
+
+
+class PDUPanelTestCase(TestCase):
+    """Test the lazily loaded PDU panels."""
+
+    def setUp(self):
+        """Create a user and a rack holding a PDU."""
+        self.user = User.objects.create(username="testuser")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.rack = Rack.objects.create(site=self.site, name="Rack")
+        self.device = Device.objects.create(
+            name="PDU", device_role=self.role, device_type=self.device_type, site=self.site, rack=self.rack
+        )
+        self.pdustatus = PDUStatus.objects.create(device=self.device, power_usage=100)
+        cache_statuses([self.device.pk])
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=["*"])
+    def test_views(self):
+        """Verify that the device and rack panels are served on their own URLs."""
+        response = self.client.get(reverse("plugins:axians_netbox_pdu:device_panel", args=[self.device.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "100 Watts")
+
+        response = self.client.get(reverse("plugins:axians_netbox_pdu:rack_panel", args=[self.rack.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "100 Watts")
+
+    @override_settings(EXEMPT_VIEW_PERMISSIONS=[])
+    def test_views_permission(self):
+        """Verify that the panels require the permission to view their object."""
+        response = self.client.get(reverse("plugins:axians_netbox_pdu:device_panel", args=[self.device.pk]))
+        self.assertEqual(response.status_code, 403)
+
+        # Never redirected to the login page, which the placeholder would display in place of the panel.
+        self.client.logout()
+        response = self.client.get(reverse("plugins:axians_netbox_pdu:rack_panel", args=[self.rack.pk]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_cache(self):
+        """Verify that a panel is rendered once per reading."""
+        config = dict(settings.PLUGINS_CONFIG["axians_netbox_pdu"], panel_cache_ttl=60)
+        with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+            content = render_panel(None, "device", self.device)
+            self.assertIn("100 Watts", content)
+
+            # Only the time of the last reading is looked up.
+            with self.assertNumQueries(1):
+                self.assertEqual(render_panel(None, "device", self.device), content)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.pdustatus.power_usage = 200
+                self.pdustatus.save()
+            self.assertIn("200 Watts", render_panel(None, "device", self.device))
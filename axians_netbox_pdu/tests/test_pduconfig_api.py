@@ -154,3 +154,18 @@ class PDUConfigCreateTestCase(TestCase):
         self.assertEqual(pdu_config.device_type.slug, data["device_type"])
         self.assertEqual(pdu_config.power_usage_oid, data["power_usage_oid"])
         self.assertEqual(pdu_config.power_usage_unit, data["power_usage_unit"])
+
+    def test_create_pduconfig_invalid_oids(self):
+        """Verify that symbolic and blank OIDs are rejected."""
+        url = reverse(f"{self.base_url_lookup}-list")
+        data = {"device_type": self.device_type.slug, "power_usage_oid": "1.2.3.4", "power_usage_unit": "watts"}
+        for field, value in (
+            ("power_usage_oid", "SNMPv2-MIB::sysDescr.0"),
+            ("outlet_power_oid", "iso.3.6.1.2.1.1.1.0"),
+            ("metric_oids", {"voltage": "iso.3.6.1.2.1.1.1.0"}),
+            ("metric_oids", {"voltage": ""}),
+        ):
+            response = self.client.post(url, dict(data, **{field: value}), format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(field, response.data)
+        self.assertFalse(PDUConfig.objects.exists())
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from axians_netbox_pdu.choices import PDUPollStateChoices
+from axians_netbox_pdu.models import PDUPollState
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+from users.models import Token
+
+
+class PDUPollStateTestCase(TestCase):
+    """Test the PDUPollState API."""
+
+    def setUp(self):
+        """Create a superuser and token for API calls."""
+        self.user = User.objects.create(username="testuser", is_superuser=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        self.base_url_lookup = "plugins-api:axians_netbox_pdu-api:pdupollstate"
+
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.device = Device.objects.create(
+            name="Device One", device_role=self.role, device_type=self.device_type, site=self.site,
+        )
+        self.pdupollstate = PDUPollState.objects.create(
+            device=self.device,
+            state=PDUPollStateChoices.STATE_QUARANTINED,
+            consecutive_failures=3,
+            last_error="EasySNMPTimeoutError: timed out while connecting to remote host",
+            last_failure_at=timezone.now(),
+            next_poll_at=timezone.now(),
+        )
+
+    def test_list_pdupollstate(self):
+        """Verify that quarantined PDUs can be listed."""
+        url = reverse(f"{self.base_url_lookup}-list")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["device"], self.device.pk)
+        self.assertEqual(response.data["results"][0]["state"], PDUPollStateChoices.STATE_QUARANTINED)
+
+    def test_delete_pdupollstate(self):
+        """Verify that deleting a PDUPollState lifts the quarantine."""
+        url = reverse(f"{self.base_url_lookup}-detail", kwargs={"pk": self.pdupollstate.pk})
+
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(PDUPollState.objects.exists())
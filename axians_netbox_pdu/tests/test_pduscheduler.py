@@ -0,0 +1,70 @@
+from datetime import datetime
+from unittest import mock
+
+from django.test import TestCase
+
+from axians_netbox_pdu.management.commands import pduscheduler
+from axians_netbox_pdu.utilities import get_stagger_offset
+from axians_netbox_pdu.worker import collect_power_usage_info, collect_power_usage_shard
+
+INTERVAL = 300
+# A multiple of the interval, so the delay of each slot is its offset.
+EPOCH = INTERVAL * 10 ** 7
+
+
+class FakeJob:
+    def __init__(self, scheduler, **options):
+        self.scheduler = scheduler
+        self.options = options
+
+    def delete(self):
+        self.scheduler.jobs.remove(self)
+
+
+class FakeScheduler:
+    """Keep the scheduled jobs in a list instead of Redis."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def get_jobs(self):
+        return list(self.jobs)
+
+    def schedule(self, **options):
+        job = FakeJob(self, **options)
+        self.jobs.append(job)
+        return job
+
+
+class PDUSchedulerTestCase(TestCase):
+    """Test the registration of the scheduled jobs."""
+
+    def setUp(self):
+        """Replace the scheduler with a fake one holding a job left over from a previous run."""
+        self.scheduler = FakeScheduler()
+        self.previous_job = self.scheduler.schedule(func=collect_power_usage_info, interval=INTERVAL)
+        patcher = mock.patch.object(pduscheduler, "scheduler", self.scheduler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_register_staggered_jobs(self):
+        """Verify that previous jobs are cancelled and one shard job is scheduled per slot at its offset."""
+        config = {"schedule_mode": "staggered", "schedule_interval": INTERVAL, "stagger_slots": 4, "history": False}
+        with mock.patch.dict(pduscheduler.config, config):
+            start = datetime.utcnow()
+            with mock.patch("axians_netbox_pdu.management.commands.pduscheduler.time.time", return_value=EPOCH):
+                pduscheduler.clear_scheduled_jobs()
+                pduscheduler.register_scheduled_jobs()
+
+            self.assertNotIn(self.previous_job, self.scheduler.jobs)
+            self.assertNotIn(collect_power_usage_info, [job.options["func"] for job in self.scheduler.jobs])
+
+            jobs = [job.options for job in self.scheduler.jobs if job.options["func"] == collect_power_usage_shard]
+            shard_by = pduscheduler.config["shard_by"]
+            self.assertEqual([job["args"] for job in jobs], [[slot, 4, shard_by] for slot in range(4)])
+            for slot, job in enumerate(jobs):
+                self.assertEqual(job["interval"], INTERVAL)
+                delay = (job["scheduled_time"] - start).total_seconds()
+                self.assertAlmostEqual(
+                    delay, get_stagger_offset(slot, 4, INTERVAL, pduscheduler.config["stagger_jitter"]), delta=1
+                )
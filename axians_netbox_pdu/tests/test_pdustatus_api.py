@@ -1,10 +1,17 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from axians_netbox_pdu.models import PDUConfig, PDUStatus
+from axians_netbox_pdu.models import PDUConfig, PDUReading, PDUStatus
+from axians_netbox_pdu.status_cache import cache_statuses
 from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, PowerOutletTemplate, Site
 from users.models import Token
 
@@ -56,6 +63,98 @@ class PDUStatusTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["power_usage"], int(self.pdustatus.power_usage))
 
+    def test_latest_pdustatus(self):
+        """Verify that the latest PDUStatus of many devices can be fetched at once."""
+        url = reverse(f"{self.base_url_lookup}-latest")
+        # Replace whatever an earlier test database left in the cache for these ids.
+        cache_statuses([self.device.pk, self.device_1.pk])
+
+        response = self.client.get(f"{url}?device={self.device.pk}&device={self.device_1.pk}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {item["device"]: item["power_usage"] for item in response.data},
+            {self.device.pk: 1234, self.device_1.pk: 4321},
+        )
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def sync_settings(self, sync_settle_time):
+        config = dict(settings.PLUGINS_CONFIG["axians_netbox_pdu"], sync_settle_time=sync_settle_time)
+        return self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config})
+
+    def test_sync_pdustatus(self):
+        """Verify that only the PDUStatus changed since the last sync are listed."""
+        url = reverse(f"{self.base_url_lookup}-list")
+        # Changes are returned right away, late commits are covered by test_sync_pdustatus_late_commit.
+        with self.sync_settings(0):
+            response = self.client.get(url, {"updated_since": "2000-01-01T00:00:00Z"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                [item["id"] for item in response.data["results"]], [self.pdustatus.pk, self.pdustatus_1.pk]
+            )
+            self.assertFalse(response.data["more"])
+            cursor = response.data["next_cursor"]
+
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.data["results"], [])
+            self.assertEqual(response.data["next_cursor"], cursor)
+
+            self.client.patch(
+                reverse(f"{self.base_url_lookup}-detail", kwargs={"pk": self.pdustatus.pk}),
+                {"device": self.device.pk, "power_usage": 1000},
+                format="json",
+            )
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual([item["power_usage"] for item in response.data["results"]], [1000])
+
+            response = self.client.get(url, {"cursor": "invalid"})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_pdustatus_late_commit(self):
+        """Verify that a change committed after a newer one is still returned by the next sync."""
+        url = reverse(f"{self.base_url_lookup}-list")
+        now = timezone.now()
+        PDUStatus.objects.filter(pk=self.pdustatus.pk).update(updated_at=now - timedelta(minutes=10))
+        # Written by a short transaction, 20 seconds ago.
+        PDUStatus.objects.filter(pk=self.pdustatus_1.pk).update(updated_at=now - timedelta(seconds=20))
+
+        with self.sync_settings(60):
+            response = self.client.get(url, {"updated_since": "2000-01-01T00:00:00Z"})
+        # The recent change is held back until the transactions that may have started before it are over.
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.pdustatus.pk])
+        cursor = response.data["next_cursor"]
+
+        # A longer transaction that set updated_at 30 seconds ago only commits now.
+        device = Device.objects.create(
+            name="Device Three", device_role=self.role, device_type=self.device_type, site=self.site,
+        )
+        late = PDUStatus.objects.create(device=device, power_usage=10)
+        PDUStatus.objects.filter(pk=late.pk).update(updated_at=now - timedelta(seconds=30))
+
+        # Once both changes have settled, the next sync returns both of them.
+        with self.sync_settings(0):
+            response = self.client.get(url, {"cursor": cursor})
+        self.assertEqual([item["id"] for item in response.data["results"]], [late.pk, self.pdustatus_1.pk])
+
+    def test_etag_pdustatus(self):
+        """Verify that unchanged PDUStatus are answered with a 304."""
+        for url in (
+            reverse(f"{self.base_url_lookup}-list"),
+            reverse(f"{self.base_url_lookup}-detail", kwargs={"pk": self.pdustatus.pk}),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response["ETag"]
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            # Saving moves updated_at forward.
+            self.pdustatus.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_create_pdustatus_missing_mandatory_parameters(self):
         """Verify that the only mandatory POST parameters are power_usage_oid and power_usage_unit."""
         url = reverse(f"{self.base_url_lookup}-list")
@@ -172,3 +271,88 @@ class PDUStatusCreateTestCase(TestCase):
 
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PDUStatusBulkTestCase(TestCase):
+    """Test the bulk PDUStatus API."""
+
+    def setUp(self):
+        """Create a superuser, a token for API calls and a set of PDUs."""
+        self.user = User.objects.create(username="testuser", is_superuser=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        self.url = reverse("plugins-api:axians_netbox_pdu-api:pdustatus-bulk")
+
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.outlets = PowerOutletTemplate.objects.create(device_type=self.device_type, name="1")
+        self.devices = [
+            Device.objects.create(
+                name=f"Device {index}", device_role=self.role, device_type=self.device_type, site=self.site
+            )
+            for index in range(3)
+        ]
+        PDUStatus.objects.create(device=self.devices[0], power_usage=1)
+
+    def test_bulk(self):
+        """Verify that a batch updates every PDUStatus and appends every reading to the history."""
+        data = [{"device": device.pk, "power_usage": 100 + index} for index, device in enumerate(self.devices)]
+        data.append({"device": self.devices[0].pk, "power_usage": 200, "timestamp": "2100-01-01T00:00:00Z"})
+
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"readings": 4, "devices": 3})
+        self.assertEqual(
+            dict(PDUStatus.objects.values_list("device_id", "power_usage")),
+            {self.devices[0].pk: 200, self.devices[1].pk: 101, self.devices[2].pk: 102},
+        )
+        self.assertEqual(PDUReading.objects.filter(device=self.devices[0]).count(), 2)
+
+    def test_bulk_late_batch(self):
+        """Verify that a batch older than the stored readings only adds to the history."""
+        now = timezone.now()
+        data = [{"device": self.devices[0].pk, "power_usage": 300, "timestamp": now.isoformat()}]
+        self.client.post(self.url, data, format="json")
+
+        late = (now - timedelta(minutes=1)).isoformat()
+        data = [{"device": device.pk, "power_usage": 150, "timestamp": late} for device in self.devices[:2]]
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            dict(PDUStatus.objects.values_list("device_id", "power_usage")),
+            {self.devices[0].pk: 300, self.devices[1].pk: 150},
+        )
+        self.assertEqual(PDUStatus.objects.get(device=self.devices[0]).read_at, now)
+        self.assertEqual(PDUReading.objects.filter(device=self.devices[0]).count(), 2)
+
+    def test_bulk_query_count(self):
+        """Verify that the validation and the writes do not depend on the number of readings."""
+        data = [{"device": device.pk, "power_usage": 100} for device in self.devices]
+        self.client.post(self.url, data, format="json")
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, data, format="json")
+
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, data * 50, format="json")
+        self.assertEqual(len(large), len(small))
+
+    def test_bulk_invalid_device(self):
+        """Verify that a batch holding a device without power outlets is rejected as a whole."""
+        device_type = DeviceType.objects.create(slug="no_outlets", model="no_outlets", manufacturer=self.manufacturer)
+        device = Device.objects.create(name="Switch", device_role=self.role, device_type=device_type, site=self.site)
+        data = [{"device": self.devices[1].pk, "power_usage": 100}, {"device": device.pk, "power_usage": 100}]
+
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("device", response.data[1])
+        self.assertFalse(PDUStatus.objects.filter(device=self.devices[1]).exists())
@@ -0,0 +1,91 @@
+from django.test import TestCase
+
+from axians_netbox_pdu.models import PDUConfig
+from axians_netbox_pdu.plan import poll_plan
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, PowerOutletTemplate, Site
+from ipam.models import IPAddress
+
+
+class PollPlanTestCase(TestCase):
+    """Test the compiled poll plan and its invalidation."""
+
+    def setUp(self):
+        """Create a set of PDUs that can be polled."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.outlets = PowerOutletTemplate.objects.create(device_type=self.device_type, name="1")
+        self.pduconfig = PDUConfig.objects.create(
+            device_type=self.device_type, power_usage_oid="1.1.1.1", power_usage_unit="watts"
+        )
+        self.addresses = [IPAddress.objects.create(address=f"192.0.2.{index}/24") for index in range(1, 4)]
+        self.devices = [
+            Device.objects.create(
+                name=f"PDU {index}",
+                device_role=self.role,
+                device_type=self.device_type,
+                site=self.site,
+                primary_ip4=address,
+            )
+            for index, address in enumerate(self.addresses, 1)
+        ]
+        poll_plan.reset()
+
+    def get_targets(self):
+        return {target.device_id: target for target in poll_plan.get_targets()}
+
+    def test_build(self):
+        """Verify that the plan is built with a single query and holds everything needed to poll."""
+        with self.assertNumQueries(1):
+            targets = self.get_targets()
+
+        self.assertEqual(set(targets), {device.pk for device in self.devices})
+        target = targets[self.devices[0].pk]
+        self.assertEqual(
+            (target.name, target.ip, target.oid, target.unit, target.site_id),
+            ("PDU 1", "192.0.2.1", "1.1.1.1", "watts", self.site.pk),
+        )
+
+    def test_invalidate_device(self):
+        """Verify that only the changed device is reloaded."""
+        self.get_targets()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.devices[0].name = "Renamed"
+            self.devices[0].save()
+
+        with self.assertNumQueries(1):
+            targets = self.get_targets()
+        self.assertEqual(targets[self.devices[0].pk].name, "Renamed")
+        self.assertEqual(len(targets), len(self.devices))
+
+    def test_invalidate_ip_address(self):
+        """Verify that changing or deleting a primary IP updates the plan."""
+        self.get_targets()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.addresses[0].address = "198.51.100.1/24"
+            self.addresses[0].save()
+            self.addresses[1].delete()
+
+        targets = self.get_targets()
+        self.assertEqual(targets[self.devices[0].pk].ip, "198.51.100.1")
+        self.assertNotIn(self.devices[1].pk, targets)
+
+    def test_invalidate_pduconfig(self):
+        """Verify that changing a PDUConfig reloads the devices of its device type."""
+        self.get_targets()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pduconfig.power_usage_oid = "1.2.3.4"
+            self.pduconfig.save()
+
+        self.assertEqual({target.oid for target in self.get_targets().values()}, {"1.2.3.4"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pduconfig.delete()
+
+        self.assertEqual(self.get_targets(), {})
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from easysnmp import EasySNMPConnectionError, EasySNMPTimeoutError
+
+from axians_netbox_pdu.sessions import SNMPSessionPool
+
+
+class SNMPSessionPoolTestCase(SimpleTestCase):
+    """Test the pool of reusable SNMP sessions."""
+
+    def setUp(self):
+        """Replace easysnmp sessions with mocks."""
+        patcher = mock.patch("axians_netbox_pdu.sessions.Session", side_effect=lambda **options: mock.Mock())
+        self.session_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuse(self):
+        """Verify that a session is reused for the same host and credentials only."""
+        pool = SNMPSessionPool()
+
+        with pool.session(hostname="192.0.2.1", version=2, community="public") as first:
+            pass
+        with pool.session(hostname="192.0.2.1", version=2, community="public") as second:
+            pass
+        with pool.session(hostname="192.0.2.1", version=2, community="private") as third:
+            pass
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+        self.assertEqual(self.session_class.call_count, 2)
+        self.assertEqual(len(pool), 2)
+
+    def test_concurrent_borrow(self):
+        """Verify that a session is never handed to two borrowers at once."""
+        pool = SNMPSessionPool()
+
+        with pool.session(hostname="192.0.2.1") as first, pool.session(hostname="192.0.2.1") as second:
+            self.assertIsNot(first, second)
+        self.assertEqual(len(pool), 2)
+
+    def test_max_size(self):
+        """Verify that the least recently used sessions are evicted first."""
+        pool = SNMPSessionPool(max_size=2)
+
+        for host in ("192.0.2.1", "192.0.2.2", "192.0.2.3"):
+            with pool.session(hostname=host):
+                pass
+        self.assertEqual(len(pool), 2)
+
+        with pool.session(hostname="192.0.2.1"):
+            pass
+        self.assertEqual(self.session_class.call_count, 4)
+
+    def test_idle_timeout(self):
+        """Verify that sessions idle for too long are dropped."""
+        pool = SNMPSessionPool(idle_timeout=60)
+
+        with mock.patch("axians_netbox_pdu.sessions.time.monotonic", return_value=1000):
+            with pool.session(hostname="192.0.2.1"):
+                pass
+        with mock.patch("axians_netbox_pdu.sessions.time.monotonic", return_value=1100):
+            with pool.session(hostname="192.0.2.1"):
+                pass
+
+        self.assertEqual(self.session_class.call_count, 2)
+
+    def test_errors(self):
+        """Verify that sessions survive timeouts but broken sessions are dropped."""
+        pool = SNMPSessionPool()
+
+        with self.assertRaises(EasySNMPTimeoutError):
+            with pool.session(hostname="192.0.2.1"):
+                raise EasySNMPTimeoutError("timed out while connecting to remote host")
+        self.assertEqual(len(pool), 1)
+
+        with self.assertRaises(EasySNMPConnectionError):
+            with pool.session(hostname="192.0.2.1"):
+                raise EasySNMPConnectionError("could not open session")
+        self.assertEqual(len(pool), 0)
@@ -0,0 +1,109 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from axians_netbox_pdu.snmp import (
+    PDU_GET_REQUEST,
+    AsyncSNMPClient,
+    SNMPError,
+    SNMPTimeoutError,
+    decode_message,
+    encode_message,
+    split_oids,
+)
+
+from .snmp_responder import SNMPResponder
+
+
+class SNMPCodecTestCase(SimpleTestCase):
+    """Test the BER encoding of SNMP messages."""
+
+    def test_roundtrip(self):
+        """Verify that an encoded GET request decodes to the same content."""
+        message = encode_message("public", PDU_GET_REQUEST, 1234, [("1.3.6.1.4.1.318.1.1.12.1.16.0", None)])
+
+        version, community, pdu_type, request_id, error_status, error_index, varbinds = decode_message(message)
+        self.assertEqual(version, 1)
+        self.assertEqual(community, b"public")
+        self.assertEqual(pdu_type, PDU_GET_REQUEST)
+        self.assertEqual(request_id, 1234)
+        self.assertEqual((error_status, error_index), (0, 0))
+        self.assertEqual([oid for oid, _, _ in varbinds], [".1.3.6.1.4.1.318.1.1.12.1.16.0"])
+
+    def test_split_oids(self):
+        """Verify that OIDs are only split when the response could exceed the maximum message size."""
+        oids = [f"1.3.6.1.4.1.318.1.1.26.6.3.1.{index}.1" for index in range(1, 11)]
+
+        self.assertEqual(split_oids(oids, 1472), [oids])
+        chunks = split_oids(oids, 484)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(chunks, []), oids)
+        # A single OID is always requested, even when its response alone could be too large.
+        self.assertEqual(split_oids(oids[:2], 1), [oids[:1], oids[1:2]])
+
+    def test_split_invalid_oids(self):
+        """Verify that symbolic and blank OIDs raise an SNMPError."""
+        for oid in ("SNMPv2-MIB::sysDescr.0", "iso.3.6.1.2.1.1.1.0", ""):
+            with self.assertRaises(SNMPError):
+                split_oids([oid], 1472)
+
+
+class AsyncSNMPClientTestCase(SimpleTestCase):
+    """Test the asyncio SNMP client against a local responder."""
+
+    def test_get(self):
+        """Verify that many concurrent GETs are answered over the same socket."""
+        values = {"1.3.6.1.4.1.1.0": 1234, "1.3.6.1.4.1.2.0": "PDU"}
+
+        async def collect(port):
+            async with AsyncSNMPClient("public", port=port, timeout=1, retries=0) as client:
+                return await asyncio.gather(*(client.get("127.0.0.1", list(values)) for _ in range(100)))
+
+        with SNMPResponder(values) as responder:
+            results = asyncio.run(collect(responder.port))
+
+        self.assertEqual(len(results), 100)
+        for variables in results:
+            self.assertEqual([variable.value for variable in variables], ["1234", "PDU"])
+            self.assertEqual([variable.snmp_type for variable in variables], ["INTEGER", "OCTETSTR"])
+
+    def test_get_no_such_object(self):
+        """Verify that unknown OIDs are reported like easysnmp does."""
+
+        async def collect(port):
+            async with AsyncSNMPClient("public", port=port, timeout=1, retries=0) as client:
+                return await client.get("127.0.0.1", ["1.3.6.1.4.1.3.0"])
+
+        with SNMPResponder() as responder:
+            (variable,) = asyncio.run(collect(responder.port))
+
+        self.assertEqual(variable.value, "NOSUCHOBJECT")
+
+    def test_bulkwalk(self):
+        """Verify that a table is walked with GETBULK requests and that the walk stops at the end of the table."""
+        values = {f"1.3.6.1.4.1.318.1.1.26.9.4.3.1.7.{index}": index * 10 for index in range(1, 49)}
+        values["1.3.6.1.4.1.318.1.1.26.9.4.3.1.8.1"] = 1
+
+        async def collect(port):
+            async with AsyncSNMPClient("public", port=port, timeout=1, retries=0) as client:
+                return await client.bulkwalk("127.0.0.1", "1.3.6.1.4.1.318.1.1.26.9.4.3.1.7", max_repetitions=25)
+
+        with SNMPResponder(values) as responder:
+            variables = asyncio.run(collect(responder.port))
+
+        self.assertEqual(len(responder.requests), 2)
+        self.assertEqual([variable.oid_index for variable in variables], [str(index) for index in range(1, 49)])
+        self.assertEqual([variable.value for variable in variables], [str(index * 10) for index in range(1, 49)])
+
+    def test_get_timeout(self):
+        """Verify that a silent agent is retried and then reported as a timeout."""
+
+        async def collect(port):
+            async with AsyncSNMPClient("public", port=port, timeout=0.1, retries=2) as client:
+                return await client.get("127.0.0.1", ["1.3.6.1.4.1.1.0"])
+
+        with SNMPResponder(silent=True) as responder:
+            with self.assertRaises(SNMPTimeoutError):
+                asyncio.run(collect(responder.port))
+
+        self.assertEqual(len(responder.requests), 3)
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from axians_netbox_pdu.ingest import write_readings
+from axians_netbox_pdu.models import PDUStatus
+from axians_netbox_pdu.status_cache import cache_statuses, get_status, get_statuses
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+
+
+class StatusCacheTestCase(TestCase):
+    """Test the cache of the latest PDUStatus."""
+
+    def setUp(self):
+        """Create a few PDUs with a status and a device without one."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.devices = [
+            Device.objects.create(
+                name=f"Device {index}", device_role=self.role, device_type=self.device_type, site=self.site
+            )
+            for index in range(4)
+        ]
+        for index, device in enumerate(self.devices[:3]):
+            PDUStatus.objects.create(device=device, power_usage=100 * index)
+        self.device_ids = [device.pk for device in self.devices]
+        cache.delete_many([f"axians_netbox_pdu:status:{device_id}" for device_id in self.device_ids])
+
+    def test_read_through(self):
+        """Verify that statuses are read from the database once, then from the cache."""
+        with self.assertNumQueries(1):
+            statuses = get_statuses(self.device_ids)
+        self.assertEqual(
+            {device_id: status.power_usage for device_id, status in statuses.items()},
+            {self.devices[0].pk: 0, self.devices[1].pk: 100, self.devices[2].pk: 200},
+        )
+
+        # The device without a status is cached too.
+        with self.assertNumQueries(0):
+            self.assertEqual(get_statuses(self.device_ids).keys(), statuses.keys())
+            self.assertIsNone(get_status(self.devices[3].pk))
+
+    def test_miss(self):
+        """Verify that only the devices missing from the cache are read from the database."""
+        cache_statuses(self.device_ids[:2])
+        with self.assertNumQueries(1):
+            self.assertEqual(len(get_statuses(self.device_ids)), 3)
+
+    def test_write(self):
+        """Verify that writers refresh the cache."""
+        get_statuses(self.device_ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            write_readings([(self.devices[0].pk, timezone.now(), 500), (self.devices[3].pk, timezone.now(), 50)])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_status(self.devices[0].pk).power_usage, 500)
+            self.assertEqual(get_status(self.devices[3].pk).power_usage, 50)
@@ -0,0 +1,93 @@
+from django.test import TestCase
+
+from axians_netbox_pdu.choices import PDUSummaryScopeChoices
+from axians_netbox_pdu.models import PDUPowerSummary, PDUStatus
+from axians_netbox_pdu.summaries import get_power_summaries, refresh_power_summaries
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, PowerFeed, PowerPanel, Rack, Region, Site
+
+
+class PowerSummaryTestCase(TestCase):
+    """Test the precomputed rack, site and region power summaries."""
+
+    def setUp(self):
+        """Create two racks of PDUs in a site nested two regions deep."""
+        self.parent_region = Region.objects.create(name="Parent", slug="parent")
+        self.region = Region.objects.create(name="Child", slug="child", parent=self.parent_region)
+        self.site = Site.objects.create(name="Site", slug="site", region=self.region)
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        power_panel = PowerPanel.objects.create(site=self.site, name="Panel")
+        self.racks = [Rack.objects.create(site=self.site, name=f"Rack {index}") for index in range(2)]
+        self.devices = []
+        for index, rack in enumerate(self.racks):
+            # 230V x 10A x 100% = 2300W available
+            PowerFeed.objects.create(
+                power_panel=power_panel, rack=rack, name=f"Feed {index}", voltage=230, amperage=10, max_utilization=100
+            )
+            for pdu in range(2):
+                device = Device.objects.create(
+                    name=f"PDU {index}-{pdu}",
+                    device_role=self.role,
+                    device_type=self.device_type,
+                    site=self.site,
+                    rack=rack,
+                )
+                PDUStatus.objects.create(device=device, power_usage=230 * (index + 1))
+                self.devices.append(device)
+
+    def get_summary(self, scope, object_id):
+        summary = PDUPowerSummary.objects.get(scope=scope, object_id=object_id)
+        return summary.used_power, summary.available_power, summary.utilization, summary.pdu_count
+
+    def test_refresh(self):
+        """Verify the totals of every scope, nested regions including their children."""
+        refresh_power_summaries([self.devices[0].pk])
+
+        self.assertEqual(self.get_summary(PDUSummaryScopeChoices.SCOPE_RACK, self.racks[0].pk), (460, 2300, 20, 2))
+        self.assertEqual(self.get_summary(PDUSummaryScopeChoices.SCOPE_SITE, self.site.pk), (1380, 4600, 30, 4))
+        for region in (self.region, self.parent_region):
+            self.assertEqual(self.get_summary(PDUSummaryScopeChoices.SCOPE_REGION, region.pk), (1380, 4600, 30, 4))
+        # Only the scopes holding the device are refreshed.
+        self.assertFalse(
+            PDUPowerSummary.objects.filter(scope=PDUSummaryScopeChoices.SCOPE_RACK, object_id=self.racks[1].pk)
+        )
+
+        oldest = PDUPowerSummary.objects.get(scope=PDUSummaryScopeChoices.SCOPE_SITE, object_id=self.site.pk)
+        self.assertEqual(oldest.oldest_reading, PDUStatus.objects.order_by("updated_at").first().updated_at)
+
+    def test_refresh_all(self):
+        """Verify that a full refresh summarizes every scope and drops the summaries left without PDUs."""
+        refresh_power_summaries()
+        self.assertEqual(
+            set(get_power_summaries(PDUSummaryScopeChoices.SCOPE_RACK, [rack.pk for rack in self.racks])),
+            {rack.pk for rack in self.racks},
+        )
+
+        PDUStatus.objects.filter(device__rack=self.racks[1]).delete()
+        refresh_power_summaries()
+
+        summaries = get_power_summaries(PDUSummaryScopeChoices.SCOPE_RACK, [rack.pk for rack in self.racks])
+        self.assertEqual(set(summaries), {self.racks[0].pk})
+        self.assertEqual(self.get_summary(PDUSummaryScopeChoices.SCOPE_SITE, self.site.pk), (460, 4600, 10, 2))
+
+    def test_move_power_feed(self):
+        """Verify that moving a feed to another rack refreshes the summaries of the rack it left too."""
+        refresh_power_summaries()
+        feed = PowerFeed.objects.get(rack=self.racks[0])
+        feed.rack = self.racks[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            feed.save()
+
+        self.assertEqual(self.get_summary(PDUSummaryScopeChoices.SCOPE_RACK, self.racks[0].pk), (460, None, None, 2))
+        self.assertEqual(self.get_summary(PDUSummaryScopeChoices.SCOPE_RACK, self.racks[1].pk), (920, 4600, 20, 2))
+        self.assertEqual(self.get_summary(PDUSummaryScopeChoices.SCOPE_SITE, self.site.pk), (1380, 4600, 30, 4))
+
+    def test_refresh_query_count(self):
+        """Verify that the number of queries does not depend on the number of devices."""
+        # The devices, then the PDU and feed totals, upsert and cleanup of the racks and sites, plus the region trees.
+        # The devices are in no location, so that scope is skipped.
+        with self.assertNumQueries(14):
+            refresh_power_summaries([device.pk for device in self.devices])
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.test import TestCase
+
+from axians_netbox_pdu.models import PDUPollState, PDUStatus
+from axians_netbox_pdu.summaries import refresh_power_summaries
+from axians_netbox_pdu.template_content import RackPDUStatus
+from dcim.models import Device, DeviceRole, DeviceType, Manufacturer, PowerFeed, PowerPanel, Rack, Site
+
+
+class RackPDUStatusTestCase(TestCase):
+    """Test the PDU panel of the rack page."""
+
+    def setUp(self):
+        """Create a rack holding a few PDUs, one of them quarantined."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.rack = Rack.objects.create(site=self.site, name="Rack")
+        power_panel = PowerPanel.objects.create(site=self.site, name="Panel")
+        # 230V x 10A x 100% = 2300W available
+        PowerFeed.objects.create(
+            power_panel=power_panel, rack=self.rack, name="Feed", voltage=230, amperage=10, max_utilization=100
+        )
+        self.add_pdus(3)
+        PDUPollState.objects.create(device=Device.objects.first(), state="quarantined")
+
+    def add_pdus(self, count):
+        start = Device.objects.count()
+        for index in range(start, start + count):
+            device = Device.objects.create(
+                name=f"PDU {index}", device_role=self.role, device_type=self.device_type, site=self.site, rack=self.rack
+            )
+            PDUStatus.objects.create(device=device, power_usage=115)
+
+    def render(self, lazy_panels=False):
+        config = dict(settings.PLUGINS_CONFIG["axians_netbox_pdu"], lazy_panels=lazy_panels)
+        with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+            return RackPDUStatus({"object": self.rack, "settings": settings}).right_page()
+
+    def test_lazy(self):
+        """Verify that a lazy panel is a placeholder rendered without any query."""
+        with self.assertNumQueries(0):
+            content = self.render(lazy_panels=True)
+        self.assertIn(f"/panels/rack/{self.rack.pk}/", content)
+
+    def test_query_count(self):
+        """Verify that the panel costs the same number of queries whatever the number of PDUs, summarized or not."""
+        with self.assertNumQueries(2):
+            content = self.render()
+        self.assertIn("PDU 0", content)
+        self.assertIn("345 Watts", content)
+
+        self.add_pdus(17)
+        refresh_power_summaries(Device.objects.values_list("pk", flat=True))
+
+        with self.assertNumQueries(2):
+            content = self.render()
+        self.assertIn("PDU 19", content)
+        self.assertIn("2300 Watts", content)
+
+    def test_no_pdus(self):
+        """Verify that racks without PDUs get no panel."""
+        PDUStatus.objects.all().delete()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render(), "")
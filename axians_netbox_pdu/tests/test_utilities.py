@@ -0,0 +1,171 @@
+from django.test import SimpleTestCase, TestCase
+
+from axians_netbox_pdu.models import PDUOutletStatus, PDUStatus
+from axians_netbox_pdu.utilities import (
+    bulk_upsert_outlet_status,
+    bulk_upsert_pdu_status,
+    get_rack_power_utilization,
+    get_racks_power_utilization,
+    get_stagger_offset,
+)
+from dcim.models import (
+    Device,
+    DeviceRole,
+    DeviceType,
+    Manufacturer,
+    PowerFeed,
+    PowerOutletTemplate,
+    PowerPanel,
+    Rack,
+    Site,
+)
+
+
+class BulkUpsertPDUStatusTestCase(TestCase):
+    """Test the bulk_upsert_pdu_status utility."""
+
+    def setUp(self):
+        """Create a set of devices, some of which already have a status."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.devices = [
+            Device.objects.create(
+                name=f"PDU {index}", device_role=self.role, device_type=self.device_type, site=self.site
+            )
+            for index in range(25)
+        ]
+        self.existing = [PDUStatus.objects.create(device=device, power_usage=1) for device in self.devices[:10]]
+
+    def test_bulk_upsert_query_count(self):
+        """Verify that the write phase costs one query per chunk, not per device."""
+        readings = {device.pk: index for index, device in enumerate(self.devices)}
+
+        with self.assertNumQueries(3):
+            bulk_upsert_pdu_status(readings, batch_size=10)
+
+        self.assertEqual(PDUStatus.objects.count(), len(self.devices))
+        for index, device in enumerate(self.devices):
+            self.assertEqual(PDUStatus.objects.get(device=device).power_usage, index)
+
+    def test_bulk_upsert_updated_at(self):
+        """Verify that updated_at is refreshed for rows that already existed."""
+        bulk_upsert_pdu_status({device.pk: 42 for device in self.devices}, batch_size=10)
+
+        for status in self.existing:
+            refreshed = PDUStatus.objects.get(pk=status.pk)
+            self.assertEqual(refreshed.power_usage, 42)
+            self.assertGreater(refreshed.updated_at, status.updated_at)
+
+
+class BulkUpsertOutletStatusTestCase(TestCase):
+    """Test the bulk_upsert_outlet_status utility."""
+
+    def setUp(self):
+        """Create two PDUs with twelve power outlets each."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        for index in range(1, 13):
+            PowerOutletTemplate.objects.create(device_type=self.device_type, name=f"Outlet {index}")
+        self.devices = [
+            Device.objects.create(
+                name=f"PDU {index}", device_role=self.role, device_type=self.device_type, site=self.site
+            )
+            for index in range(2)
+        ]
+
+    def test_bulk_upsert_outlets(self):
+        """Verify that readings are matched to outlets in natural order with one query per chunk."""
+        readings = {device.pk: list(range(1, 14)) for device in self.devices}
+
+        # One query to look the outlets up, then one per chunk of 10 rows.
+        with self.assertNumQueries(4):
+            bulk_upsert_outlet_status(readings, batch_size=10)
+
+        outlets = dict(
+            PDUOutletStatus.objects.filter(device=self.devices[0]).values_list("power_outlet__name", "power_usage")
+        )
+        # Outlet 10 comes after Outlet 9 and the 13th reading has no outlet to go to.
+        self.assertEqual(outlets, {f"Outlet {index}": index for index in range(1, 13)})
+
+        bulk_upsert_outlet_status({self.devices[0].pk: [None] * 12}, batch_size=10)
+        self.assertEqual(PDUOutletStatus.objects.filter(power_usage=None).count(), 12)
+        self.assertEqual(PDUOutletStatus.objects.count(), 24)
+
+
+class RackPowerUtilizationTestCase(TestCase):
+    """Test the rack power utilization utilities."""
+
+    def setUp(self):
+        """Create three racks, two of them fed and holding PDUs."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.power_panel = PowerPanel.objects.create(site=self.site, name="Panel")
+        self.racks = [Rack.objects.create(site=self.site, name=f"Rack {index}") for index in range(3)]
+        for index, rack in enumerate(self.racks[:2]):
+            # 230V x 10A x 100% = 2300W available per feed
+            for feed in range(2):
+                PowerFeed.objects.create(
+                    power_panel=self.power_panel,
+                    rack=rack,
+                    name=f"Feed {index}-{feed}",
+                    voltage=230,
+                    amperage=10,
+                    max_utilization=100,
+                )
+            for pdu in range(3):
+                device = Device.objects.create(
+                    name=f"PDU {index}-{pdu}",
+                    device_role=self.role,
+                    device_type=self.device_type,
+                    site=self.site,
+                    rack=rack,
+                )
+                PDUStatus.objects.create(device=device, power_usage=460 * (index + 1))
+
+    def test_get_rack_power_utilization(self):
+        """Verify the utilization of a single rack."""
+        with self.assertNumQueries(2):
+            self.assertEqual(get_rack_power_utilization(self.racks[0]), (4600, 1380, 30, "watts"))
+
+    def test_get_racks_power_utilization(self):
+        """Verify that many racks cost the same number of queries as a single one."""
+        with self.assertNumQueries(2):
+            utilization = get_racks_power_utilization(self.racks)
+
+        self.assertEqual(
+            utilization,
+            {
+                self.racks[0].pk: (4600, 1380, 30, "watts"),
+                self.racks[1].pk: (4600, 2760, 60, "watts"),
+                self.racks[2].pk: (None, 0, None, "watts"),
+            },
+        )
+
+
+class GetStaggerOffsetTestCase(SimpleTestCase):
+    """Test the get_stagger_offset utility."""
+
+    def test_offsets_spread_over_interval(self):
+        """Verify that every slot gets a stable offset inside its own share of the interval."""
+        offsets = [get_stagger_offset(slot, 10, 300) for slot in range(10)]
+
+        self.assertEqual(offsets, [get_stagger_offset(slot, 10, 300) for slot in range(10)])
+        for slot, offset in enumerate(offsets):
+            self.assertGreaterEqual(offset, slot * 30)
+            self.assertLess(offset, (slot + 1) * 30)
+
+    def test_offsets_without_jitter(self):
+        """Verify that slots are evenly spaced when jitter is disabled."""
+        self.assertEqual([get_stagger_offset(slot, 4, 300, jitter=0) for slot in range(4)], [0, 75, 150, 225])
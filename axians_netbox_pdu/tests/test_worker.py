@@ -0,0 +1,464 @@
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import django_rq
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+from easysnmp import EasySNMPTimeoutError
+
+from axians_netbox_pdu.choices import PDUPollStateChoices
+from axians_netbox_pdu.models import PDUConfig, PDUOutletStatus, PDUPollState, PDUStatus
+from axians_netbox_pdu.plan import poll_plan
+from axians_netbox_pdu.sessions import get_session_pool
+from axians_netbox_pdu.metrics import get_metrics, reset_metrics
+from axians_netbox_pdu.worker import (
+    aggregate_poll_results,
+    collect_power_usage_info,
+    collect_power_usage_shard,
+    merge_summaries,
+    run_exclusive,
+)
+from dcim.models import (
+    Device,
+    DeviceRole,
+    DeviceType,
+    Manufacturer,
+    PowerOutlet,
+    PowerOutletTemplate,
+    Site,
+    VirtualChassis,
+)
+from ipam.models import IPAddress
+
+from .snmp_responder import SNMPResponder
+
+
+@contextmanager
+def patch_snmp(snmp_get):
+    """Answer the SNMP requests of the poller with ``snmp_get(oid, hostname, **options)``, called once per OID.
+
+    Yields the list of ``(hostname, oids)`` requests sent by the poller.
+    """
+    requests = []
+
+    class FakeSession:
+        def __init__(self, hostname, **options):
+            self.hostname = hostname
+            self.options = options
+
+        def get(self, oids):
+            requests.append((self.hostname, list(oids)))
+            return [snmp_get(oid, self.hostname, **self.options) for oid in oids]
+
+    # Pooled sessions would keep answering with the previous fake.
+    get_session_pool().clear()
+    try:
+        with mock.patch("axians_netbox_pdu.sessions.Session", FakeSession):
+            yield requests
+    finally:
+        get_session_pool().clear()
+
+
+class CollectPowerUsageInfoTestCase(TestCase):
+    """Test the collect_power_usage_info job."""
+
+    def setUp(self):
+        """Create a set of PDUs that can be polled."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.device_type = DeviceType.objects.create(
+            slug="device_type", model="device_type", manufacturer=self.manufacturer
+        )
+        self.outlets = PowerOutletTemplate.objects.create(device_type=self.device_type, name="1")
+        self.pduconfig = PDUConfig.objects.create(
+            device_type=self.device_type, power_usage_oid="1.1.1.1", power_usage_unit="watts"
+        )
+        self.devices = []
+        for index in range(1, 6):
+            address = IPAddress.objects.create(address=f"192.0.2.{index}/24")
+            self.devices.append(
+                Device.objects.create(
+                    name=f"PDU {index}",
+                    device_role=self.role,
+                    device_type=self.device_type,
+                    site=self.site,
+                    primary_ip4=address,
+                )
+            )
+        poll_plan.reset()
+
+    @staticmethod
+    def fake_snmp_get(oid, hostname, **kwargs):
+        """Answer with the last octet of the polled address as power usage."""
+        return SimpleNamespace(value=hostname.rsplit(".", 1)[-1], snmp_type="INTEGER")
+
+    def test_collect_power_usage_info(self):
+        """Verify that every eligible PDU is polled and its status saved."""
+        with patch_snmp(self.fake_snmp_get):
+            summary = collect_power_usage_info()
+
+        self.assertEqual(summary["succeeded"], len(self.devices))
+        self.assertEqual(summary["failed"], 0)
+        self.assertEqual(summary["results"], {device.name: index for index, device in enumerate(self.devices, 1)})
+        for index, device in enumerate(self.devices, 1):
+            self.assertEqual(PDUStatus.objects.get(device=device).power_usage, index)
+
+    def test_collect_power_usage_info_failure_isolation(self):
+        """Verify that unreachable or misbehaving PDUs do not prevent the others from being updated."""
+
+        def snmp_get(oid, hostname, **kwargs):
+            if hostname == "192.0.2.2":
+                raise EasySNMPTimeoutError("timed out while connecting to remote host")
+            if hostname == "192.0.2.4":
+                return SimpleNamespace(value="NOSUCHOBJECT", snmp_type="NOSUCHOBJECT")
+            return self.fake_snmp_get(oid, hostname, **kwargs)
+
+        with patch_snmp(snmp_get):
+            summary = collect_power_usage_info()
+
+        self.assertEqual(summary["devices"], 5)
+        self.assertEqual(summary["succeeded"], 3)
+        self.assertEqual(summary["failed"], 2)
+        self.assertEqual(
+            [(failure["device"], failure["error"]) for failure in summary["failures"]],
+            [("PDU 2", "EasySNMPTimeoutError"), ("PDU 4", "ValueError")],
+        )
+        self.assertEqual(
+            set(PDUStatus.objects.values_list("device__name", flat=True)), {"PDU 1", "PDU 3", "PDU 5"},
+        )
+
+    def test_collect_power_usage_info_invalid_oid(self):
+        """Verify that a PDU configured with an OID the poller cannot request only fails its own devices."""
+        device_type = DeviceType.objects.create(slug="symbolic", model="symbolic", manufacturer=self.manufacturer)
+        PowerOutletTemplate.objects.create(device_type=device_type, name="1")
+        # Saved before OIDs were validated.
+        PDUConfig.objects.create(
+            device_type=device_type, power_usage_oid="SNMPv2-MIB::sysDescr.0", power_usage_unit="watts"
+        )
+        Device.objects.filter(pk=self.devices[1].pk).update(device_type=device_type)
+        poll_plan.reset()
+
+        with patch_snmp(self.fake_snmp_get):
+            summary = collect_power_usage_info()
+
+        self.assertEqual(summary["succeeded"], 4)
+        self.assertEqual(
+            [(failure["device"], failure["error"]) for failure in summary["failures"]], [("PDU 2", "SNMPError")]
+        )
+        self.assertEqual(PDUPollState.objects.get().device, self.devices[1])
+
+    def test_collect_power_usage_info_quarantine(self):
+        """Verify that a PDU failing repeatedly is quarantined, skipped and probed again once its quarantine expires."""
+        polled = []
+
+        def snmp_get(oid, hostname, **kwargs):
+            polled.append(hostname)
+            if hostname == "192.0.2.1":
+                raise EasySNMPTimeoutError("timed out while connecting to remote host")
+            return self.fake_snmp_get(oid, hostname, **kwargs)
+
+        with patch_snmp(snmp_get):
+            for _ in range(settings.PLUGINS_CONFIG["axians_netbox_pdu"]["quarantine_threshold"]):
+                collect_power_usage_info()
+
+            state = PDUPollState.objects.get(device=self.devices[0])
+            self.assertEqual(state.state, PDUPollStateChoices.STATE_QUARANTINED)
+            self.assertGreater(state.next_poll_at, timezone.now())
+
+            polled.clear()
+            summary = collect_power_usage_info()
+            self.assertEqual(summary["quarantined"], 1)
+            self.assertNotIn("192.0.2.1", polled)
+
+            # Once the quarantine expires, a successful probe closes the circuit again.
+            state.next_poll_at = timezone.now() - timedelta(seconds=1)
+            state.save()
+            polled.clear()
+            with patch_snmp(self.fake_snmp_get):
+                summary = collect_power_usage_info()
+
+        self.assertEqual(summary["quarantined"], 0)
+        self.assertEqual(summary["failed"], 0)
+        self.assertFalse(PDUPollState.objects.exists())
+
+    def test_collect_power_usage_info_daisy_chain(self):
+        """Verify that PDUs sharing a management IP are fetched in one request and told apart by their index."""
+        self.pduconfig.power_usage_oid = "1.1.1.{index}"
+        self.pduconfig.save()
+        chassis = VirtualChassis.objects.create(name="Chain")
+        for position, device in enumerate(self.devices[:3], 1):
+            IPAddress.objects.filter(pk=device.primary_ip4_id).update(address="192.0.2.1/24")
+            Device.objects.filter(pk=device.pk).update(virtual_chassis=chassis, vc_position=position)
+        poll_plan.reset()
+
+        def snmp_get(oid, hostname, **kwargs):
+            return SimpleNamespace(value=oid.rsplit(".", 1)[-1], snmp_type="INTEGER")
+
+        with patch_snmp(snmp_get) as requests:
+            summary = collect_power_usage_info()
+
+        self.assertEqual(
+            sorted(requests),
+            [
+                ("192.0.2.1", ["1.1.1.1", "1.1.1.2", "1.1.1.3"]),
+                ("192.0.2.4", ["1.1.1.1"]),
+                ("192.0.2.5", ["1.1.1.1"]),
+            ],
+        )
+        self.assertEqual(summary["results"], {"PDU 1": 1, "PDU 2": 2, "PDU 3": 3, "PDU 4": 1, "PDU 5": 1})
+
+    def test_collect_power_usage_shard(self):
+        """Verify that shards partition the eligible devices between them."""
+        polled = []
+        for shard in range(2):
+            with patch_snmp(self.fake_snmp_get):
+                summary = collect_power_usage_shard(shard, 2)
+            self.assertEqual(
+                set(summary["results"]), {device.name for device in self.devices if device.pk % 2 == shard}
+            )
+            polled.append(summary)
+
+        merged = merge_summaries(polled)
+        self.assertEqual(merged["devices"], len(self.devices))
+        self.assertEqual(merged["succeeded"], len(self.devices))
+        self.assertEqual(len(merged["results"]), len(self.devices))
+
+    def test_collect_power_usage_shard_failure(self):
+        """Verify that a failing shard returns its error so that the results of the cycle are still merged."""
+        with mock.patch("axians_netbox_pdu.worker.poll_devices", side_effect=RuntimeError("database is gone")):
+            failed = collect_power_usage_shard(0, 2)
+        with patch_snmp(self.fake_snmp_get):
+            succeeded = collect_power_usage_shard(1, 2)
+
+        self.assertEqual(failed, {"failed": True, "shard": 0, "error": "RuntimeError", "message": "database is gone"})
+        jobs = [mock.Mock(result=failed), mock.Mock(result=succeeded)]
+        with mock.patch("axians_netbox_pdu.worker.Job.fetch_many", return_value=jobs):
+            summary = aggregate_poll_results(["shard-0", "shard-1"])
+
+        self.assertEqual(summary["succeeded"], succeeded["succeeded"])
+        self.assertEqual(summary["failed_shards"], [failed])
+        self.assertEqual(summary["missing_shards"], 0)
+
+    def test_collect_power_usage_info_fan_out(self):
+        """Verify that the scheduled job only enqueues the shards and their aggregation when sharding is enabled."""
+        config = dict(settings.PLUGINS_CONFIG["axians_netbox_pdu"], poll_shards=3)
+        shard_jobs = [mock.Mock(id=f"shard-{shard}") for shard in range(3)]
+        snmp_get = mock.Mock()
+
+        with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}), mock.patch(
+            "axians_netbox_pdu.worker.collect_power_usage_shard.delay", side_effect=shard_jobs
+        ) as shard_delay, mock.patch(
+            "axians_netbox_pdu.worker.aggregate_poll_results.delay", return_value=mock.Mock(id="aggregate")
+        ) as aggregate_delay, patch_snmp(
+            snmp_get
+        ):
+            result = collect_power_usage_info()
+
+        snmp_get.assert_not_called()
+        self.assertEqual(shard_delay.call_args_list, [mock.call(shard, 3, "device") for shard in range(3)])
+        aggregate_delay.assert_called_once_with(["shard-0", "shard-1", "shard-2"], depends_on=shard_jobs)
+        self.assertEqual(result, {"shards": ["shard-0", "shard-1", "shard-2"], "aggregate": "aggregate"})
+
+    def test_collect_power_usage_info_time_budget(self):
+        """Verify that the stalest PDUs are polled first and the others deferred once the time budget is spent."""
+        now = timezone.now()
+        for age, device in enumerate(self.devices[:4]):
+            PDUStatus.objects.create(device=device, power_usage=1)
+            PDUStatus.objects.filter(device=device).update(updated_at=now - timedelta(minutes=age))
+        polled = []
+
+        def snmp_get(oid, hostname, **kwargs):
+            polled.append(hostname)
+            time.sleep(0.3)
+            return self.fake_snmp_get(oid, hostname, **kwargs)
+
+        config = dict(settings.PLUGINS_CONFIG["axians_netbox_pdu"], max_concurrency=1, poll_time_budget=0.5)
+        with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}), patch_snmp(snmp_get):
+            summary = collect_power_usage_info()
+
+        # Never polled first, then from the oldest reading to the newest.
+        self.assertEqual(polled, ["192.0.2.5", "192.0.2.4"])
+        self.assertEqual(summary["succeeded"], 2)
+        self.assertEqual(summary["deferred"], 3)
+
+
+class RunExclusiveTestCase(TestCase):
+    """Test the overlap protection of scheduled polls."""
+
+    def setUp(self):
+        """Start from a clean set of metrics and hold the lock of a fake running poll."""
+        reset_metrics()
+        self.connection = django_rq.get_connection()
+        self.lock = self.connection.lock("axians_netbox_pdu:poll-lock:test", timeout=60)
+        self.lock.acquire()
+
+    def tearDown(self):
+        """Release the lock and drop the metrics recorded by the test."""
+        self.connection.delete(
+            "axians_netbox_pdu:poll-lock:test", "axians_netbox_pdu:poll-lock:test:pending",
+        )
+        reset_metrics()
+
+    def run_with_policy(self, policy, func, rerun=None):
+        config = dict(settings.PLUGINS_CONFIG["axians_netbox_pdu"], overlap_policy=policy)
+        with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+            return run_exclusive("test", func, rerun=rerun)
+
+    def test_skip(self):
+        """Verify that an overlapping run is dropped and counted as an overrun."""
+        func = mock.Mock()
+
+        result = self.run_with_policy("skip", func)
+
+        func.assert_not_called()
+        self.assertTrue(result["skipped"])
+        self.assertEqual(get_metrics()["overruns"], 1)
+
+    def test_coalesce(self):
+        """Verify that overlapping runs are collapsed into a single rerun once the current run finishes."""
+        rerun = mock.Mock()
+        self.run_with_policy("coalesce", mock.Mock(), rerun=rerun)
+        self.run_with_policy("coalesce", mock.Mock(), rerun=rerun)
+        self.assertEqual(get_metrics()["overruns"], 2)
+
+        self.lock.release()
+        func = mock.Mock(return_value="done")
+        self.assertEqual(self.run_with_policy("coalesce", func, rerun=rerun), "done")
+        func.assert_called_once_with()
+        rerun.assert_called_once_with()
+
+
+class CollectPowerUsageInfoAsyncioTestCase(TestCase):
+    """Test the collect_power_usage_info job with the asyncio collector backend."""
+
+    def setUp(self):
+        """Create two PDUs reachable through a local SNMP responder."""
+        self.site = Site.objects.create(name="Site", slug="site")
+        self.role = DeviceRole.objects.create(name="Role", slug="role")
+        self.manufacturer = Manufacturer.objects.create(name="Manufacturer", slug="manufacturer")
+        self.devices = []
+        for index in range(1, 3):
+            device_type = DeviceType.objects.create(
+                slug=f"device_type_{index}", model=f"device_type_{index}", manufacturer=self.manufacturer
+            )
+            PowerOutletTemplate.objects.create(device_type=device_type, name="1")
+            PDUConfig.objects.create(
+                device_type=device_type, power_usage_oid=f"1.3.6.1.4.1.{index}.0", power_usage_unit="watts"
+            )
+            self.devices.append(
+                Device.objects.create(
+                    name=f"PDU {index}",
+                    device_role=self.role,
+                    device_type=device_type,
+                    site=self.site,
+                    primary_ip4=IPAddress.objects.create(address="127.0.0.1/8"),
+                )
+            )
+        poll_plan.reset()
+
+    def test_collect_power_usage_info(self):
+        """Verify that the asyncio backend saves the same results as the threaded one."""
+        with SNMPResponder({"1.3.6.1.4.1.1.0": 1200, "1.3.6.1.4.1.2.0": 2400}) as responder:
+            config = dict(
+                settings.PLUGINS_CONFIG["axians_netbox_pdu"], collector_backend="asyncio", snmp_port=responder.port
+            )
+            with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+                summary = collect_power_usage_info()
+
+        self.assertEqual(summary["results"], {"PDU 1": 1200, "PDU 2": 2400})
+        self.assertEqual(PDUStatus.objects.get(device=self.devices[0]).power_usage, 1200)
+        self.assertEqual(PDUStatus.objects.get(device=self.devices[1]).power_usage, 2400)
+
+    def test_collect_power_usage_info_invalid_oid(self):
+        """Verify that a host whose request cannot be built fails alone instead of the whole gather."""
+        PDUConfig.objects.filter(device_type=self.devices[0].device_type).update(
+            power_usage_oid="SNMPv2-MIB::sysDescr.0"
+        )
+        IPAddress.objects.filter(pk=self.devices[1].primary_ip4_id).update(address="127.0.0.2/8")
+        poll_plan.reset()
+
+        with SNMPResponder() as responder, SNMPResponder(
+            {"1.3.6.1.4.1.2.0": 2400}, host="127.0.0.2", port=responder.port
+        ):
+            config = dict(
+                settings.PLUGINS_CONFIG["axians_netbox_pdu"], collector_backend="asyncio", snmp_port=responder.port
+            )
+            with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+                summary = collect_power_usage_info()
+
+        self.assertEqual(summary["results"], {"PDU 2": 2400})
+        self.assertEqual(
+            [(failure["device"], failure["error"]) for failure in summary["failures"]], [("PDU 1", "SNMPError")]
+        )
+
+    def test_collect_power_usage_info_metrics(self):
+        """Verify that the additional metrics of a PDU are fetched in the same request as its power usage."""
+        PDUConfig.objects.filter(device_type=self.devices[0].device_type).update(
+            metric_oids={"voltage": "1.3.6.1.4.1.1.1", "current": "1.3.6.1.4.1.1.2", "missing": "1.3.6.1.4.1.1.3"}
+        )
+        poll_plan.reset()
+        values = {"1.3.6.1.4.1.1.0": 1200, "1.3.6.1.4.1.2.0": 2400, "1.3.6.1.4.1.1.1": 230, "1.3.6.1.4.1.1.2": "5.2"}
+
+        with SNMPResponder(values) as responder:
+            config = dict(
+                settings.PLUGINS_CONFIG["axians_netbox_pdu"], collector_backend="asyncio", snmp_port=responder.port
+            )
+            with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+                collect_power_usage_info()
+
+        # Both PDUs answer on 127.0.0.1, their power usage and metrics are fetched in one combined GET.
+        self.assertEqual(len(responder.requests), 1)
+        pdustatus = PDUStatus.objects.get(device=self.devices[0])
+        self.assertEqual(pdustatus.power_usage, 1200)
+        self.assertEqual(pdustatus.metrics, {"voltage": 230, "current": 5.2, "missing": None})
+        self.assertEqual(PDUStatus.objects.get(device=self.devices[1]).metrics, {})
+
+    def test_collect_power_usage_info_outlets(self):
+        """Verify that the outlet table is walked and its rows stored on the outlets in natural name order."""
+        PDUConfig.objects.filter(device_type=self.devices[0].device_type).update(outlet_power_oid="1.3.6.1.4.1.1.5")
+        PowerOutlet.objects.create(device=self.devices[0], name="10")
+        PowerOutlet.objects.create(device=self.devices[0], name="2")
+        poll_plan.reset()
+        values = {"1.3.6.1.4.1.1.0": 1200, "1.3.6.1.4.1.2.0": 2400}
+        values.update({f"1.3.6.1.4.1.1.5.{index}": index * 100 for index in range(1, 5)})
+
+        with SNMPResponder(values) as responder:
+            config = dict(
+                settings.PLUGINS_CONFIG["axians_netbox_pdu"], collector_backend="asyncio", snmp_port=responder.port
+            )
+            with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+                collect_power_usage_info()
+
+        # A single GET for both PDUs sharing 127.0.0.1 and a single GETBULK for the whole outlet table.
+        self.assertEqual(len(responder.requests), 2)
+        self.assertEqual(
+            dict(PDUOutletStatus.objects.values_list("power_outlet__name", "power_usage")),
+            {"1": 100, "2": 200, "10": 300},
+        )
+
+    def test_collect_power_usage_info_per_address(self):
+        """Verify that PDUs on distinct addresses are each fetched with a request of their own."""
+        PDUConfig.objects.filter(device_type=self.devices[0].device_type).update(
+            metric_oids={"voltage": "1.3.6.1.4.1.1.1"}
+        )
+        IPAddress.objects.filter(pk=self.devices[1].primary_ip4_id).update(address="127.0.0.2/8")
+        poll_plan.reset()
+
+        with SNMPResponder({"1.3.6.1.4.1.1.0": 1200, "1.3.6.1.4.1.1.1": 230}) as first, SNMPResponder(
+            {"1.3.6.1.4.1.2.0": 2400}, host="127.0.0.2", port=first.port
+        ) as second:
+            config = dict(
+                settings.PLUGINS_CONFIG["axians_netbox_pdu"], collector_backend="asyncio", snmp_port=first.port
+            )
+            with self.settings(PLUGINS_CONFIG={"axians_netbox_pdu": config}):
+                summary = collect_power_usage_info()
+
+        self.assertEqual(summary["results"], {"PDU 1": 1200, "PDU 2": 2400})
+        self.assertEqual(first.requests, [[".1.3.6.1.4.1.1.0", ".1.3.6.1.4.1.1.1"]])
+        self.assertEqual(second.requests, [[".1.3.6.1.4.1.2.0"]])
+        self.assertEqual(PDUStatus.objects.get(device=self.devices[0]).metrics, {"voltage": 230})
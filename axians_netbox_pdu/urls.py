@@ -1,11 +1,13 @@
 from django.urls import path
 
 from .views import (
+    DevicePDUPanelView,
     PDUConfigBulkDeleteView,
     PDUConfigCreateView,
     PDUConfigEditView,
     PDUConfigImportView,
     PDUConfigListView,
+    RackPDUPanelView,
 )
 
 app_name = "axians_netbox_pdu"
@@ -19,4 +21,6 @@ urlpatterns = [
          name="pduconfig_bulk_delete"),
     path("pdu-config/<int:pk>/edit/",
          PDUConfigEditView.as_view(), name="pduconfig_edit"),
+    path("panels/device/<int:pk>/", DevicePDUPanelView.as_view(), name="device_panel"),
+    path("panels/rack/<int:pk>/", RackPDUPanelView.as_view(), name="rack_panel"),
 ]
@@ -1,32 +1,23 @@
+import zlib
+from collections import defaultdict
+
+import django
 from django.conf import settings
+from django.db import connection
 from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from dcim.models import PowerFeed
+from dcim.models import PowerFeed, PowerOutlet
 
 from .choices import PDUUnitChoices
-from .models import PDUStatus
-
-
-def get_rack_power_utilization(rack):
-    """ Determine the utilization of power in a rack and return it as a percentage."""
+from .models import PDUOutletStatus, PDUStatus
 
-    config_unit = settings.PLUGINS_CONFIG["axians_netbox_pdu"]["rack_view_summary_unit"]
 
-    total_available_power = None
-    total_power_usage = None
-    total_power_usage_percentage = None
+def format_power_utilization(total_available_power, total_power_usage, config_unit):
+    """Turn the available and used power of a rack in watts into the utilization shown on the rack page."""
     total_power_usage_unit = config_unit
-    power_results = []
-
-    used_power = PDUStatus.objects.filter(device__rack=rack)
-    available_power = PowerFeed.objects.filter(rack=rack).values("available_power")
-
-    # work out available power
-    if available_power:
-        total_available_power = sum(x["available_power"] for x in available_power)
-
-    # work out power_usage
-    total_power_usage = sum(x.get_power_usage_watts() for x in used_power)
+    total_power_usage_percentage = None
 
     # work out percentage used
     if total_available_power:
@@ -36,10 +27,163 @@ def get_rack_power_utilization(rack):
     if config_unit in dict(PDUUnitChoices.TEMPLATE_CHOICES):
         if config_unit == PDUUnitChoices.UNIT_KILOWATTS:
             # if we are using kilowats do the math
-            total_available_power = total_available_power / 1000
+            if total_available_power is not None:
+                total_available_power = total_available_power / 1000
             total_power_usage = total_power_usage / 1000
     else:
         total_power_usage_unit = PDUUnitChoices.UNIT_WATTS
 
-    # return rack power usage
     return total_available_power, total_power_usage, total_power_usage_percentage, total_power_usage_unit
+
+
+def get_racks_available_power(rack_ids):
+    """Return the power available from the feeds of every rack in ``rack_ids`` holding any, keyed by rack id."""
+    return dict(
+        PowerFeed.objects.filter(rack_id__in=rack_ids)
+        .values("rack_id")
+        .annotate(total=Sum("available_power"))
+        .values_list("rack_id", "total")
+    )
+
+
+def get_racks_power_utilization(racks):
+    """Determine the utilization of power of many racks at once.
+
+    ``racks`` holds Rack instances or ids. Returns a dictionary mapping every rack id to the same tuple as
+    ``get_rack_power_utilization``, computed with one grouped query for the power used and one for the power
+    available whatever the number of racks and PDUs.
+    """
+    config_unit = settings.PLUGINS_CONFIG["axians_netbox_pdu"]["rack_view_summary_unit"]
+    rack_ids = [getattr(rack, "pk", rack) for rack in racks]
+
+    used_power = dict(
+        PDUStatus.objects.filter(device__rack_id__in=rack_ids)
+        .values("device__rack_id")
+        .annotate(total=Coalesce(Sum("power_usage"), 0))
+        .values_list("device__rack_id", "total")
+    )
+    available_power = get_racks_available_power(rack_ids)
+
+    return {
+        rack_id: format_power_utilization(available_power.get(rack_id), used_power.get(rack_id, 0), config_unit)
+        for rack_id in rack_ids
+    }
+
+
+def get_rack_power_utilization(rack):
+    """ Determine the utilization of power in a rack and return it as a percentage."""
+    return get_racks_power_utilization([rack])[rack.pk]
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size, unless_newer=None):
+    """Insert ``objs``, updating ``update_fields`` of the rows already existing for the same ``unique_fields``.
+
+    Every chunk of ``batch_size`` objects is written with a single INSERT ... ON CONFLICT DO UPDATE statement. With
+    ``unless_newer`` set to the name of a field, rows holding a later value of that field than the object written over
+    them are left untouched.
+    """
+    if django.VERSION >= (4, 1) and unless_newer is None:
+        model.objects.bulk_create(
+            objs,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields,
+        )
+        return
+
+    # Older Django versions cannot express the upsert through the ORM, nor can any version make it conditional. NetBox
+    # only runs on PostgreSQL.
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns = ", ".join(quote_name(field.column) for field in fields)
+    placeholders = f"({', '.join(['%s'] * len(fields))})"
+    updates = ", ".join(
+        f"{quote_name(column)} = EXCLUDED.{quote_name(column)}"
+        for column in (model._meta.get_field(name).column for name in update_fields)
+    )
+    conflict = ", ".join(quote_name(model._meta.get_field(name).column) for name in unique_fields)
+    condition = ""
+    if unless_newer is not None:
+        column = quote_name(model._meta.get_field(unless_newer).column)
+        condition = f" WHERE {table}.{column} IS NULL OR {table}.{column} <= EXCLUDED.{column}"
+    for start in range(0, len(objs), batch_size):
+        chunk = objs[start : start + batch_size]
+        params = [field.get_db_prep_save(getattr(obj, field.attname), connection) for obj in chunk for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) "  # nosec
+                f"VALUES {', '.join([placeholders] * len(chunk))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}{condition}",
+                params,
+            )
+
+
+def get_batch_size(batch_size):
+    if batch_size is None:
+        batch_size = settings.PLUGINS_CONFIG["axians_netbox_pdu"]["write_batch_size"]
+    return max(1, int(batch_size))
+
+
+def bulk_upsert_pdu_status(readings, batch_size=None, metrics=None, timestamps=None):
+    """Insert or update the PDUStatus of many devices at once.
+
+    ``readings`` maps a device id to its power usage and ``metrics``, when given, maps a device id to the values of
+    its additional metrics. Without ``metrics`` the metrics already stored are left untouched. ``timestamps`` maps a
+    device id to the time of its reading, now by default. A PDUStatus already holding a later reading is left untouched,
+    so a retried or late batch never overwrites newer values. Every chunk of ``batch_size`` readings is written with a
+    single INSERT ... ON CONFLICT (device_id) DO UPDATE statement instead of a SELECT plus an UPDATE or INSERT per
+    device.
+    """
+    updated_at = timezone.now()
+    timestamps = timestamps or {}
+    statuses = [
+        PDUStatus(
+            device_id=device_id,
+            power_usage=power_usage,
+            metrics={} if metrics is None else metrics.get(device_id, {}),
+            updated_at=updated_at,
+            read_at=timestamps.get(device_id, updated_at),
+        )
+        for device_id, power_usage in readings.items()
+    ]
+    fields = ["power_usage", "updated_at", "read_at"]
+    if metrics is not None:
+        fields.append("metrics")
+    bulk_upsert(PDUStatus, statuses, ["device"], fields, get_batch_size(batch_size), unless_newer="read_at")
+
+
+def bulk_upsert_outlet_status(readings, batch_size=None):
+    """Insert or update the PDUOutletStatus of the outlets of many devices at once.
+
+    ``readings`` maps a device id to the power usage of its outlets, in the order of the outlet table of the PDU. The
+    n-th reading is stored on the n-th power outlet of the device in natural name order, so "Outlet 10" follows
+    "Outlet 9". Readings beyond the number of power outlets of a device are dropped. The outlets of every device are
+    looked up with a single query.
+    """
+    if not readings:
+        return
+    updated_at = timezone.now()
+    outlets = defaultdict(list)
+    power_outlets = PowerOutlet.objects.filter(device_id__in=readings).order_by("device_id", "_name")
+    for device_id, outlet_id in power_outlets.values_list("device_id", "pk").iterator():
+        outlets[device_id].append(outlet_id)
+    statuses = [
+        PDUOutletStatus(power_outlet_id=outlet_id, device_id=device_id, power_usage=power_usage, updated_at=updated_at)
+        for device_id, values in readings.items()
+        for outlet_id, power_usage in zip(outlets[device_id], values)
+    ]
+    bulk_upsert(PDUOutletStatus, statuses, ["power_outlet"], ["power_usage", "updated_at"], get_batch_size(batch_size))
+
+
+def get_stagger_offset(slot, slots, interval, jitter=0.5):
+    """Return the offset in seconds, inside each ``interval``, at which poll slot ``slot`` of ``slots`` runs.
+
+    Slots are spread evenly over the interval. A deterministic jitter derived from a hash of the slot moves each slot
+    by up to ``jitter`` of the width of a slot, so offsets stay stable across scheduler restarts without every slot
+    landing on a round boundary.
+    """
+    width = interval / max(1, slots)
+    fraction = zlib.crc32(f"axians_netbox_pdu:{slot}".encode()) / 2 ** 32
+    return (slot + fraction * min(max(jitter, 0), 1)) * width
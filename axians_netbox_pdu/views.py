@@ -1,12 +1,16 @@
 from django.contrib.auth.mixins import PermissionRequiredMixin
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.views.generic import View
 
+from dcim.models import Device, Rack
+
 from netbox.views.generic import ObjectDeleteView, BulkImportView, ObjectEditView, ObjectListView
 
 from .filters import PDUConfigFilter
 from .forms import PDUConfigCSVForm, PDUConfigFilterForm, PDUConfigForm
 from .models import PDUConfig
+from .panels import render_panel
 from .tables import PDUConfigBulkTable, PDUConfigTable
 
 from django.conf import settings
@@ -59,3 +63,26 @@ class PDUConfigBulkDeleteView(PermissionRequiredMixin, ObjectDeleteView):
 
 class PDUConfigEditView(PDUConfigCreateView):
     permission_required = "axians_netbox_pdu.change_pduconfig"
+
+
+class DevicePDUPanelView(PermissionRequiredMixin, View):
+    """View rendering the PDU panel of a device page, fetched by the page once displayed"""
+
+    permission_required = "dcim.view_device"
+    # A login redirect would be fetched and inserted into the page in place of the panel.
+    raise_exception = True
+
+    def get(self, request, pk):
+        device = get_object_or_404(Device.objects.restrict(request.user, "view"), pk=pk)
+        return HttpResponse(render_panel(request, "device", device))
+
+
+class RackPDUPanelView(PermissionRequiredMixin, View):
+    """View rendering the PDU panel of a rack page, fetched by the page once displayed"""
+
+    permission_required = "dcim.view_rack"
+    raise_exception = True
+
+    def get(self, request, pk):
+        rack = get_object_or_404(Rack.objects.restrict(request.user, "view"), pk=pk)
+        return HttpResponse(render_panel(request, "rack", rack))
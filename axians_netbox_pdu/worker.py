@@ -1,43 +1,585 @@
+import asyncio
 import logging
-from datetime import datetime
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
 import django_rq
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
 from django_rq import job
+from redis.exceptions import LockError
+from rq.job import Job
 
-from dcim.models import Device
-from easysnmp import EasySNMPError, snmp_get
+from easysnmp import EasySNMPError
 
-from .models import PDUConfig, PDUStatus
+from .choices import PDUPollStateChoices
+from .history import TIERS, create_partitions, purge_history, rollup_readings
+from .ingest import flush_readings, store_readings
+from .metrics import record_event, record_metric
+from .models import MAX_POWER_USAGE, PDUPollState, PDUStatus
+from .plan import poll_plan
+from .sessions import get_session_options, get_session_pool
+from .snmp import AsyncSNMPClient, SNMPError, split_oids
+from .summaries import refresh_power_summaries
+from .utilities import bulk_upsert_outlet_status
 
 logger = logging.getLogger("rq.worker")
 logger.setLevel(logging.DEBUG)
 
+# PollTarget attribute used to assign a device to a poll shard for each supported "shard_by" setting
+SHARD_FIELDS = {
+    "device": "device_id",
+    "site": "site_id",
+}
 
-@job
-def collect_power_usage_info():
-    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
-    devices = Device.objects.filter().exclude(device_type__pduconfig__isnull=True).exclude(primary_ip4__isnull=True)
+OVERLAP_POLICIES = ("skip", "coalesce", "queue")
 
-    logging.info("Start: Collecting Power Usage Information")
-    results = []
-    for device in devices:
+
+def _group_by_host(targets):
+    """Group targets by management IP, daisy-chained PDUs reached through the same agent end up in one group.
+
+    Groups keep the order in which their first target appears in ``targets``.
+    """
+    hosts = {}
+    for target in targets:
+        hosts.setdefault(target.ip, []).append(target)
+    return list(hosts.items())
+
+
+def _host_oids(targets):
+    """Return every OID polled on the targets sharing a host, each OID only once."""
+    return list(dict.fromkeys(oid for target in targets for oid in target.oids))
+
+
+def _poll_host(ip, targets, config):
+    """Fetch every OID of the devices sharing the management IP ``ip`` over SNMP.
+
+    Returns a mapping of OID to variable and a mapping of device id to the variables of its outlet table. The OIDs of
+    all the devices are requested in a single GET, split only when the response could exceed
+    ``snmp_max_message_size``, and outlet tables are walked with GETBULK requests, one after the other so the agent
+    never sees more than one request at a time from this poller. This runs inside the worker pool so it must not
+    touch the database, everything needed comes from the targets.
+    """
+    oids = _host_oids(targets)
+    variables = []
+    outlets = {}
+    with get_session_pool().session(hostname=ip, **get_session_options(config)) as session:
+        for chunk in split_oids(oids, config["snmp_max_message_size"]):
+            variables.extend(session.get(chunk))
+        for target in targets:
+            if target.outlet_oid:
+                outlets[target.device_id] = session.bulkwalk(
+                    target.outlet_oid, max_repetitions=config["snmp_max_repetitions"]
+                )
+    return dict(zip(oids, variables)), outlets
+
+
+def _outlet_values(root, variables):
+    """Return the values of a walked outlet table ordered by row index, ignoring variables outside of ``root``."""
+    root = root.strip(".")
+    rows = []
+    for variable in variables:
+        oid = f"{variable.oid}.{variable.oid_index}" if variable.oid_index else variable.oid
+        oid = oid.strip(".")
+        if oid.startswith(f"{root}."):
+            rows.append((tuple(int(arc) for arc in oid[len(root) + 1 :].split(".")), variable.value))
+    return [value for _, value in sorted(rows)]
+
+
+class PollResult:
+    """Outcome of polling a single target, either its values or the error that prevented reading them.
+
+    ``value`` is the raw power usage, ``metrics`` maps the name of every additional metric to its SNMP variable and
+    ``outlets`` holds the raw power usage of every outlet, in the order of the outlet table.
+    """
+
+    __slots__ = ("target", "value", "metrics", "outlets", "error", "latency", "deferred")
+
+    def __init__(self, target, value=None, metrics=None, outlets=None, error=None, latency=0.0, deferred=False):
+        self.target = target
+        self.value = value
+        self.metrics = metrics or {}
+        self.outlets = outlets or []
+        self.error = error
+        self.latency = latency
+        self.deferred = deferred
+
+    @classmethod
+    def from_variables(cls, target, variables, outlets, latency):
+        """Build the result of a target from the variables of its host, mapped by OID, and its outlet table."""
+        if any(oid not in variables for oid in target.oids):
+            return cls(target, error=ValueError("Response does not match the requested OIDs."), latency=latency)
+        return cls(
+            target,
+            value=variables[target.oid].value,
+            metrics={name: variables[oid] for name, oid in target.metric_oids.items()},
+            outlets=_outlet_values(target.outlet_oid, outlets) if target.outlet_oid else [],
+            latency=latency,
+        )
+
+
+def _host_results(targets, variables=None, outlets=None, error=None, latency=0.0, deferred=False):
+    """Fan the outcome of polling a host back out to a result per target."""
+    if deferred or error is not None:
+        return [PollResult(target, error=error, latency=latency, deferred=deferred) for target in targets]
+    return [
+        PollResult.from_variables(target, variables, outlets.get(target.device_id, []), latency) for target in targets
+    ]
+
+
+def _collect_with_threads(targets, config, deadline):
+    """Poll hosts from a bounded thread pool, one blocking easysnmp session per thread."""
+
+    def poll(host):
+        ip, host_targets = host
+        started = time.monotonic()
+        if started > deadline:
+            return _host_results(host_targets, deferred=True)
         try:
-            power_usage = snmp_get(
-                device.device_type.pduconfig.power_usage_oid,
-                hostname=str(device.primary_ip4.address.ip),
-                community=config["snmp_read"],
-                version=int(config["snmp_version"]),
-            )
-        except EasySNMPError as err:
-            logging.error(f"Failed to get power usage status for {device.name}: {err}.")
-            raise
+            variables, outlets = _poll_host(ip, host_targets, config)
+        except (EasySNMPError, SNMPError, ValueError) as err:
+            # An OID the request cannot be built for only fails the devices of this host.
+            return _host_results(host_targets, error=err, latency=time.monotonic() - started)
+        return _host_results(host_targets, variables, outlets, latency=time.monotonic() - started)
+
+    with ThreadPoolExecutor(max_workers=max(1, int(config["max_concurrency"]))) as executor:
+        return [result for results in executor.map(poll, _group_by_host(targets)) for result in results]
+
+
+def _collect_with_asyncio(targets, config, deadline):
+    """Poll hosts from a single event loop, keeping up to max_concurrency hosts in flight."""
+
+    async def collect():
+        semaphore = asyncio.Semaphore(max(1, int(config["max_concurrency"])))
+        async with AsyncSNMPClient(
+            config["snmp_read"],
+            version=config["snmp_version"],
+            port=config["snmp_port"],
+            timeout=config["snmp_timeout"],
+            retries=config["snmp_retries"],
+        ) as client:
+
+            async def poll(ip, host_targets):
+                async with semaphore:
+                    started = time.monotonic()
+                    if started > deadline:
+                        return _host_results(host_targets, deferred=True)
+                    oids = _host_oids(host_targets)
+                    variables = []
+                    outlets = {}
+                    try:
+                        for chunk in split_oids(oids, config["snmp_max_message_size"]):
+                            variables.extend(await client.get(ip, chunk))
+                        for target in host_targets:
+                            if target.outlet_oid:
+                                outlets[target.device_id] = await client.bulkwalk(
+                                    ip, target.outlet_oid, max_repetitions=config["snmp_max_repetitions"]
+                                )
+                    except (SNMPError, ValueError) as err:
+                        # Failing here must not cancel the other hosts gathered with this one.
+                        return _host_results(host_targets, error=err, latency=time.monotonic() - started)
+                    return _host_results(
+                        host_targets, dict(zip(oids, variables)), outlets, latency=time.monotonic() - started
+                    )
+
+            results = await asyncio.gather(*(poll(ip, host_targets) for ip, host_targets in _group_by_host(targets)))
+            return [result for host_results in results for result in host_results]
+
+    return asyncio.run(collect())
+
+
+COLLECTOR_BACKENDS = {
+    "threads": _collect_with_threads,
+    "asyncio": _collect_with_asyncio,
+}
+
+
+def _parse_power_usage(value):
+    """Convert a raw SNMP value to a power usage the PDUStatus model can store."""
+    power_usage = int(value)
+    if not 0 <= power_usage <= MAX_POWER_USAGE:
+        raise ValueError(f"Power usage {power_usage} is out of range.")
+    return power_usage
+
+
+def _parse_metric(variable):
+    """Convert the SNMP variable of an additional metric to a JSON value, missing objects become None."""
+    if variable.snmp_type in ("NOSUCHOBJECT", "NOSUCHINSTANCE", "ENDOFMIBVIEW"):
+        return None
+    try:
+        return int(variable.value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        number = float(variable.value)
+    except (TypeError, ValueError):
+        return variable.value
+    # Agents exposing decimal values as display strings, NaN and infinity are not valid JSON.
+    return number if math.isfinite(number) else variable.value
+
+
+def _parse_outlet_power_usage(value):
+    """Convert the raw SNMP value of an outlet, a single unreadable outlet is stored as unknown."""
+    try:
+        return _parse_power_usage(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _split_quarantined(targets, now):
+    """Split targets between the ones to poll this cycle and the ones whose quarantine has not expired yet.
+
+    Quarantined devices whose ``next_poll_at`` has been reached are polled once more as a probe.
+    """
+    states = {state.device_id: state for state in PDUPollState.objects.all()}
+    polled = []
+    quarantined = []
+    probes = []
+    for target in targets:
+        state = states.get(target.device_id)
+        if state is not None and state.is_quarantined:
+            if state.next_poll_at and state.next_poll_at > now:
+                quarantined.append(target)
+                continue
+            probes.append(state.pk)
+        polled.append(target)
+
+    if probes:
+        PDUPollState.objects.filter(pk__in=probes).update(state=PDUPollStateChoices.STATE_PROBING)
+    return polled, quarantined, states
+
+
+def _update_poll_states(states, readings, failures, now, config):
+    """Record the outcome of a cycle in the circuit breaker of every polled device."""
+    recovered = [device_id for device_id in readings if device_id in states]
+    if recovered:
+        PDUPollState.objects.filter(device_id__in=recovered).delete()
+
+    threshold = max(1, int(config["quarantine_threshold"]))
+    created = []
+    updated = []
+    for failure in failures:
+        state = states.get(failure["device_id"])
+        if state is None:
+            state = PDUPollState(device_id=failure["device_id"])
+            created.append(state)
+        else:
+            updated.append(state)
+        state.consecutive_failures += 1
+        state.last_error = f"{failure['error']}: {failure['message']}"[:255]
+        state.last_failure_at = now
+        if state.consecutive_failures >= threshold:
+            # Back off exponentially from the normal interval, every failed probe doubles the quarantine.
+            exponent = min(state.consecutive_failures - threshold, 32)
+            backoff = min(config["schedule_interval"] * 2 ** exponent, config["quarantine_max_backoff"])
+            state.state = PDUPollStateChoices.STATE_QUARANTINED
+            state.next_poll_at = now + timedelta(seconds=backoff)
+
+    if created:
+        PDUPollState.objects.bulk_create(created)
+    if updated:
+        PDUPollState.objects.bulk_update(
+            updated, ["state", "consecutive_failures", "last_error", "last_failure_at", "next_poll_at"]
+        )
+
+
+def get_poll_targets(shard=None, shards=1, shard_by="device"):
+    """Return the targets that can be polled, optionally restricted to one of ``shards`` shards.
 
-        pdu_status = PDUStatus.objects.update_or_create(device=device, defaults={"power_usage": power_usage.value})
+    Devices are assigned to a shard by their id, or by the id of their site when ``shard_by`` is "site" so that
+    every PDU of a site is polled by the same worker.
+    """
+    targets = poll_plan.get_targets()
+    if shard is None or shards <= 1:
+        return targets
+    try:
+        shard_field = SHARD_FIELDS[shard_by]
+    except KeyError:
+        raise ImproperlyConfigured(f"Unknown shard_by {shard_by!r}, expected one of {', '.join(SHARD_FIELDS)}.")
+    return [target for target in targets if getattr(target, shard_field) % shards == shard]
 
-        data = {device.name: power_usage.value}
 
-        results.append(data)
+def _order_by_staleness(targets):
+    """Sort targets stalest reading first, devices never polled coming before everything else."""
+    if not targets:
+        return []
+    # Only read the statuses of the targets, a shard or stagger slot holds a fraction of the fleet.
+    updated_at = dict(
+        PDUStatus.objects.filter(device_id__in=[target.device_id for target in targets])
+        .values_list("device_id", "updated_at")
+        .iterator()
+    )
+    return sorted(
+        targets,
+        key=lambda target: (
+            updated_at.get(target.device_id) is not None,
+            updated_at.get(target.device_id) or 0,
+            target.device_id,
+        ),
+    )
 
+
+def poll_devices(shard=None, shards=1, shard_by="device"):
+    """Poll the eligible PDUs, or a single shard of them, and return a summary of the cycle.
+
+    A device that cannot be polled is recorded in the summary with its error and latency, it never prevents the
+    other devices of the cycle from being updated. Devices failing repeatedly are quarantined and skipped until their
+    next probe is due. Devices are polled stalest first and no new request is sent once ``poll_time_budget`` is
+    spent, the devices left over are deferred to the next cycle.
+    """
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    try:
+        collector = COLLECTOR_BACKENDS[config["collector_backend"]]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown collector_backend {config['collector_backend']!r}, "
+            f"expected one of {', '.join(COLLECTOR_BACKENDS)}."
+        )
+    logging.info("Start: Collecting Power Usage Information")
+    started = time.monotonic()
+    deadline = started + (config["poll_time_budget"] or config["schedule_interval"])
+    now = timezone.now()
+    targets, quarantined, states = _split_quarantined(get_poll_targets(shard, shards, shard_by), now)
+    # Stalest readings first, so that when a cycle runs out of time the devices left over are the freshest ones.
+    targets = _order_by_staleness(targets)
+    readings = {}
+    metrics = {}
+    outlets = {}
+    results = {}
+    failures = []
+    deferred = 0
+
+    # SNMP requests are fanned out by the collector, one combined request per management IP and a result per device.
+    for result in collector(targets, config, deadline):
+        target = result.target
+        if result.deferred:
+            deferred += 1
+            continue
+        if result.error is None:
+            try:
+                readings[target.device_id] = _parse_power_usage(result.value)
+            except (TypeError, ValueError) as err:
+                result.error = err
+        if result.error is not None:
+            logging.error(f"Failed to get power usage status for {target.name}: {result.error}.")
+            failures.append(
+                {
+                    "device": target.name,
+                    "device_id": target.device_id,
+                    "error": type(result.error).__name__,
+                    "message": str(result.error),
+                    "latency": round(result.latency, 3),
+                }
+            )
+            continue
+
+        metrics[target.device_id] = {name: _parse_metric(variable) for name, variable in result.metrics.items()}
+        if target.outlet_oid:
+            outlets[target.device_id] = [_parse_outlet_power_usage(value) for value in result.outlets]
+        results[target.name] = readings[target.device_id]
+
+    # Database writes stay on this thread so the Django connection is never shared between threads.
+    store_readings(
+        [(device_id, now, power_usage) for device_id, power_usage in readings.items()],
+        metrics=metrics,
+        batch_size=config["write_batch_size"],
+    )
+    bulk_upsert_outlet_status(outlets, batch_size=config["write_batch_size"])
+    _update_poll_states(states, readings, failures, now, config)
+
+    summary = {
+        "devices": len(targets),
+        "succeeded": len(readings),
+        "failed": len(failures),
+        "quarantined": len(quarantined),
+        "deferred": deferred,
+        "duration": round(time.monotonic() - started, 3),
+        "results": results,
+        "failures": failures,
+    }
+    if failures:
+        logging.warning(f"{len(failures)} of {len(targets)} devices could not be polled.")
+    if deferred:
+        logging.warning(f"Poll time budget exhausted, {deferred} of {len(targets)} devices deferred to the next cycle.")
     logging.info("FINISH: Collecting Power Usage Information")
-    return results
+    return summary
+
+
+def merge_summaries(summaries):
+    """Merge the summaries of several shards into the summary of the whole poll cycle."""
+    merged = {
+        "devices": 0,
+        "succeeded": 0,
+        "failed": 0,
+        "quarantined": 0,
+        "deferred": 0,
+        "duration": 0,
+        "results": {},
+        "failures": [],
+    }
+    for summary in summaries:
+        for key in ("devices", "succeeded", "failed", "quarantined", "deferred"):
+            merged[key] += summary[key]
+        # Shards run side by side, the cycle lasts as long as the slowest one.
+        merged["duration"] = max(merged["duration"], summary["duration"])
+        merged["results"].update(summary["results"])
+        merged["failures"].extend(summary["failures"])
+    return merged
+
+
+def run_exclusive(scope, func, args=(), rerun=None):
+    """Run ``func(*args)`` unless a previous run of the same ``scope`` is still in progress.
+
+    Runs are serialized by a Redis lock expiring after ``run_lock_ttl`` seconds, so a crashed worker cannot block
+    polling forever. What happens to a run triggered while the lock is held depends on ``overlap_policy``:
+
+    * ``skip``: the run is dropped.
+    * ``coalesce``: the run is dropped but ``rerun`` is called once the current run finishes, however many runs
+      overlapped it in the meantime.
+    * ``queue``: the run waits for the lock, at most one run waits per scope and any further one is dropped.
+
+    Every overlap is counted in the ``overruns`` metric.
+    """
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    policy = config["overlap_policy"]
+    if policy not in OVERLAP_POLICIES:
+        raise ImproperlyConfigured(f"Unknown overlap_policy {policy!r}, expected one of {', '.join(OVERLAP_POLICIES)}.")
+    connection = django_rq.get_connection()
+    ttl = int(config["run_lock_ttl"] or 3 * config["schedule_interval"])
+    key = f"axians_netbox_pdu:poll-lock:{scope}"
+    lock = connection.lock(key, timeout=ttl)
+
+    if not lock.acquire(blocking=False):
+        record_event("overruns")
+        logging.warning(f"Previous poll of {scope} is still running, applying the {policy} overlap policy.")
+        acquired = False
+        if policy == "coalesce":
+            connection.set(f"{key}:pending", 1, ex=ttl)
+        elif policy == "queue" and connection.set(f"{key}:waiting", 1, nx=True, ex=ttl):
+            try:
+                acquired = lock.acquire(blocking=True, blocking_timeout=ttl)
+            finally:
+                connection.delete(f"{key}:waiting")
+        if not acquired:
+            return {"skipped": True, "scope": scope, "overlap_policy": policy}
+
+    started = time.monotonic()
+    try:
+        result = func(*args)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logging.warning(f"Poll lock of {scope} expired before the run finished, consider raising run_lock_ttl.")
+
+    duration = time.monotonic() - started
+    record_metric(f"last_duration:{scope}", round(duration, 3))
+    if duration > config["schedule_interval"]:
+        record_event("interval_exceeded")
+    if policy == "coalesce" and connection.delete(f"{key}:pending") and rerun is not None:
+        rerun()
+    return result
+
+
+@job
+def collect_power_usage_shard(shard, shards, shard_by="device"):
+    """Poll a single shard of the eligible PDUs.
+
+    Errors are returned as the result of the shard rather than raised: the job merging the results of a cycle depends
+    on every shard job and would never run if one of them failed.
+    """
+    try:
+        return run_exclusive(
+            f"shard:{shard}-of-{shards}",
+            poll_devices,
+            (shard, shards, shard_by),
+            rerun=lambda: collect_power_usage_shard.delay(shard, shards, shard_by),
+        )
+    except Exception as err:
+        logging.exception(f"Poll shard {shard} of {shards} failed.")
+        return {"failed": True, "shard": shard, "error": type(err).__name__, "message": str(err)}
+
+
+@job
+def aggregate_poll_results(job_ids):
+    """Merge the results of the shard jobs of a poll cycle once they have all finished."""
+    jobs = Job.fetch_many(job_ids, connection=django_rq.get_connection())
+    summaries = []
+    missing = 0
+    skipped = 0
+    failed = []
+    for shard_job in jobs:
+        if shard_job is None or not isinstance(shard_job.result, dict):
+            missing += 1
+        elif shard_job.result.get("skipped"):
+            skipped += 1
+        elif shard_job.result.get("failed"):
+            failed.append(shard_job.result)
+        else:
+            summaries.append(shard_job.result)
+
+    summary = merge_summaries(summaries)
+    summary["shards"] = len(job_ids)
+    summary["missing_shards"] = missing
+    summary["skipped_shards"] = skipped
+    summary["failed_shards"] = failed
+    if missing:
+        logging.warning(f"{missing} of {len(job_ids)} poll shards did not return a result.")
+    if failed:
+        logging.warning(f"{len(failed)} of {len(job_ids)} poll shards failed.")
+    logging.info(
+        f"Poll cycle finished: {summary['succeeded']} succeeded, {summary['failed']} failed "
+        f"over {len(job_ids)} shards in {summary['duration']}s."
+    )
+    return summary
+
+
+@job
+def rollup_power_history():
+    """Roll the power usage history up into its coarser tiers."""
+    return run_exclusive("history", rollup_readings)
+
+
+def _purge_history():
+    return {"partitions": [name for tier in TIERS for name in create_partitions(tier)], "deleted": purge_history()}
+
+
+@job
+def purge_power_history():
+    """Delete the history past its retention and prepare the partitions of the coming days."""
+    return run_exclusive("history-purge", _purge_history)
+
+
+@job
+def flush_power_readings():
+    """Write the readings buffered in the write-behind buffer to the database."""
+    return run_exclusive("ingest-flush", flush_readings)
+
+
+@job
+def refresh_all_power_summaries():
+    """Recompute every rack, location, site and region power summary."""
+    return run_exclusive("summaries", refresh_power_summaries)
+
+
+@job
+def collect_power_usage_info():
+    """Poll every eligible PDU.
+
+    With ``poll_shards`` above one this job only coordinates the cycle: it enqueues one job per shard so that every
+    RQ worker takes part in the polling, followed by a job merging their results. Shards still running from the
+    previous cycle are handled by ``overlap_policy``.
+    """
+    config = settings.PLUGINS_CONFIG["axians_netbox_pdu"]
+    shards = int(config["poll_shards"])
+    if shards <= 1:
+        return run_exclusive("all", poll_devices, rerun=collect_power_usage_info.delay)
+
+    shard_jobs = [collect_power_usage_shard.delay(shard, shards, config["shard_by"]) for shard in range(shards)]
+    job_ids = [shard_job.id for shard_job in shard_jobs]
+    aggregate_job = aggregate_poll_results.delay(job_ids, depends_on=shard_jobs)
+    logging.info(f"Enqueued {shards} poll shards, results will be merged by job {aggregate_job.id}.")
+    return {"shards": job_ids, "aggregate": aggregate_job.id}